@@ -7,15 +7,17 @@ BingX 永續：open-api.bingx.com（premiumIndex / ticker）
                  high_24h, low_24h, last, change_24h_pct}
 """
 import logging
-import requests
+
+from ..utils import http_metrics
 
 logger = logging.getLogger("arb_feeds")
 _HEADERS = {"User-Agent": "Mozilla/5.0 (RoosterTrade arb-monitor)"}
 _TIMEOUT = 12
+_session = http_metrics.session("arb_feeds")
 
 
 def _get(url, params=None):
-    r = requests.get(url, params=params, headers=_HEADERS, timeout=_TIMEOUT)
+    r = _session.get(url, params=params, headers=_HEADERS, timeout=_TIMEOUT)
     r.raise_for_status()
     return r.json()
 
@@ -6,7 +6,7 @@ import time
 from typing import Any, Dict, List, Optional
 from urllib.parse import urlencode
 
-import requests
+from ..utils import http_metrics
 
 
 class MaxPublicClient:
@@ -16,7 +16,7 @@ class MaxPublicClient:
 
     def __init__(self, timeout: int = 10):
         self.timeout = timeout
-        self.session = requests.Session()
+        self.session = http_metrics.session("max")
 
     def get_usdt_twd(self) -> Dict[str, Any]:
         response = self.session.get(
@@ -45,7 +45,7 @@ class BingXReadOnlyClient:
         self.api_key = api_key or ""
         self.secret_key = secret_key or ""
         self.timeout = timeout
-        self.session = requests.Session()
+        self.session = http_metrics.session("bingx")
 
     @property
     def authenticated(self) -> bool:
@@ -138,7 +138,7 @@ class BinanceReadOnlyClient:
         self.api_key = api_key or ""
         self.secret_key = secret_key or ""
         self.timeout = timeout
-        self.session = requests.Session()
+        self.session = http_metrics.session("binance")
         self.logger = logging.getLogger("binance_read_only")
         self._mode = None  # 'papi'（統一帳戶）或 'fapi'（一般合約）
 
@@ -284,7 +284,7 @@ class PionexReadOnlyClient:
         self.api_key = api_key or ""
         self.secret_key = secret_key or ""
         self.timeout = timeout
-        self.session = requests.Session()
+        self.session = http_metrics.session("pionex")
         self.logger = logging.getLogger("pionex_read_only")
 
     @property
@@ -16,12 +16,15 @@ import threading
 import time
 from datetime import datetime, timezone
 
-import requests
+from ..utils import http_metrics
 
 logger = logging.getLogger("funding_rates")
 
 _HEADERS = {"User-Agent": "Mozilla/5.0 (RoosterTrade funding-collector)"}
 _TIMEOUT = 25
+_binance = http_metrics.session("binance")
+_bingx = http_metrics.session("bingx")
+_pionex = http_metrics.session("pionex")
 
 # RWA（現實資產代幣化）辨識規則
 #   BingX：NCSK*=個股/ETF、NCCO*=大宗商品、NCFX*=外匯
@@ -80,8 +83,8 @@ def annualized_pct(rate, interval_hours):
 
 # ── 各交易所抓取（皆為公開端點，不需金鑰）────────────────────────
 def fetch_binance():
-    rows = requests.get("https://fapi.binance.com/fapi/v1/premiumIndex",
-                        headers=_HEADERS, timeout=_TIMEOUT).json()
+    rows = _binance.get("https://fapi.binance.com/fapi/v1/premiumIndex",
+                       headers=_HEADERS, timeout=_TIMEOUT).json()
     out = []
     for r in rows if isinstance(rows, list) else []:
         out.append({
@@ -97,8 +100,8 @@ def fetch_binance():
 
 
 def fetch_bingx():
-    payload = requests.get("https://open-api.bingx.com/openApi/swap/v2/quote/premiumIndex",
-                           headers=_HEADERS, timeout=_TIMEOUT).json()
+    payload = _bingx.get("https://open-api.bingx.com/openApi/swap/v2/quote/premiumIndex",
+                         headers=_HEADERS, timeout=_TIMEOUT).json()
     rows = payload.get("data") or []
     out = []
     for r in rows if isinstance(rows, list) else []:
@@ -115,8 +118,8 @@ def fetch_bingx():
 
 
 def fetch_pionex():
-    payload = requests.get("https://api.pionex.com/api/v1/market/indexes",
-                           headers=_HEADERS, timeout=_TIMEOUT).json()
+    payload = _pionex.get("https://api.pionex.com/api/v1/market/indexes",
+                          headers=_HEADERS, timeout=_TIMEOUT).json()
     data = payload.get("data") or {}
     rows = data.get("indexes") if isinstance(data, dict) else data
     if rows is None and isinstance(data, dict) and data:
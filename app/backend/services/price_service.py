@@ -0,0 +1,126 @@
+"""跨策略共用的市場現價服務（短 TTL 快取 + single-flight 合併請求 + 每輪快照）。
+
+之前 AutoTradeStrategy.get_current_price、MakerOrderManager._current_price、
+check_take_profit、get_all_strategies 都各自呼叫 client.get_trades(market, limit=1)，
+同一市場有五個策略時，一輪就送出 10–15 個一模一樣的請求。
+
+這裡統一成：
+- 快取：同一市場 ttl 秒內直接回傳記憶體中的價格；
+- single-flight：多個執行緒同時查同一市場，只有第一個真的打 API，其餘等它的結果；
+- 每輪快照：`with price_service.cycle():` 期間，同一市場第一次取到的價格會被凍結，
+  讓同一輪的停利判斷與再平衡掛價用的是同一個價格。快照綁在 contextvars 上，
+  所以排程週期與網頁請求各自獨立；要把快照帶進執行緒池，用
+  `contextvars.copy_context().run(...)` 提交工作即可。
+
+有 WebSocket 行情串流（max.market_stream.MarketDataStream）時，現價與最佳買賣價
+直接讀串流維護的記憶體資料；串流斷線或尚未就緒才退回上面的 REST 路徑。
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("price_service")
+
+DEFAULT_TTL = 2.0
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.price = None
+        self.error = None
+
+
+class PriceService:
+    def __init__(self, client, ttl=DEFAULT_TTL, stream=None):
+        self.client = client
+        self.ttl = ttl
+        self.stream = stream      # MarketDataStream；None 表示只用 REST
+        self._lock = threading.Lock()
+        self._cache = {}          # market -> (fetched_at, price)
+        self._inflight = {}       # market -> _InFlight
+        # 每輪快照：market -> price；None 表示不在週期內
+        self._snapshot = contextvars.ContextVar(f"price_snapshot_{id(self)}", default=None)
+        self.fetch_count = 0      # 實際打 API 的次數（觀察合併效果用）
+
+    def _fetch(self, market):
+        trades = self.client.get_trades(market, limit=1)
+        if not trades:
+            raise ValueError(f"無法獲取{market}的最新成交價格")
+        return float(trades[0]["price"])
+
+    def get_price(self, market):
+        """回傳市場現價；週期內回傳快照價，否則回傳 ttl 內的快取或最新價。"""
+        market = market.lower()
+        snapshot = self._snapshot.get()
+        streamed = self.stream.last_price(market) if self.stream is not None else None
+        with self._lock:
+            if snapshot is not None and market in snapshot:
+                return snapshot[market]
+            if streamed is not None:
+                return self._remember(snapshot, market, streamed)
+            cached = self._cache.get(market)
+            if cached and time.time() - cached[0] < self.ttl:
+                return self._remember(snapshot, market, cached[1])
+            flight = self._inflight.get(market)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._inflight[market] = flight
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            with self._lock:
+                return self._remember(snapshot, market, flight.price)
+
+        try:
+            flight.price = self._fetch(market)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(market, None)
+                if flight.error is None:
+                    self.fetch_count += 1
+                    self._cache[market] = (time.time(), flight.price)
+            flight.done.set()
+        with self._lock:
+            return self._remember(snapshot, market, flight.price)
+
+    @staticmethod
+    def _remember(snapshot, market, price):
+        # 呼叫端需持有 self._lock
+        if snapshot is not None:
+            return snapshot.setdefault(market, price)
+        return price
+
+    def get_top_of_book(self, market):
+        """串流維護的最佳買賣價（get_depth(limit=1) 格式）；沒有串流或未就緒回傳 None。"""
+        if self.stream is None:
+            return None
+        return self.stream.top_of_book(market.lower())
+
+    def invalidate(self, market=None):
+        """清除快取（成交後想立即取新價時用）；不影響進行中的週期快照。"""
+        with self._lock:
+            if market is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(market.lower(), None)
+
+    @contextmanager
+    def cycle(self):
+        """一個策略執行週期：期間同一市場只取一次價並凍結；巢狀時沿用外層快照。"""
+        if self._snapshot.get() is not None:
+            yield self
+            return
+        token = self._snapshot.set({})
+        try:
+            yield self
+        finally:
+            self._snapshot.reset(token)
@@ -0,0 +1,376 @@
+"""獨立的策略執行程序（strategy runner）與 web worker 之間的本機 IPC。
+
+原本策略、maker 狀態、Telegram 確認與各種背景巡檢都活在 Flask process 內，gunicorn 只能開
+1 個 worker（多開就會重複交易、重複輪詢 Telegram）。設 ROOSTER_RUNNER=external 後分成兩種 process：
+
+- strategy runner（app/runner.py）：唯一持有 StrategyManager、WebSocket 串流、策略排程、
+  Telegram bot 與背景巡檢；
+- web worker（gunicorn，可開多個）：只處理 HTTP，策略相關操作透過 RunnerChannel 交給 runner。
+
+RunnerChannel 是一個 SQLite（WAL）檔，兩張表：
+- runner_commands：web 寫入指令（建立/更新/刪除策略、手動執行一輪、查詢歷史），runner 取出
+  並行執行、寫回結果，web 在期限內輪詢結果。過了期限還沒被取走的指令 runner 不再執行
+  （標為 expired），避免 web 已回報失敗、runner 事後才把策略建出來；
+- runner_status：runner 定期發布的快照（策略列表、整體與各策略統計、排程與串流狀態、心跳）。
+  儀表板的讀取直接讀快照、不經過 runner，web worker 數量可隨流量調整。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from ..models.strategy_config import TradingStrategyConfig
+from ..strategies.strategy_manager import empty_trading_stats
+
+logger = logging.getLogger("strategy_runner")
+
+# 心跳超過這麼久沒更新，web 端視為 runner 未執行，指令直接回報失敗而不是等到逾時
+HEARTBEAT_STALE = 30.0
+
+
+class RunnerError(Exception):
+    """runner 未回應、指令逾時或執行失敗。"""
+
+
+class RunnerChannel:
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+        self._initialize()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.database_path, timeout=15, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _initialize(self):
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS runner_commands (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    command TEXT NOT NULL,
+                    args TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    deadline REAL NOT NULL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_runner_commands_status
+                    ON runner_commands(status, id);
+                CREATE TABLE IF NOT EXISTS runner_status (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            """)
+        finally:
+            connection.close()
+
+    # ---------- 指令（web 端） ----------
+    def submit(self, command: str, args: Optional[Dict] = None, timeout: float = 10.0) -> int:
+        now = time.time()
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                "INSERT INTO runner_commands (command, args, status, created_at, deadline) "
+                "VALUES (?, ?, 'pending', ?, ?)",
+                (command, json.dumps(args or {}, ensure_ascii=False), now, now + timeout),
+            )
+            return cursor.lastrowid
+        finally:
+            connection.close()
+
+    def _load(self, command_id: int):
+        connection = self._connect()
+        try:
+            return connection.execute(
+                "SELECT status, result, error FROM runner_commands WHERE id = ?", (command_id,)
+            ).fetchone()
+        finally:
+            connection.close()
+
+    def call(self, command: str, args: Optional[Dict] = None, timeout: float = 10.0,
+             poll: float = 0.05):
+        """送出指令並等待結果；runner 沒在跑、逾時或執行失敗時丟 RunnerError。"""
+        if not self.runner_alive():
+            raise RunnerError("策略執行程序未啟動或未回應")
+        command_id = self.submit(command, args, timeout)
+        deadline = time.time() + timeout
+        while True:
+            row = self._load(command_id)
+            if row["status"] == "done":
+                return json.loads(row["result"]) if row["result"] is not None else None
+            if row["status"] == "error":
+                raise RunnerError(row["error"])
+            if row["status"] == "expired" or time.time() >= deadline:
+                # 還沒被取走的就撤回；已在執行中的只能放棄等待，結果會反映在下一份快照
+                self._expire(command_id)
+                raise RunnerError(f"策略執行程序在 {timeout:.0f} 秒內沒有完成 {command}")
+            time.sleep(poll)
+
+    def _expire(self, command_id: int) -> None:
+        connection = self._connect()
+        try:
+            connection.execute(
+                "UPDATE runner_commands SET status = 'expired', finished_at = ? "
+                "WHERE id = ? AND status = 'pending'", (time.time(), command_id))
+        finally:
+            connection.close()
+
+    # ---------- 指令（runner 端） ----------
+    def claim(self, limit: int = 16) -> List[Dict]:
+        """取出待執行的指令（標為 running）；已過期限的標為 expired、不執行。"""
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "UPDATE runner_commands SET status = 'expired', finished_at = ? "
+                    "WHERE status = 'pending' AND deadline <= ?", (now, now))
+                rows = connection.execute(
+                    "SELECT id, command, args FROM runner_commands WHERE status = 'pending' "
+                    "ORDER BY id LIMIT ?", (limit,)).fetchall()
+                connection.executemany(
+                    "UPDATE runner_commands SET status = 'running' WHERE id = ?",
+                    [(row["id"],) for row in rows])
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+        return [{"id": row["id"], "command": row["command"], "args": json.loads(row["args"])}
+                for row in rows]
+
+    def finish(self, command_id: int, result=None, error: Optional[str] = None) -> None:
+        connection = self._connect()
+        try:
+            connection.execute(
+                "UPDATE runner_commands SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE id = ?",
+                ("error" if error is not None else "done",
+                 None if error is not None else json.dumps(result, ensure_ascii=False, default=str),
+                 error, time.time(), command_id),
+            )
+        finally:
+            connection.close()
+
+    def purge(self, older_than: float = 3600.0) -> None:
+        """刪除已結束超過 older_than 秒的指令。"""
+        connection = self._connect()
+        try:
+            connection.execute(
+                "DELETE FROM runner_commands WHERE status IN ('done', 'error', 'expired') "
+                "AND finished_at < ?", (time.time() - older_than,))
+        finally:
+            connection.close()
+
+    # ---------- 狀態快照 ----------
+    def publish(self, key: str, value) -> None:
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT INTO runner_status (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (key, json.dumps(value, ensure_ascii=False, default=str), time.time()),
+            )
+        finally:
+            connection.close()
+
+    def read(self, key: str, default=None):
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT value FROM runner_status WHERE key = ?", (key,)).fetchone()
+        finally:
+            connection.close()
+        return json.loads(row["value"]) if row is not None else default
+
+    def runner_alive(self, max_age: float = HEARTBEAT_STALE) -> bool:
+        heartbeat = self.read("heartbeat")
+        return bool(heartbeat) and time.time() - heartbeat.get("at", 0) < max_age
+
+
+class StrategyRunner:
+    """runner 端：執行 web 送來的指令，定期發布心跳與狀態快照。"""
+
+    # web 可以呼叫的 StrategyManager 方法；設定類的參數以 dict 傳遞
+    COMMANDS = {
+        "create_strategy", "update_strategy", "delete_strategy",
+        "enable_strategy", "disable_strategy", "execute_all_strategies",
+        "get_trading_stats", "get_trading_history_page",
+    }
+    MUTATIONS = {"create_strategy", "update_strategy", "delete_strategy",
+                 "enable_strategy", "disable_strategy", "execute_all_strategies"}
+
+    def __init__(self, manager, channel: RunnerChannel,
+                 status_sources: Optional[Dict[str, Callable[[], Dict]]] = None,
+                 snapshot_interval: float = 15.0, poll: float = 0.2, workers: int = 4):
+        """
+        status_sources: {快照名稱: 無參數 callable}，例如排程與串流狀態，和策略列表一起發布。
+        snapshot_interval: 策略列表與統計的發布週期（秒）；變更類指令完成後會立即重發。
+        """
+        self.manager = manager
+        self.channel = channel
+        self.status_sources = dict(status_sources or {})
+        self.snapshot_interval = snapshot_interval
+        self.poll = poll
+        # 指令並行執行：查歷史不必排在手動執行一輪後面（與原本 gunicorn 多執行緒相同）
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="runner-cmd")
+        self._stop = threading.Event()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_due = 0.0
+        self._purged_at = 0.0
+
+    def handle(self, command: str, args: Dict):
+        if command not in self.COMMANDS:
+            raise RunnerError(f"不支援的指令: {command}")
+        method = getattr(self.manager, command)
+        if command in ("create_strategy", "update_strategy"):
+            return method(TradingStrategyConfig(**args["config"]))
+        return method(**args)
+
+    def _run(self, command_id: int, command: str, args: Dict) -> None:
+        try:
+            result = self.handle(command, args)
+        except Exception as e:
+            logger.exception("執行指令 %s 失敗", command)
+            self.channel.finish(command_id, error=str(e) or e.__class__.__name__)
+            return
+        self.channel.finish(command_id, result)
+        if command in self.MUTATIONS:
+            self._snapshot_due = 0.0
+
+    def publish_snapshot(self) -> None:
+        """發布策略列表、整體統計與其他狀態；上一份還在產生時略過。"""
+        if not self._snapshot_lock.acquire(blocking=False):
+            return
+        try:
+            self._snapshot_due = time.monotonic() + self.snapshot_interval
+            self.channel.publish("strategies", self.manager.get_all_strategies())
+            self.channel.publish("stats", self.manager.get_trading_stats())
+            self.channel.publish("strategy_stats", self.manager.get_all_trading_stats())
+            for key, source in self.status_sources.items():
+                try:
+                    self.channel.publish(key, source())
+                except Exception as e:
+                    logger.warning("發布 %s 狀態失敗: %s", key, e)
+        except Exception:
+            logger.exception("發布策略快照失敗")
+        finally:
+            self._snapshot_lock.release()
+
+    def run_once(self) -> int:
+        """一次輪詢：心跳、取出並派發指令、必要時發布快照；回傳派發的指令數。"""
+        self.channel.publish("heartbeat", {"pid": os.getpid(), "at": time.time()})
+        commands = self.channel.claim()
+        for command in commands:
+            self._executor.submit(self._run, command["id"], command["command"], command["args"])
+        if time.monotonic() >= self._snapshot_due:
+            self._executor.submit(self.publish_snapshot)
+        if time.monotonic() - self._purged_at > 600:
+            self._purged_at = time.monotonic()
+            self.channel.purge()
+        return len(commands)
+
+    def serve_forever(self) -> None:
+        logger.info("策略執行程序已啟動（pid %s），指令通道 %s", os.getpid(), self.channel.database_path)
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("處理指令通道失敗")
+            self._stop.wait(self.poll)
+        self._executor.shutdown(wait=True)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+class RemoteStrategyManager:
+    """web worker 端的 StrategyManager 替身：提供 app.py 用到的介面，實際工作交給 runner。
+
+    列表與統計讀 runner 發布的快照；編輯頁的設定直接讀設定檔；其餘經指令通道。
+    變更類操作失敗時與 StrategyManager 一樣記錄錯誤並回傳 False；查詢類操作在 runner
+    未執行或逾時時記錄錯誤並回傳空結果，頁面照常顯示。
+    """
+
+    def __init__(self, channel: RunnerChannel, timeout: float = 10.0, execute_timeout: float = 90.0):
+        self.channel = channel
+        self.timeout = timeout
+        self.execute_timeout = execute_timeout
+        self.logger = logging.getLogger("strategy_manager.remote")
+
+    def _mutate(self, command: str, args: Dict) -> bool:
+        try:
+            return bool(self.channel.call(command, args, self.timeout))
+        except RunnerError as e:
+            self.logger.error(f"{command} 失敗: {e}")
+            return False
+
+    def create_strategy(self, config: TradingStrategyConfig) -> bool:
+        return self._mutate("create_strategy", {"config": config.to_dict()})
+
+    def update_strategy(self, config: TradingStrategyConfig) -> bool:
+        return self._mutate("update_strategy", {"config": config.to_dict()})
+
+    def delete_strategy(self, strategy_name: str) -> bool:
+        return self._mutate("delete_strategy", {"strategy_name": strategy_name})
+
+    def enable_strategy(self, strategy_name: str) -> bool:
+        return self._mutate("enable_strategy", {"strategy_name": strategy_name})
+
+    def disable_strategy(self, strategy_name: str) -> bool:
+        return self._mutate("disable_strategy", {"strategy_name": strategy_name})
+
+    def get_strategy(self, strategy_name: str):
+        """只提供 .config（編輯頁用）；策略物件本身只存在於 runner。"""
+        config = TradingStrategyConfig.load(strategy_name)
+        return SimpleNamespace(config=config) if config else None
+
+    def get_all_strategies(self) -> List[Dict]:
+        return self.channel.read("strategies", [])
+
+    def get_trading_stats(self, strategy_name: Optional[str] = None) -> Dict:
+        """整體或單一策略的統計：讀快照，快照缺漏時才問 runner。"""
+        if strategy_name is None:
+            stats = self.channel.read("stats")
+        else:
+            stats = self.channel.read("strategy_stats", {}).get(strategy_name)
+        if stats is not None:
+            return stats
+        try:
+            return self.channel.call("get_trading_stats", {"strategy_name": strategy_name}, self.timeout)
+        except RunnerError as e:
+            self.logger.error(f"get_trading_stats 失敗: {e}")
+            return empty_trading_stats()
+
+    def get_trading_history_page(self, strategy_name: Optional[str] = None, start: Optional[str] = None,
+                                 end: Optional[str] = None, cursor: Optional[str] = None,
+                                 limit: Optional[int] = 500) -> Dict:
+        try:
+            return self.channel.call("get_trading_history_page", {
+                "strategy_name": strategy_name, "start": start, "end": end,
+                "cursor": cursor, "limit": limit,
+            }, self.timeout)
+        except RunnerError as e:
+            self.logger.error(f"get_trading_history_page 失敗: {e}")
+            return {"records": [], "next_cursor": None, "error": str(e)}
+
+    def execute_all_strategies(self) -> List[Dict]:
+        return self.channel.call("execute_all_strategies", {}, self.execute_timeout)
+
+    def status(self, key: str) -> Optional[Dict]:
+        """runner 發布的其他狀態（scheduler、market_stream ...）。"""
+        return self.channel.read(key)
@@ -0,0 +1,248 @@
+"""伺服器端策略排程：固定週期執行 StrategyManager.execute_all_strategies。
+
+原本策略一輪是由瀏覽器分頁每 60 秒 POST /api/execute_strategies 觸發：沒開頁面就不交易，
+開三個分頁就多打三倍。改由 process 內的背景執行緒排程：
+
+- 週期 interval 秒，每輪再加 0~jitter 秒的隨機延遲，避免與其他定時工作同步撞在整點；
+- 排程以「預定時間」為基準（不因每輪耗時而漂移）；一輪耗時超過週期視為超時（overrun），
+  錯過的時段直接跳過、不補跑，並計入統計；
+- 多個 gunicorn worker 以檔案鎖（fcntl.flock）選出唯一的 leader 執行，其餘 worker 待命，
+  每個週期重試取鎖，leader 結束時由待命者接手。沒有 fcntl 的平台（Windows）一律視為 leader；
+- leader 每輪把統計寫到鎖檔旁的 JSON，任何 worker 收到狀態查詢都能回報；
+- wake() 讓 leader 提前跑一輪（例如使用者剛按下 Telegram 確認），不影響原本的預定時段；
+- run_now() 給手動觸發（POST /api/execute_strategies）：與排程同一把選主鎖，其他 worker 是 leader
+  時不執行，避免手動的一輪與 leader 的一輪在不同 process 同時跑。排程停用（沒有 start）時
+  只在執行期間持有鎖。
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:          # Windows：無法跨 process 選主，只能單一 process 部署
+    fcntl = None
+
+logger = logging.getLogger("strategy_scheduler")
+
+
+class StrategyScheduler:
+    def __init__(self, run_cycle, lock_path, interval=60, jitter=5):
+        """
+        run_cycle: 無參數 callable，執行一輪策略並回傳結果清單（execute_all_strategies）。
+        lock_path: 選主用的鎖檔路徑；統計寫在同名 .json 檔。
+        interval:  週期秒數；jitter: 每輪額外隨機延遲的上限秒數。
+        """
+        self.run_cycle = run_cycle
+        self.lock_path = lock_path
+        self.status_path = os.path.splitext(lock_path)[0] + ".json"
+        self.interval = max(float(interval), 1.0)
+        self.jitter = min(max(float(jitter), 0.0), self.interval / 2)
+        self._fd = None
+        self._lead_lock = threading.Lock()     # 排程執行緒與手動觸發同時取鎖/放鎖
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._stats = {
+            "role": "stopped",
+            "pid": os.getpid(),
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "cycles": 0,
+            "wakeups": 0,
+            "errors": 0,
+            "overruns": 0,
+            "skipped": 0,
+            "last_started_at": None,
+            "last_duration": None,
+            "max_duration": None,
+            "avg_duration": None,
+            "last_results": {},
+            "last_error": None,
+            "next_run_at": None,
+        }
+
+    # ── 選主 ──────────────────────────────────────────────────
+    def _try_lead(self):
+        """嘗試取得 leader 鎖（非阻塞）；已經是 leader 時直接回 True。"""
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        logger.info("策略排程：取得 leader 鎖（pid %s）", os.getpid())
+        return True
+
+    def _release(self):
+        if self._fd is not None and self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # ── 執行一輪 ──────────────────────────────────────────────
+    def run_once(self):
+        """執行一輪並更新統計；例外只記錄，不中斷排程。"""
+        started_wall = datetime.now().isoformat(timespec="seconds")
+        started = time.monotonic()
+        error = None
+        counts = {}
+        try:
+            for result in self.run_cycle() or []:
+                action = result.get("action", "unknown")
+                counts[action] = counts.get(action, 0) + 1
+        except Exception as e:
+            logger.exception("策略排程執行失敗")
+            error = str(e)
+        duration = time.monotonic() - started
+
+        with self._lock:
+            s = self._stats
+            s["cycles"] += 1
+            s["last_started_at"] = started_wall
+            s["last_duration"] = round(duration, 3)
+            s["max_duration"] = round(max(duration, s["max_duration"] or 0.0), 3)
+            previous = s["avg_duration"]
+            s["avg_duration"] = round(duration if previous is None else previous * 0.8 + duration * 0.2, 3)
+            s["last_results"] = counts
+            if error:
+                s["errors"] += 1
+                s["last_error"] = error
+            if duration > self.interval:
+                s["overruns"] += 1
+                logger.warning("策略排程超時：本輪耗時 %.1f 秒，超過週期 %.0f 秒", duration, self.interval)
+        return duration
+
+    def run_now(self):
+        """手動執行一輪並回傳結果清單；其他 process 持有選主鎖（別的 worker 是 leader）時回傳 None。"""
+        with self._lead_lock:
+            if not self._try_lead():
+                return None
+            temporary = not self.running
+        try:
+            return self.run_cycle()
+        finally:
+            if temporary:
+                with self._lead_lock:
+                    if not self.running:
+                        self._release()
+
+    def _next_slot(self, planned, now):
+        """下一個預定時間；超時錯過的時段直接跳過（計入 skipped）。"""
+        planned += self.interval
+        if planned < now:
+            missed = int((now - planned) // self.interval) + 1
+            planned += missed * self.interval
+            with self._lock:
+                self._stats["skipped"] += missed
+        return planned
+
+    def _write_status(self):
+        payload = self.stats()
+        tmp = f"{self.status_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp, self.status_path)
+        except OSError as e:
+            logger.warning("寫入排程狀態失敗：%s", e)
+
+    # ── 主迴圈 ────────────────────────────────────────────────
+    def _loop(self):
+        planned = time.monotonic()
+        while not self._stop.is_set():
+            with self._lead_lock:
+                leading = self._try_lead()
+            if not leading:
+                self._set_role("standby")
+                self._stop.wait(self.interval)
+                self._wake.clear()
+                planned = time.monotonic()
+                continue
+            self._set_role("leader")
+            delay = planned + random.uniform(0, self.jitter) - time.monotonic()
+            self._set_next_run(delay)
+            woken = delay > 0 and self._wake.wait(delay)
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            self.run_once()
+            if woken:
+                with self._lock:
+                    self._stats["wakeups"] += 1
+            if not (woken and planned > time.monotonic()):
+                planned = self._next_slot(planned, time.monotonic())
+            self._set_next_run(planned - time.monotonic())
+            self._write_status()
+        with self._lead_lock:
+            self._release()
+        self._set_role("stopped")
+
+    def _set_role(self, role):
+        with self._lock:
+            self._stats["role"] = role
+
+    def _set_next_run(self, delay):
+        with self._lock:
+            self._stats["next_run_at"] = datetime.fromtimestamp(
+                time.time() + max(delay, 0)).isoformat(timespec="seconds")
+
+    def wake(self):
+        """要求提前執行一輪（只對 leader 有效；待命 worker 的喚醒會被忽略）。"""
+        self._wake.set()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._loop, name="strategy-scheduler", daemon=True)
+        self._thread.start()
+        logger.info("策略排程已啟動，週期 %.0f 秒、隨機延遲 0~%.0f 秒", self.interval, self.jitter)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=10)
+        self._thread = None
+
+    # ── 狀態 ──────────────────────────────────────────────────
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, last_results=dict(self._stats["last_results"]))
+
+    def status(self):
+        """給儀表板：leader 回報自己的統計；待命 worker 讀 leader 寫的狀態檔。"""
+        own = self.stats()
+        if own["role"] == "leader" or not os.path.exists(self.status_path):
+            return own
+        try:
+            with open(self.status_path, encoding="utf-8") as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            return own
+        shared["worker_role"] = own["role"]
+        return shared
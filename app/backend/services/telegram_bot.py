@@ -1,9 +1,12 @@
 import logging
 import threading
 from typing import Dict, Optional
-import requests
+from ..utils import http_metrics
 from ..utils.telegram_handler import callback_handler
-from ..utils.config_loader import load_config
+from ..utils.config_loader import config_service
+
+_session = http_metrics.session("telegram")
+
 
 class TelegramBotService:
     def __init__(self):
@@ -12,7 +15,7 @@ class TelegramBotService:
         self._thread = None
 
         # 載入配置（金鑰命名由 config_loader 統一正規化、路徑自動解析）
-        cfg = load_config()
+        cfg = config_service.get()
         self.bot_token = cfg.get("telegram_bot_token") or None
         self.chat_id = cfg.get("telegram_chat_id") or None
         if not self.bot_token or not self.chat_id:
@@ -29,7 +32,7 @@ class TelegramBotService:
             params['offset'] = offset
             
         try:
-            response = requests.get(url, params=params)
+            response = _session.get(url, params=params)
             return response.json().get('result', [])
         except Exception as e:
             self.logger.error(f"獲取Telegram更新失敗: {e}")
@@ -60,7 +63,7 @@ class TelegramBotService:
                 'text': response_text,
                 'parse_mode': 'HTML'
             }
-            requests.post(url, json=data)
+            _session.post(url, json=data)
             
             # 回應回調查詢
             url = f"https://api.telegram.org/bot{self.bot_token}/answerCallbackQuery"
@@ -68,7 +71,7 @@ class TelegramBotService:
                 'callback_query_id': query['id'],
                 'text': response_text
             }
-            requests.post(url, json=data)
+            _session.post(url, json=data)
             
         except Exception as e:
             self.logger.error(f"處理回調查詢失敗: {e}")
@@ -12,11 +12,11 @@ import time
 import logging
 import datetime
 
-import requests
-
+from ..utils import http_metrics
 from ..utils.paths import records_dir
 
 logger = logging.getLogger("twse_data")
+_session = http_metrics.session("twse")
 
 _URL = "https://www.twse.com.tw/exchangeReport/STOCK_DAY"
 _HEADERS = {"User-Agent": "Mozilla/5.0 (RoosterTrade backtest)"}
@@ -60,7 +60,7 @@ def _save_cache(stock_no, cache):
 def _fetch_month(stock_no, year, month):
     """抓單月每日 OHLC，回傳 [{date, open, high, low, close}]。"""
     date_param = f"{year:04d}{month:02d}01"
-    r = requests.get(
+    r = _session.get(
         _URL,
         params={"response": "json", "date": date_param, "stockNo": stock_no},
         headers=_HEADERS, timeout=20,
@@ -11,11 +11,11 @@ import json
 import time
 import logging
 
-import requests
-
+from ..utils import http_metrics
 from ..utils.paths import records_dir
 
 logger = logging.getLogger("twse_stocks")
+_session = http_metrics.session("twse")
 
 _URL = "https://openapi.twse.com.tw/v1/opendata/t187ap03_L"      # 上市公司
 _ETF_URL = "https://openapi.twse.com.tw/v1/ETFReport/ETFRank"   # 熱門 ETF（前 20）
@@ -42,7 +42,7 @@ def _save_file(payload):
 
 
 def _fetch():
-    r = requests.get(_URL, headers=_HEADERS, timeout=20)
+    r = _session.get(_URL, headers=_HEADERS, timeout=20)
     r.raise_for_status()
     by_code = {}
     for row in r.json():
@@ -53,7 +53,7 @@ def _fetch():
 
     # 併入熱門 ETF（t187ap03_L 只含上市公司、不含 ETF）。抓失敗就略過。
     try:
-        er = requests.get(_ETF_URL, headers=_HEADERS, timeout=15)
+        er = _session.get(_ETF_URL, headers=_HEADERS, timeout=15)
         er.raise_for_status()
         for row in er.json():
             code = (row.get("ETFsSecurityCode") or "").strip()
@@ -10,9 +10,10 @@ import logging
 import threading
 import time
 
-import requests
+from ..utils import http_metrics
 
 logger = logging.getLogger("us_quote")
+_session = http_metrics.session("yahoo")
 
 _HOSTS = ("https://query1.finance.yahoo.com", "https://query2.finance.yahoo.com")
 _PATH = "/v8/finance/chart/{symbol}?interval=1d&range=1d"
@@ -30,7 +31,7 @@ def _fetch(symbol):
     for host in _HOSTS:
         url = host + _PATH.format(symbol=symbol)
         try:
-            response = requests.get(url, headers=_HEADERS, timeout=_TIMEOUT)
+            response = _session.get(url, headers=_HEADERS, timeout=_TIMEOUT)
             response.raise_for_status()
             payload = response.json()
             chart = payload.get("chart") or {}
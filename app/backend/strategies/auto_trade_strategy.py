@@ -1,38 +1,44 @@
 import logging
 import datetime
-from typing import Optional
+from typing import Optional, Tuple
 from ..models.strategy_config import TradingStrategyConfig
 from ..utils.trading_record import TradingRecord
 from ..utils.notification import TelegramNotifier
 from ..utils.telegram_handler import callback_handler
-from ..utils.config_loader import load_config
+from ..utils.config_loader import config_service
+from ..services.price_service import PriceService
 from .maker_orders import MakerOrderManager
 
 # MAX taker 費率（市價單，如停利全數賣出）
 TAKER_FEE_RATE = 0.0015
 
+# notifier 參數未指定時改用 config_service 的共用實例（明確傳 None 表示停用通知）
+_SHARED = object()
+
 class AutoTradeStrategy:
-    def __init__(self, client, config: TradingStrategyConfig, strategy_manager=None):
+    def __init__(self, client, config: TradingStrategyConfig, strategy_manager=None,
+                 price_service: Optional[PriceService] = None,
+                 notifier: Optional[TelegramNotifier] = _SHARED):
         self.client = client
         self.config = config
         self.logger = logging.getLogger(f"strategy.{config.strategy_name}")
         self.trading_record = TradingRecord(config.strategy_name)
         self.strategy_manager = strategy_manager
+        # 現價改走共用的價格服務（同市場多策略合併成一次請求）；單獨建立時自帶一份
+        self.price_service = (price_service
+                              or getattr(strategy_manager, 'price_service', None)
+                              or PriceService(client))
 
-        # 初始化 Telegram 通知（金鑰命名由 config_loader 統一正規化）
-        cfg = load_config()
-        token = cfg.get("telegram_bot_token")
-        chat_id = cfg.get("telegram_chat_id")
-        if token and chat_id:
-            self.notifier = TelegramNotifier(token, chat_id)
-        else:
+        # Telegram 通知由呼叫端注入（StrategyManager 傳入共用實例），不再每個策略各讀一次設定檔
+        self.notifier = config_service.notifier() if notifier is _SHARED else notifier
+        if self.notifier is None:
             self.logger.info("未設定 Telegram 金鑰，停用交易通知")
-            self.notifier = None
 
         # 再平衡改用預掛 maker 限價單（取代原本的市價 taker）
         self.maker = MakerOrderManager(
             self.client, self.config, self.trading_record,
             notifier=self.notifier, logger=self.logger,
+            price_service=self.price_service,
         )
     
     def get_current_market_value(self) -> Optional[float]:
@@ -48,10 +54,7 @@ class AutoTradeStrategy:
         """獲取當前價格"""
         market = f"{self.config.coin_type.lower()}twd"
         try:
-            trades = self.client.get_trades(market, limit=1)
-            if trades and len(trades) > 0:
-                return float(trades[0]['price'])
-            raise ValueError(f"無法獲取{market}的最新成交價格")
+            return self.price_service.get_price(market)
         except Exception as e:
             self.logger.error(f"獲取價格時發生錯誤: {market} - {e}")
             raise
@@ -60,8 +63,13 @@ class AutoTradeStrategy:
         """獲取幣種餘額"""
         return self.trading_record.get_current_balance()
 
-    def execute_trade(self, action: str, volume: float, force_confirm: bool = False) -> bool:
-        """執行交易"""
+    def execute_trade(self, action: str, volume: float, force_confirm: bool = False,
+                      purpose: str = 'rebalance') -> bool:
+        """執行交易
+
+        purpose 標記觸發原因（'rebalance' / 'take_profit'），記在待確認意圖裡，
+        條件不再成立時由對應的檢查讓意圖失效（_expire_intent）。
+        """
         try:
             market = f"{self.config.coin_type.lower()}twd"
             current_price = self.get_current_price()
@@ -94,43 +102,28 @@ class AutoTradeStrategy:
                         self.notifier.send_trade_result(self.config.strategy_name, False, error_msg)
                     return False
 
-            # 如果需要確認或強制確認，發送交易確認請求
+            # 需要確認時不阻塞等待：第一次送出確認請求並記下待確認意圖，
+            # 之後的週期讀到使用者答覆（確認/取消/逾時）再繼續，其他策略不受影響
             if need_confirm or force_confirm:
-                # 準備交易信息
-                trade_info = {
-                    'strategy_name': self.config.strategy_name,
-                    'action': action,
-                    'volume': volume,
-                    'coin_type': self.config.coin_type,
-                    'price': current_price,
-                    'total_amount': trade_amount,
-                    'reason': reason if need_confirm else None
-                }
-                
-                # 添加到待確認隊列
-                trade_id = callback_handler.add_pending_trade(
-                    self.config.strategy_name, 
-                    trade_info
-                )
-                
-                # 發送確認請求，傳入trade_id
-                self.notifier.send_trade_confirmation(
-                    self.config.strategy_name,
-                    action,
-                    volume,
-                    self.config.coin_type,
-                    current_price,
-                    trade_id
-                )
-                
-                self.logger.info("已發送交易確認請求，等待用戶確認...")
-                
-                # 等待用戶確認（最多等待5分鐘）
-                confirmation = callback_handler.wait_for_confirmation(trade_id, timeout=300)
-                
-                if confirmation is None:
-                    error_msg = "交易確認超時，取消交易"
-                    self.logger.warning(error_msg)
+                intent = callback_handler.get_intent(self.config.strategy_name)
+                if intent is not None and intent['info'].get('action') != action:
+                    # 行情反轉，舊的意圖已不適用
+                    callback_handler.resolve(intent['trade_id'])
+                    intent = None
+
+                if intent is None:
+                    self._request_confirmation(action, volume, current_price, trade_amount,
+                                               reason if need_confirm else None, purpose)
+                    return False
+
+                if intent['status'] == 'pending':
+                    self.logger.info(f"交易 {intent['trade_id']} 仍在等待用戶確認")
+                    return False
+
+                callback_handler.resolve(intent['trade_id'])
+                if intent['status'] != 'confirmed':
+                    error_msg = "交易確認超時，取消交易" if intent['status'] == 'expired' else "用戶取消交易"
+                    self.logger.info(error_msg)
                     if self.notifier:
                         self.notifier.send_trade_result(
                             self.config.strategy_name,
@@ -138,16 +131,16 @@ class AutoTradeStrategy:
                             error_msg
                         )
                     return False
-                    
-                if not confirmation:
-                    error_msg = "用戶取消交易"
+                # 等待確認期間 maker 可能已成交：數量不超過使用者確認時看到的、本輪重新算出的，
+                # 賣出也不超過目前持倉
+                volume = min(float(intent['info']['volume']), volume)
+                if action == 'sell':
+                    volume = min(volume, self.trading_record.get_current_balance())
+                if volume <= 1e-12:
+                    error_msg = "確認期間持倉已變動，沒有可賣出的數量，取消交易"
                     self.logger.info(error_msg)
                     if self.notifier:
-                        self.notifier.send_trade_result(
-                            self.config.strategy_name,
-                            False,
-                            error_msg
-                        )
+                        self.notifier.send_trade_result(self.config.strategy_name, False, error_msg)
                     return False
 
             # 用戶確認後執行交易
@@ -191,14 +184,69 @@ class AutoTradeStrategy:
                 )
             return False
 
-    def check_and_trade(self) -> Optional[str]:
+    def _request_confirmation(self, action: str, volume: float, price: float,
+                              total_amount: float, reason: Optional[str],
+                              purpose: str = 'rebalance') -> Optional[str]:
+        """記下待確認意圖並發送 Telegram 確認請求，回傳 trade_id（無法發送時回傳 None）"""
+        if not self.notifier:
+            self.logger.warning("此交易需要 Telegram 確認，但未設定 Telegram 金鑰，略過")
+            return None
+        trade_info = {
+            'strategy_name': self.config.strategy_name,
+            'action': action,
+            'volume': volume,
+            'coin_type': self.config.coin_type,
+            'price': price,
+            'total_amount': total_amount,
+            'reason': reason,
+            'purpose': purpose,
+        }
+        trade_id = callback_handler.add_pending_trade(self.config.strategy_name, trade_info)
+        self.notifier.send_trade_confirmation(
+            self.config.strategy_name,
+            action,
+            volume,
+            self.config.coin_type,
+            price,
+            trade_id
+        )
+        self.logger.info(f"已發送交易確認請求 {trade_id}，收到答覆後於下一輪執行")
+        return trade_id
+
+    def _expire_intent(self, purpose: str, reason: str) -> None:
+        """觸發條件已不成立：讓同一原因的待確認意圖失效，之後條件再成立會重新請求確認。"""
+        intent = callback_handler.get_intent(self.config.strategy_name)
+        if intent is None or intent['info'].get('purpose', 'rebalance') != purpose:
+            return
+        callback_handler.resolve(intent['trade_id'])
+        message = f"交易 {intent['trade_id']} 已失效：{reason}"
+        self.logger.info(message)
+        if self.notifier:
+            self.notifier.send_trade_result(self.config.strategy_name, False, message)
+
+    def check_and_trade(self, open_orders=None) -> Optional[str]:
         """執行一個 poll cycle：對帳 maker 掛單成交並重掛目標掛單。
 
         定值再平衡的觸發價與量都可事先算死，因此改用預掛限價單（maker）
         取代原本的市價 taker：賺 maker 費率、成交價更精準。實際的下單/撤單/
         成交對帳邏輯都在 MakerOrderManager。
+
+        open_orders 為 StrategyManager 每市場預先查好的掛單列表（可為 None）。
+        """
+        return self.maker.sync(open_orders)
+
+    def trigger_levels(self) -> Optional[Tuple[float, float]]:
+        """(低, 高) 觸發價：現價落在兩者之間時，本策略不會成交也不會停利，這一輪可以略過。
+
+        低 = maker 買單價；高 = maker 賣單價與停利價（持倉市值達停利金額的價格）較低者。
+        None 表示無法預知，每輪都要執行。
         """
-        return self.maker.sync()
+        levels = self.maker.trigger_levels()
+        balance = self.trading_record.get_current_balance()
+        if levels is None or balance <= 1e-12:
+            return None
+        low, high = levels
+        return low, min(high, self.config.take_profit / balance)
 
     def check_and_trade_taker(self) -> Optional[str]:
         """[已停用] 原始的市價 taker 再平衡，保留供對照/回退。"""
@@ -218,7 +266,9 @@ class AutoTradeStrategy:
                 deviation_percent = abs((current_value - target_value) / target_value * 100)
             
             # 如果偏差超過設定的自動交易百分比，執行交易
-            if deviation_percent > self.config.auto_trade_percent:
+            if deviation_percent <= self.config.auto_trade_percent:
+                self._expire_intent('rebalance', "偏差已回到自動交易範圍內")
+            else:
                 if current_value < target_value:
                     # 需要買入
                     buy_amount = target_value - current_value
@@ -260,16 +310,20 @@ class AutoTradeStrategy:
                 self.logger.error("無法獲取當前市值，跳過停利檢查")
                 return None
                 
-            if current_value >= self.config.take_profit:
+            if current_value < self.config.take_profit:
+                self._expire_intent('take_profit', "持倉市值已低於停利金額")
+            else:
                 # 全部賣出
                 balance = self.get_coin_balance()
-                if balance > 0 and self.execute_trade('sell', balance):
+                if balance > 0 and self.execute_trade('sell', balance, purpose='take_profit'):
+                    # 實際賣出量可能小於 balance（依使用者確認時的數量）
+                    sold = balance - self.get_coin_balance()
                     # 停利後自動停用策略
                     if self.strategy_manager:
                         self.strategy_manager.disable_strategy(self.config.strategy_name)
-                        message = f"達到停利條件，賣出全部持倉: {balance} {self.config.coin_type}，策略已自動停用"
+                        message = f"達到停利條件，賣出全部持倉: {sold} {self.config.coin_type}，策略已自動停用"
                     else:
-                        message = f"達到停利條件，賣出全部持倉: {balance} {self.config.coin_type}"
+                        message = f"達到停利條件，賣出全部持倉: {sold} {self.config.coin_type}"
                     
                     # 發送通知
                     if self.notifier:
@@ -11,38 +11,203 @@
 
 每個 poll cycle 呼叫一次 sync()：
   1. reconcile()：查掛單狀態，偵測（含部分）成交並記錄，清掉已結束的單。
+     StrategyManager 會每個市場只查一次 get_orders(market, 'wait') 傳進來，
+     這裡只對「已不在掛單列表」的單個別 get_order 取最終成交量。
   2. 依階段：_manage_build()(建倉) 或 _place_targets()(再平衡)。
 
-狀態（掛單 id、phase、開倉均價）持久化到 records/maker_orders_<策略>.json，
-重啟後可對帳，避免重複掛單或留下孤兒單。
+有私有 WebSocket 串流時，StrategyManager 會把訂單事件轉給 on_order_update()，
+成交記錄與重掛在事件到達時立即完成；輪詢 sync() 仍保留作為安全網。
+兩條路徑以同一把 RLock 串行化，避免重複記帳或重複掛單。
+
+每次 sync 後記下觸發價位 trigger_levels()（目前掛著的買、賣單價格）：兩次成交之間
+應掛的單完全由持倉決定、不會改變，StrategyManager 的事件驅動模式據此只在價格接近
+觸發價或收到訂單事件時才呼叫 sync()。
+
+同市場有多個策略且啟用淨額化時，交易階段的掛單改由 order_netting.NettingBook 合併代掛
+（netting 不為 None），本管理器只負責對帳並撤掉自己殘留的單。
+
+狀態（掛單 id、phase、開倉均價）與成交記錄一起存在 SQLite（utils/trade_store），
+重啟後可對帳，避免重複掛單或留下孤兒單。送單結果不明的掛單以 client_oid 為鍵、
+pending 狀態記在 tracked，對回訂單 id 之前那一邊不撤也不重掛。
 """
-import os
 import json
 import datetime
 import logging
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ..utils.trade_store import TradeStore, get_trade_store
 
-from ..utils.paths import records_dir
 
 # 價量比對容差：價格 1bp、量 0.1% 以內視為「已是目標掛單」，不重掛，避免每輪 churn。
 _PRICE_TOL = 1e-4
 _VOL_TOL = 1e-3
 
+# 結果不明的掛單送出後多久內，client_oid 查詢回 404 仍不算數（交易所可能還沒寫入）
+PENDING_GRACE = 30.0
+
 # MAX maker 費率（預掛限價單成交走 maker）
 MAKER_FEE_RATE = 0.0005
 
 
+# 撤單/重掛的並行執行緒池（所有策略共用；每個策略一次最多佔兩條：買、賣各一）
+_REQUOTE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="maker-requote")
+
+
+def new_client_oid():
+    """自訂訂單編號：掛單請求結果不明時，用它查回訂單或安全重送（交易所拒絕重複編號）。"""
+    return f"rt-{uuid.uuid4().hex}"
+
+
+def group_id_for(strategy_name):
+    """策略名稱 → 穩定的正整數群組 id（CRC32，落在 1..2^31-1）。"""
+    return (zlib.crc32(strategy_name.encode("utf-8")) & 0x7FFFFFFF) or 1
+
+
+def lookup_client_oid(client, client_oid):
+    """用 client_oid 查回訂單；client 不支援或查不到回傳 None。"""
+    lookup = getattr(client, "get_order_by_client_oid", None)
+    if lookup is None:
+        return None
+    try:
+        order = lookup(client_oid)
+    except Exception:
+        return None
+    return order if order and order.get("id") is not None else None
+
+
+def _http_status(error):
+    """沿著 __cause__/__context__ 找原始的 requests 例外並回傳狀態碼。
+
+    HTTPError 回傳 HTTP 狀態碼（沒有回應為 0）；逾時、連線中斷回傳 -1；其他例外回傳 None。
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, requests.HTTPError):
+            return error.response.status_code if error.response is not None else 0
+        if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+            return -1
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def is_ambiguous_error(error):
+    """送單例外是否「結果不明」：逾時、連線中斷或 5xx，交易所可能已經收單。
+
+    ClientV3 會把 requests 的例外包成一般 Exception，這裡沿著 __cause__/__context__ 找原始例外。
+    4xx（餘額不足、低於最小量、價格不合法等）與其他例外都是確定被拒，回傳 False。
+    """
+    status = _http_status(error)
+    return status is not None and (status <= 0 or status >= 500)
+
+
+def place_limit_order(client, market, side, price, volume, group_id, logger):
+    """送出限價單（帶群組 id 與 client_oid）；回傳 (訂單, client_oid)，結果不明時訂單為 None。
+
+    逾時、連線中斷或 5xx 時結果不明（可能已掛在交易所），先用 client_oid 查回；
+    查不到就用同一個 client_oid 重送一次。重送被拒可能是交易所拒絕重複編號（第一次其實已生效），
+    所以再查一次；仍查不回就回傳 None，呼叫端要以 pending 狀態追蹤這個 client_oid（pending_order），
+    下輪對帳再認領，不能當成掛單失敗而另掛一張。
+    第一次送單就 4xx 等確定被拒的錯誤直接丟出，不查詢也不重送。
+    """
+    client_oid = new_client_oid()
+    for attempt in range(2):
+        try:
+            order = client.create_order(
+                market=market, side=side, volume=volume, price=price,
+                order_type="limit", group_id=group_id, client_oid=client_oid,
+            )
+            return order, client_oid
+        except Exception as e:
+            if attempt == 0 and not is_ambiguous_error(e):
+                raise
+            order = lookup_client_oid(client, client_oid)
+            if order is not None:
+                return order, client_oid
+            if attempt == 1:
+                logger.warning(f"掛 {side} 限價單結果不明（client_oid={client_oid}），下輪對帳再認領: {e}")
+    return None, client_oid
+
+
+def pending_order(side, price, volume, client_oid, **extra):
+    """結果不明的掛單在 tracked 裡的記錄（以 client_oid 為鍵，對回訂單 id 前不撤、不重掛）。"""
+    return dict(side=side, price=float(price), volume=float(volume), recorded=0.0, grouped=True,
+                client_oid=client_oid, pending=True, since=time.time(), **extra)
+
+
+def adopt_pending(tracked, order):
+    """訂單的 client_oid 對應到 pending 記錄時改以訂單 id 追蹤；回傳訂單 id，沒有對應回傳 None。"""
+    client_oid = order.get("client_oid")
+    info = tracked.get(client_oid) if client_oid else None
+    if info is None or not info.get("pending") or order.get("id") is None:
+        return None
+    oid = str(order["id"])
+    del tracked[client_oid]
+    info.pop("pending", None)
+    info.pop("since", None)
+    tracked[oid] = info
+    return oid
+
+
+def claim_pending(client, tracked, open_orders, logger):
+    """對帳前先把 pending 的掛單對回交易所訂單：先找掛單列表，再以 client_oid 查詢。
+
+    對到的改以訂單 id 追蹤，之後照一般掛單記成交；交易所回 404 且已超過 PENDING_GRACE 秒
+    才視為確定沒掛上並移除；查詢失敗（逾時、5xx）保留到下輪。
+    """
+    by_client_oid = {o.get("client_oid"): o for o in open_orders or () if o.get("client_oid")}
+    for key, info in list(tracked.items()):
+        if not info.get("pending"):
+            continue
+        order = by_client_oid.get(key)
+        if order is None:
+            try:
+                order = client.get_order_by_client_oid(key)
+            except Exception as e:
+                expired = time.time() - info.get("since", 0) >= PENDING_GRACE
+                if _http_status(e) == 404 and expired:
+                    tracked.pop(key, None)
+                    logger.info(f"結果不明的 {info['side']} 掛單確定未掛上（client_oid={key}）")
+                else:
+                    logger.warning(f"對回結果不明的掛單 {key} 失敗，下輪重試: {e}")
+                continue
+        oid = adopt_pending(tracked, order)
+        if oid is not None:
+            logger.info(f"結果不明的 {info['side']} 掛單已對回 (id={oid})")
+
+
 class MakerOrderManager:
-    def __init__(self, client, config, trading_record, notifier=None, logger=None):
+    def __init__(self, client, config, trading_record, notifier=None, logger=None,
+                 price_service=None):
         self.client = client
+        self.price_service = price_service
         self.config = config
         self.trading_record = trading_record
         self.notifier = notifier
         self.logger = logger or logging.getLogger(f"maker.{config.strategy_name}")
         self.market = f"{config.coin_type.lower()}twd"
-        self._state_file = os.path.join(
-            records_dir(), f"maker_orders_{config.strategy_name}.json"
-        )
-        # tracked: {order_id(str): {"side","price","volume","recorded"}}
+        # 每個策略固定的訂單群組 id：掛單都帶上它，全撤時一個 orders/clear 請求即可
+        self.group_id = group_id_for(config.strategy_name)
+        # 輪詢 sync() 與串流事件 on_order_update() 可能在不同執行緒同時進來
+        self._lock = threading.RLock()
+        # 同市場多策略淨額化時由 NettingBook 設定；不為 None 時交易階段不自行掛單
+        self.netting = None
+        # 觸發價位 (買單價, 賣單價)；None 表示無法預知（建倉中、淨額化、沒有掛單），每輪都要 sync
+        self._levels = None
+        # 市場精度目錄（tick / 數量精度 / 最小下單量），記憶體快取；舊 client 沒有則為 None
+        self.markets = getattr(client, "markets", None)
+        # 掛單狀態與成交記錄存在同一個 SQLite 儲存，成交 + 狀態可在同一交易內提交
+        store = getattr(trading_record, "store", None)
+        self.store = store if isinstance(store, TradeStore) else get_trade_store()
+        self._saved_state = None           # 最後一次寫入的狀態（沒變就不重寫）
+        # tracked: {order_id(str): {"side","price","volume","recorded"}}；
+        #          結果不明的單以 client_oid 為鍵並標記 pending，對回後改用 order_id
         # phase: "building"(建倉中) | "trading"(交易中)；open_price: 開倉均價
         self.tracked, phase, self.open_price = self._load_state()
         if phase is None:
@@ -52,31 +217,43 @@ class MakerOrderManager:
 
     # ---------- 持久化 ----------
     def _load_state(self):
-        try:
-            with open(self._state_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+        state = self.store.load_maker_state(self.config.strategy_name)
+        if state is None:
             return {}, None, 0.0
-        if isinstance(data, dict) and "tracked" in data:
-            return (data.get("tracked", {}), data.get("phase"),
-                    float(data.get("open_price", 0) or 0))
-        # 舊格式：整個 dict 即 tracked
-        return (data if isinstance(data, dict) else {}), None, 0.0
+        tracked, phase, open_price = state
+        self._saved_state = self._state_key(tracked, phase, open_price)
+        return tracked, phase, open_price
+
+    @staticmethod
+    def _state_key(tracked, phase, open_price):
+        return json.dumps([tracked, phase, open_price], sort_keys=True)
 
     def _save_state(self):
-        with open(self._state_file, "w", encoding="utf-8") as f:
-            json.dump({"tracked": self.tracked, "phase": self.phase,
-                       "open_price": self.open_price}, f, ensure_ascii=False, indent=2)
+        """寫入掛單狀態；和上次寫入的內容相同就略過（大部分輪次沒有變化）。"""
+        key = self._state_key(self.tracked, self.phase, self.open_price)
+        if key == self._saved_state:
+            return
+        self.store.save_maker_state(self.config.strategy_name, self.tracked,
+                                    self.phase, self.open_price)
+        self._saved_state = key
 
     # ---------- 工具 ----------
     def _current_price(self):
+        if self.price_service is not None:
+            return self.price_service.get_price(self.market)
         trades = self.client.get_trades(self.market, limit=1)
         if not trades:
             raise ValueError(f"無法取得 {self.market} 現價")
         return float(trades[0]["price"])
 
     def _round_price(self, p):
-        # 避免觸發交易所 tick size 限制：高價市場取整數，低價市場保留 4 位小數。
+        # 有市場精度目錄就用交易所的實際價格精度；否則退回舊的近似規則：
+        # 高價市場取整數，低價市場保留 4 位小數。
+        if self.markets is not None:
+            try:
+                return self.markets.round_price(self.market, p)
+            except Exception:
+                pass
         return float(round(p)) if p >= 1000 else float(round(p, 4))
 
     def _tick(self):
@@ -88,16 +265,39 @@ class MakerOrderManager:
     def _align(self, price):
         """把價格對齊到最小跳動單位（tick）；取不到 tick 時退回 _round_price。"""
         t = self._tick()
-        return round(price / t) * t if t and t > 0 else self._round_price(price)
+        if not t or t <= 0:
+            return self._round_price(price)
+        # 對齊後再依精度四捨五入，消除 round(p/t)*t 的浮點尾數
+        return self._round_price(round(price / t) * t)
+
+    def _size(self, price, volume):
+        """依市場數量精度捨去下單量；低於最小下單量回傳 0（不下單）。"""
+        if self.markets is None:
+            return volume
+        try:
+            volume = self.markets.round_volume(self.market, volume)
+            if volume < self.markets.min_volume(self.market, price):
+                return 0.0
+        except Exception:
+            pass
+        return volume
 
-    def _record_fill(self, side, price, volume):
-        fee = price * volume * MAKER_FEE_RATE
+    def _record_fill(self, side, price, volume, fee=None, label="Maker 成交"):
+        """寫入一筆成交並回傳通知文字（通知由呼叫端在交易提交後送出）。
+
+        fee 預設依 maker 費率計算；淨額化的內部撮合沒有經過交易所，傳 0。
+        """
+        if fee is None:
+            fee = price * volume * MAKER_FEE_RATE
         self.trading_record.add_trade_record(
             datetime.datetime.now().isoformat(), price, volume, side,
             confirmed=False, fee=fee,
         )
-        msg = f"Maker 成交 {side} {volume:.8f} {self.config.coin_type} @ {price:,.2f}"
+        msg = f"{label} {side} {volume:.8f} {self.config.coin_type} @ {price:,.2f}"
         self.logger.info(msg)
+        return msg
+
+    def _notify_fill(self, msg):
         if self.notifier:
             try:
                 self.notifier.send_trade_result(self.config.strategy_name, True, msg)
@@ -105,21 +305,79 @@ class MakerOrderManager:
                 self.logger.warning(f"成交通知失敗: {e}")
 
     # ---------- 主流程 ----------
-    def sync(self):
-        """單一 poll cycle：對帳成交 + 依階段建倉或再平衡。回傳本輪訊息（無則 None）。"""
-        try:
-            filled_msgs = self._reconcile()
-            if self.phase == "building":
-                built = self._manage_build()   # 建倉階段：只掛建倉買單，建滿才轉交易
-                if built:
-                    filled_msgs.append(built)
-            else:
-                self._place_targets()          # 交易階段：雙邊再平衡掛單
-            self._save_state()
-            return "；".join(filled_msgs) if filled_msgs else None
-        except Exception as e:
-            self.logger.error(f"maker sync 發生錯誤: {e}")
-            return None
+    def sync(self, open_orders=None):
+        """單一 poll cycle：對帳成交 + 依階段建倉或再平衡。回傳本輪訊息（無則 None）。
+
+        :param open_orders: 本市場目前的掛單列表（get_orders(market, 'wait') 的結果）；
+                            None 表示沒有預先查詢，逐張 get_order 對帳。
+        """
+        with self._lock:
+            try:
+                filled_msgs = self._reconcile(open_orders)
+                self._requote(filled_msgs)
+                self._save_state()
+                self._update_levels()
+                return "；".join(filled_msgs) if filled_msgs else None
+            except Exception as e:
+                self.logger.error(f"maker sync 發生錯誤: {e}")
+                self._levels = None
+                return None
+
+    def on_order_update(self, order):
+        """私有串流的訂單事件（REST get_order 欄位格式）。
+
+        不是本策略追蹤的單回傳 False；是的話立即對帳，有成交或單已結束就重掛，
+        回傳 True。
+        """
+        oid = str(order.get("id"))
+        with self._lock:
+            info = self.tracked.get(oid)
+            if info is None and adopt_pending(self.tracked, order) is not None:
+                info = self.tracked[oid]
+            if info is None:
+                return False
+            try:
+                messages = []
+                msg = self._apply_order(oid, info, order)
+                if msg:
+                    messages.append(msg)
+                if msg or oid not in self.tracked:
+                    self._requote(messages)
+                    self._save_state()
+                    self._update_levels()
+                if messages:
+                    self.logger.info(f"串流成交即時處理: {'；'.join(messages)}")
+            except Exception as e:
+                self.logger.error(f"處理訂單事件 {oid} 發生錯誤: {e}")
+            return True
+
+    def _update_levels(self):
+        """記下目前的觸發價位；只有交易階段、自行掛單且掛單齊全時才可預知。"""
+        self._levels = None
+        if self.phase != "trading" or self.netting is not None or not self.tracked:
+            return
+        if any(info.get("pending") for info in self.tracked.values()):
+            return                             # 結果不明的單對回前不知道實際掛價
+        prices = {info["side"]: float(info["price"]) for info in self.tracked.values()}
+        if len(prices) != len(self.tracked):
+            return                             # 同一邊有多張單（撤單失敗殘留），下輪再整理
+        self._levels = (prices.get("buy", 0.0), prices.get("sell", float("inf")))
+
+    def trigger_levels(self):
+        """(買單價, 賣單價)：現價落在兩者之間時，掛單不必重算；None 表示每輪都要 sync。
+
+        沒有買單（達加碼上限）時買方為 0，沒有賣單時賣方為 inf。
+        """
+        return self._levels
+
+    def _requote(self, messages):
+        """依階段建倉或再平衡；建倉完成的訊息附加到 messages。"""
+        if self.phase == "building":
+            built = self._manage_build()   # 建倉階段：只掛建倉買單，建滿才轉交易
+            if built:
+                messages.append(built)
+        else:
+            self._place_targets()          # 交易階段：雙邊再平衡掛單
 
     # ---------- 建倉階段 ----------
     def _manage_build(self):
@@ -129,33 +387,40 @@ class MakerOrderManager:
         balance = self.trading_record.get_current_balance()
         value = balance * price
 
-        if value >= V * 0.999:
-            # 全數建倉完成 → 撤掉殘單、記錄開倉均價、進入交易階段
-            self._cancel_all()
-            net_inv = self.trading_record.get_net_investment()
-            self.open_price = net_inv / balance if balance > 1e-12 else price
-            self.phase = "trading"
-            msg = f"全數建倉完成，開倉均價 {self.open_price:,.2f}，開始自動再平衡"
-            self.logger.info(msg)
-            if self.notifier:
-                try:
-                    self.notifier.send_trade_result(self.config.strategy_name, True, msg)
-                except Exception as e:
-                    self.logger.warning(f"建倉完成通知失敗: {e}")
-            self._place_targets()              # 立即掛出再平衡單
-            return msg
-
-        # 尚未建滿：維持一張建倉買單（量 = 補到目標市值所需）
-        build_price = self._compute_build_price(price)
-        qty = (V - value) / build_price
-        self._ensure_single_buy(build_price, qty)
-        return None
+        if value < V * 0.999:
+            # 尚未建滿：維持一張建倉買單（量 = 補到目標市值所需）
+            build_price = self._compute_build_price(price)
+            qty = (V - value) / build_price
+            if balance <= 1e-12 or self._size(build_price, qty) > 0:
+                self._ensure_single_buy(build_price, qty)
+                return None
+            # 剩餘缺口已低於交易所最小下單量，補不進去 → 視同建倉完成
+
+        # 全數建倉完成 → 撤掉殘單、記錄開倉均價、進入交易階段
+        self._cancel_all()
+        net_inv = self.trading_record.get_net_investment()
+        self.open_price = net_inv / balance if balance > 1e-12 else price
+        self.phase = "trading"
+        msg = f"全數建倉完成，開倉均價 {self.open_price:,.2f}，開始自動再平衡"
+        self.logger.info(msg)
+        if self.notifier:
+            try:
+                self.notifier.send_trade_result(self.config.strategy_name, True, msg)
+            except Exception as e:
+                self.logger.warning(f"建倉完成通知失敗: {e}")
+        self._place_targets()              # 立即掛出再平衡單
+        return msg
 
     def _compute_build_price(self, price):
         """建倉掛價：chase=買一+1tick(會變taker則改買一)；target=目標開倉價(或市價)。"""
         if self.config.build_mode == "chase":
             try:
-                depth = self.client.get_depth(self.market, limit=1)
+                # 有行情串流時直接讀本機委託簿，否則打 REST 取買一/賣一
+                depth = None
+                if self.price_service is not None:
+                    depth = self.price_service.get_top_of_book(self.market)
+                if not depth:
+                    depth = self.client.get_depth(self.market, limit=1)
                 best_bid = float(depth["bids"][0][0])
                 best_ask = float(depth["asks"][0][0])
                 tick = self._tick() or 0.0
@@ -175,52 +440,91 @@ class MakerOrderManager:
         """確保只有一張建倉買單在指定價/量；參數變了就撤掉重掛。"""
         if qty <= 0:
             return
+        if any(info.get("pending") for info in self.tracked.values()):
+            return                             # 結果不明的建倉單對回前不撤不重掛
         keep = None
-        for oid, info in list(self.tracked.items()):
+        extras = []
+        for oid, info in self.tracked.items():
             if info["side"] == "buy" and keep is None:
                 keep = oid
             else:
-                self._cancel(oid)              # 多餘的單（理論上不會有）
+                extras.append(oid)             # 多餘的單（理論上不會有）
         if keep is not None:
             info = self.tracked[keep]
             same_price = abs(float(info["price"]) - price) / price < _PRICE_TOL
             same_vol = abs(float(info["volume"]) - qty) / max(qty, 1e-9) < _VOL_TOL
             if same_price and same_vol:
+                for oid in extras:
+                    self._cancel(oid)
                 return
-            self._cancel(keep)
+        # 參數變了：建倉單連同多餘的單一次撤掉再重掛
+        self._cancel_all()
         self._place("buy", price, qty)
 
-    def _reconcile(self):
-        """查每張 tracked 單，記錄新成交（含部分），移除已結束的單。"""
+    def _reconcile(self, open_orders=None):
+        """對帳每張 tracked 單，記錄新成交（含部分），移除已結束的單。
+
+        有 open_orders 時直接用列表裡的狀態；不在列表中的單（已成交或被撤）
+        才個別 get_order 取最終成交量。
+        """
         messages = []
+        claim_pending(self.client, self.tracked, open_orders, self.logger)
+        open_by_id = None
+        if open_orders is not None:
+            open_by_id = {str(o.get("id")): o for o in open_orders}
         for oid in list(self.tracked.keys()):
             info = self.tracked[oid]
-            try:
-                o = self.client.get_order(int(oid))
-            except Exception as e:
-                self.logger.warning(f"查訂單 {oid} 失敗，下輪重試: {e}")
+            if info.get("pending"):
                 continue
-
-            state = o.get("state")
-            executed = float(o.get("executed_volume") or 0)
-            fill_price = float(o.get("avg_price") or 0) or float(info["price"])
-
-            newly = executed - float(info.get("recorded", 0))
-            if newly > 1e-12:
-                self._record_fill(info["side"], fill_price, newly)
-                info["recorded"] = executed
-                messages.append(
-                    f"{info['side']} {newly:.8f}@{fill_price:,.0f}"
-                )
-
-            remaining = o.get("remaining_volume")
-            finished = state in ("done", "cancel", "convert") or (
-                remaining is not None and float(remaining) <= 1e-12
-            )
-            if finished:
-                del self.tracked[oid]
+            o = open_by_id.get(oid) if open_by_id is not None else None
+            if o is None:
+                try:
+                    o = self.client.get_order(int(oid))
+                except Exception as e:
+                    self.logger.warning(f"查訂單 {oid} 失敗，下輪重試: {e}")
+                    continue
+            msg = self._apply_order(oid, info, o)
+            if msg:
+                messages.append(msg)
         return messages
 
+    def _apply_order(self, oid, info, o):
+        """以一筆訂單狀態更新 tracked：記錄新成交、移除已結束的單；回傳成交訊息或 None。"""
+        state = o.get("state")
+        executed = float(o.get("executed_volume") or 0)
+        fill_price = float(o.get("avg_price") or 0) or float(info["price"])
+
+        message = None
+        notice = None
+        newly = executed - float(info.get("recorded", 0))
+        remaining = o.get("remaining_volume")
+        finished = state in ("done", "cancel", "convert") or (
+            remaining is not None and float(remaining) <= 1e-12
+        )
+        if newly > 1e-12:
+            # 成交記錄與掛單的 recorded 在同一個交易提交，當機也不會重複記帳或漏記
+            recorded = info.get("recorded", 0.0)
+            try:
+                with self.store.transaction():
+                    notice = self._record_fill(info["side"], fill_price, newly)
+                    info["recorded"] = executed
+                    if finished:
+                        self.tracked.pop(oid, None)
+                    self._save_state()
+            except Exception:
+                # 交易已回滾：記憶體也回到寫入前，下輪重新記這筆成交
+                info["recorded"] = recorded
+                self.tracked[oid] = info
+                self._saved_state = None
+                self.trading_record.refresh()
+                raise
+            message = f"{info['side']} {newly:.8f}@{fill_price:,.0f}"
+        elif finished:
+            self.tracked.pop(oid, None)
+        if notice:
+            self._notify_fill(notice)
+        return message
+
     def _desired_orders(self):
         """依當前持倉算出應掛的單：{side: (price, volume)}。"""
         f = self.config.auto_trade_percent / 100.0
@@ -244,7 +548,43 @@ class MakerOrderManager:
         desired["sell"] = (p_sell, q_sell)
         return desired
 
+    # ---------- 淨額化 ----------
+    def join_netting(self, book):
+        """加入同市場的淨額化掛單簿：先對帳、撤掉自己的掛單，之後由 book 合併代掛。"""
+        with self._lock:
+            if self.netting is book:
+                return
+            self.netting = book
+            try:
+                if self.tracked:
+                    self._reconcile()
+                    self._cancel_all()
+                self._save_state()
+            except Exception as e:
+                self.logger.error(f"加入淨額化時撤單失敗，下輪重試: {e}")
+
+    def leave_netting(self):
+        """退出淨額化；下一輪 sync() 起恢復自行掛單。"""
+        with self._lock:
+            self.netting = None
+
+    def netting_desires(self):
+        """提供給 NettingBook 的目標掛單 {side: (price, volume)}；達每日次數上限時不掛。"""
+        with self._lock:
+            if self.phase != "trading":
+                return {}
+            if self.trading_record.get_today_trade_count() >= self.config.daily_trade_limit:
+                return {}
+            return {side: (price, volume) for side, (price, volume) in self._desired_orders().items()
+                    if volume > 0}
+
     def _place_targets(self):
+        if self.netting is not None:
+            # 掛單由淨額化掛單簿代掛：只清掉自己殘留的單
+            if self.tracked:
+                self._cancel_all()
+            return
+
         # 每日次數上限：達標即撤掉所有掛單、今日不再掛，待明日重啟
         if self.trading_record.get_today_trade_count() >= self.config.daily_trade_limit:
             if self.tracked:
@@ -254,9 +594,13 @@ class MakerOrderManager:
 
         desired = self._desired_orders()
         by_side = {info["side"]: oid for oid, info in self.tracked.items()}
+        # 結果不明的單對回前不撤不重掛，避免交易所上同一邊掛兩張
+        pending = {info["side"] for info in self.tracked.values() if info.get("pending")}
 
+        # 先算出每一邊要做的事：(要撤的單, 新價, 新量)；新價為 None 表示只撤不掛
+        jobs = {}
         for side, (price, volume) in desired.items():
-            if volume <= 0:
+            if volume <= 0 or side in pending:
                 continue
             existing = by_side.get(side)
             if existing is not None:
@@ -265,25 +609,77 @@ class MakerOrderManager:
                 same_vol = abs(float(info["volume"]) - volume) / max(volume, 1e-9) < _VOL_TOL
                 if same_price and same_vol:
                     continue  # 目標掛單已存在，不動
-                self._cancel(existing)  # 參數變了，撤掉重掛
-            self._place(side, price, volume)
+            jobs[side] = (existing, price, volume)  # 參數變了，撤掉重掛
 
         # 撤掉「目標已不需要」的那一邊（例如達加碼上限後的買單）
-        for side, oid in list(by_side.items()):
-            if side not in desired and oid in self.tracked:
-                self._cancel(oid)
+        for side, oid in by_side.items():
+            if side not in desired and side not in pending and oid in self.tracked:
+                jobs[side] = (oid, None, 0.0)
 
-    def _place(self, side, price, volume):
-        o = self.client.create_order(
-            market=self.market, side=side, volume=volume,
-            price=price, order_type="limit",
-        )
-        oid = str(o["id"])
-        self.tracked[oid] = {
-            "side": side, "price": float(price),
-            "volume": float(volume), "recorded": 0.0,
-        }
+        self._replace_sides(jobs)
+
+    def _replace_sides(self, jobs):
+        """兩邊的撤單→重掛並行執行（同一邊內仍依序，避免重複曝險或餘額被舊單鎖住）。
+
+        工作執行緒只打 API、不碰 tracked；全部完成後才在本執行緒套用結果：
+        撤單失敗的一邊保留舊單、不掛新單（舊單可能剛成交，下輪對帳會處理）。
+        """
+        if not jobs:
+            return
+        if len(jobs) == 1:
+            results = [self._replace_side(side, *job) for side, job in jobs.items()]
+        else:
+            futures = [_REQUOTE_POOL.submit(self._replace_side, side, *job)
+                       for side, job in jobs.items()]
+            results = [f.result() for f in futures]
+        for cancelled, placed in results:
+            if cancelled is not None:
+                self.tracked.pop(cancelled, None)
+            if placed is not None:
+                oid, info = placed
+                self.tracked[oid] = info
+
+    def _replace_side(self, side, existing, price, volume):
+        """（可在工作執行緒執行）撤掉 existing 後掛新單；回傳 (已撤的 oid, (新 oid, info))。"""
+        if existing is not None:
+            try:
+                self.client.cancel_order(int(existing))
+            except Exception as e:
+                self.logger.warning(f"撤單 {existing} 失敗，本輪不重掛 {side}: {e}")
+                return None, None
+        placed = self._submit(side, price, volume) if price is not None else None
+        return existing, placed
+
+    def _submit(self, side, price, volume):
+        """送出限價單；回傳 (oid, tracked info)，被拒或量不足回傳 None。
+
+        結果不明時回傳 (client_oid, pending 記錄)，由下輪對帳認領。
+        """
+        sized = self._size(price, volume)
+        if sized <= 0:
+            self.logger.info(f"{side} 掛單量 {volume:.8f} 低於最小下單量，略過")
+            return None
+        volume = sized
+        try:
+            order, client_oid = place_limit_order(self.client, self.market, side, price, volume,
+                                                  self.group_id, self.logger)
+        except Exception as e:
+            self.logger.error(f"掛 {side} 限價單被拒: {e}")
+            return None
+        if order is None:
+            return client_oid, pending_order(side, price, volume, client_oid)
+        oid = str(order["id"])
         self.logger.info(f"掛 {side} 限價單 {volume:.8f} @ {price:,.2f} (id={oid})")
+        return oid, {
+            "side": side, "price": float(price), "volume": float(volume),
+            "recorded": 0.0, "grouped": True, "client_oid": client_oid,
+        }
+
+    def _place(self, side, price, volume):
+        placed = self._submit(side, price, volume)
+        if placed is not None:
+            oid, info = placed
+            self.tracked[oid] = info
 
     def _cancel(self, oid):
         try:
@@ -293,5 +689,20 @@ class MakerOrderManager:
         self.tracked.pop(oid, None)
 
     def _cancel_all(self):
-        for oid in list(self.tracked.keys()):
-            self._cancel(oid)
+        """撤掉本策略所有掛單：帶群組 id 的單用一個批次撤單請求，其餘（舊資料）逐張撤。
+
+        pending 的單也在群組內、會被批次撤單撤掉，但仍留在 tracked，對回後才記得到撤單前的成交。
+        """
+        grouped = [oid for oid, info in self.tracked.items() if info.get("grouped")]
+        bulk = getattr(self.client, "cancel_orders", None)
+        if grouped and bulk is not None:
+            try:
+                bulk(market=self.market, group_id=self.group_id)
+                for oid in grouped:
+                    if not self.tracked[oid].get("pending"):
+                        self.tracked.pop(oid, None)
+            except Exception as e:
+                self.logger.warning(f"批次撤單失敗，改為逐張撤單: {e}")
+        for oid, info in list(self.tracked.items()):
+            if not info.get("pending"):
+                self._cancel(oid)
@@ -0,0 +1,382 @@
+"""同市場多策略的掛單淨額化（netting）。
+
+同一個市場（例如 btctwd）有多個策略時，各自的 MakerOrderManager 會分別掛單：
+掛單數、API 請求與手續費都按策略數倍增。NettingBook 位於它們之上，每輪：
+
+  1. 對帳自己代掛的外部單，新成交依掛單時的分配比例（allocations）拆給各策略的 TradingRecord；
+  2. 收集各成員策略的目標掛單（MakerOrderManager.netting_desires()）並淨額化：
+     - 價格交叉（某策略的買價 ≥ 另一策略的賣價）的部分直接在內部撮合，
+       以兩價中點記到雙方的成交記錄，不經過交易所、不付手續費；
+     - 同方向、同價位的需求合併成一張外部限價單，量為各策略之和；
+  3. 只掛合併後的外部單；與上輪相同的單保留，變了才撤掉重掛。
+
+注意：不同價位的買單與賣單不能互相抵銷（例如 A 的買單在 2.9M、B 的賣單在 3.1M），
+那會改變雙方的成交價、破壞定值再平衡的數學，所以照樣各自掛在交易所；
+淨額化只處理「價格交叉」與「同價合併」兩種情況。
+
+分配與記帳：外部單的每筆新成交量依 allocations 比例拆分（最後一位拿餘數，總和不差），
+maker 手續費也依比例分攤；所有成員的成交記錄與掛單簿狀態在同一個 SQLite 交易內提交。
+掛單簿狀態以 "__net__:<market>" 為名存在 maker_state 表，重啟後可對帳。
+"""
+import json
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+from .maker_orders import (MAKER_FEE_RATE, _VOL_TOL, adopt_pending, claim_pending, group_id_for,
+                           pending_order, place_limit_order)
+
+NET_STATE_PREFIX = "__net__:"
+
+
+def net_desires(desires):
+    """淨額化各策略的目標掛單。
+
+    :param desires: [(strategy_name, side, price, volume), ...]
+    :return: (crosses, levels)
+             crosses: [(買方, 賣方, 買價, 賣價, 量), ...]，價格交叉、可內部撮合的部分；
+             levels:  {(side, price): {strategy_name: volume}}，剩餘需合併外掛的量。
+    """
+    buys = sorted(([name, price, volume] for name, side, price, volume in desires if side == "buy"),
+                  key=lambda d: -d[1])
+    sells = sorted(([name, price, volume] for name, side, price, volume in desires if side == "sell"),
+                   key=lambda d: d[1])
+    crosses = []
+    bi = si = 0
+    while bi < len(buys) and si < len(sells) and buys[bi][1] >= sells[si][1]:
+        buy, sell = buys[bi], sells[si]
+        if buy[0] != sell[0]:
+            qty = min(buy[2], sell[2])
+            crosses.append((buy[0], sell[0], buy[1], sell[1], qty))
+            buy[2] -= qty
+            sell[2] -= qty
+        else:
+            # 同一策略的買賣不會交叉（買價必低於賣價）；保險起見略過
+            sell[2] = 0.0
+        if buy[2] <= 1e-12:
+            bi += 1
+        if sell[2] <= 1e-12:
+            si += 1
+
+    levels: Dict[Tuple[str, float], Dict[str, float]] = {}
+    for side, rest in (("buy", buys), ("sell", sells)):
+        for name, price, volume in rest:
+            if volume > 1e-12:
+                level = levels.setdefault((side, price), {})
+                level[name] = level.get(name, 0.0) + volume
+    return crosses, levels
+
+
+def allocate(allocations, volume):
+    """依 allocations 的比例拆分 volume；最後一位拿餘數，拆分後總和恰為 volume。"""
+    total = sum(allocations.values())
+    names = sorted(allocations)
+    if not names or total <= 0:
+        return {}
+    shares = {}
+    remaining = volume
+    for name in names[:-1]:
+        share = volume * allocations[name] / total
+        shares[name] = share
+        remaining -= share
+    shares[names[-1]] = remaining
+    return {name: share for name, share in shares.items() if share > 1e-12}
+
+
+class NettingBook:
+    def __init__(self, client, market, store, logger=None):
+        self.client = client
+        self.market = market
+        self.store = store
+        self.logger = logger or logging.getLogger(f"netting.{market}")
+        self.state_name = f"{NET_STATE_PREFIX}{market}"
+        # 外部單獨立的群組 id，全撤時不會波及成員策略自己的單
+        self.group_id = group_id_for(self.state_name)
+        # 對帳與串流事件可能在不同執行緒同時進來；順序固定為 book 鎖 → 成員鎖
+        self._lock = threading.RLock()
+        self.members = {}           # strategy_name -> MakerOrderManager（目前參與淨額化）
+        self._known = {}            # 曾經參與過的成員：已退出者仍要接收舊外部單的成交
+        state = store.load_maker_state(self.state_name)
+        # tracked: {order_id(str): {"side","price","volume","recorded","allocations",...}}；
+        #          結果不明的單以 client_oid 為鍵並標記 pending，對回後改用 order_id
+        self.tracked = state[0] if state else {}
+        self._saved_state = self._state_key(self.tracked) if state else None
+
+    # ---------- 成員 ----------
+    def set_members(self, makers, known=()):
+        """更新成員；新成員撤掉自己的單交由本簿代掛，退出者恢復自行掛單。
+
+        known: 同市場其他（不參與淨額化的）策略，只登記為既有合併單成交的分配對象。
+        """
+        with self._lock:
+            for maker in known:
+                self._known[maker.config.strategy_name] = maker
+            current = {m.config.strategy_name: m for m in makers}
+            for name, maker in self.members.items():
+                if name not in current:
+                    maker.leave_netting()
+            for name, maker in current.items():
+                maker.join_netting(self)
+                self._known[name] = maker
+            self.members = current
+
+    @property
+    def active(self):
+        return len(self.members) >= 2
+
+    # ---------- 持久化 ----------
+    @staticmethod
+    def _state_key(tracked):
+        return json.dumps(tracked, sort_keys=True)
+
+    def _save_state(self):
+        key = self._state_key(self.tracked)
+        if key == self._saved_state:
+            return
+        self.store.save_maker_state(self.state_name, self.tracked, None, 0.0)
+        self._saved_state = key
+
+    # ---------- 主流程 ----------
+    def sync(self, open_orders=None):
+        """單一 poll cycle：對帳外部單 + 內部撮合 + 重掛合併單。回傳 {strategy_name: [訊息]}。"""
+        with self._lock:
+            messages: Dict[str, List[str]] = {}
+            try:
+                self._reconcile(open_orders, messages)
+                self._requote(messages)
+                self._save_state()
+            except Exception as e:
+                self.logger.error(f"netting sync 發生錯誤: {e}")
+            return messages
+
+    def on_order_update(self, order):
+        """私有串流的訂單事件；不是本簿的外部單回傳 False。"""
+        oid = str(order.get("id"))
+        with self._lock:
+            info = self.tracked.get(oid)
+            if info is None and adopt_pending(self.tracked, order) is not None:
+                info = self.tracked[oid]
+            if info is None:
+                return False
+            try:
+                messages = {}
+                self._apply_order(oid, info, order, messages)
+                if messages or oid not in self.tracked:
+                    self._requote(messages)
+                    self._save_state()
+            except Exception as e:
+                self.logger.error(f"處理訂單事件 {oid} 發生錯誤: {e}")
+            return True
+
+    def _reconcile(self, open_orders, messages):
+        claim_pending(self.client, self.tracked, open_orders, self.logger)
+        open_by_id = None
+        if open_orders is not None:
+            open_by_id = {str(o.get("id")): o for o in open_orders}
+        for oid in list(self.tracked.keys()):
+            if self.tracked[oid].get("pending"):
+                continue
+            o = open_by_id.get(oid) if open_by_id is not None else None
+            if o is None:
+                try:
+                    o = self.client.get_order(int(oid))
+                except Exception as e:
+                    self.logger.warning(f"查訂單 {oid} 失敗，下輪重試: {e}")
+                    continue
+            self._apply_order(oid, self.tracked[oid], o, messages)
+
+    def _apply_order(self, oid, info, o, messages):
+        """以一筆訂單狀態更新外部單：新成交依比例記到各策略，移除已結束的單。"""
+        state = o.get("state")
+        executed = float(o.get("executed_volume") or 0)
+        fill_price = float(o.get("avg_price") or 0) or float(info["price"])
+        newly = executed - float(info.get("recorded", 0))
+        remaining = o.get("remaining_volume")
+        finished = state in ("done", "cancel", "convert") or (
+            remaining is not None and float(remaining) <= 1e-12
+        )
+        if newly <= 1e-12:
+            if finished:
+                self.tracked.pop(oid, None)
+            return
+
+        allocations = {name: volume for name, volume in info.get("allocations", {}).items()
+                       if name in self._known}
+        if not allocations:
+            # 分配對象都已不存在（例如策略被刪除）：無從記帳，只留紀錄
+            self.logger.error(f"外部單 {oid} 成交 {newly:.8f} 找不到分配對象，未記帳")
+        shares = allocate(allocations, newly)
+        side = info["side"]
+
+        def record(maker, share):
+            fee = fill_price * share * MAKER_FEE_RATE
+            return maker._record_fill(side, fill_price, share, fee=fee, label="合併掛單成交")
+
+        recorded = info.get("recorded", 0.0)
+        notices = self._commit(shares, record, lambda: self._mark_recorded(oid, info, executed, finished))
+        if notices is None:
+            info["recorded"] = recorded
+            self.tracked[oid] = info
+            return
+        for name, share in shares.items():
+            messages.setdefault(name, []).append(f"{side} {share:.8f}@{fill_price:,.0f}（合併單）")
+        self._notify(notices)
+
+    def _mark_recorded(self, oid, info, executed, finished):
+        info["recorded"] = executed
+        if finished:
+            self.tracked.pop(oid, None)
+
+    def _commit(self, shares, record, update_state):
+        """在同一個 SQLite 交易內寫入各成員的成交與掛單簿狀態；回傳 [(maker, 通知)]，失敗回傳 None。
+
+        握住所有相關成員的鎖，避免成員的 sync() 在寫入途中讀到一半的持倉。
+        """
+        makers = [(self._known[name], share) for name, share in sorted(shares.items())]
+        locks = [maker._lock for maker, _ in makers]
+        for lock in locks:
+            lock.acquire()
+        try:
+            notices = []
+            with self.store.transaction():
+                for maker, share in makers:
+                    notices.append((maker, record(maker, share)))
+                update_state()
+                self._save_state()
+            return notices
+        except Exception as e:
+            # 交易已回滾：成員的記憶體彙總重新從資料庫載入，下輪重試
+            self.logger.error(f"淨額化記帳失敗，下輪重試: {e}")
+            self._saved_state = None
+            for maker, _ in makers:
+                maker.trading_record.refresh()
+            return None
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    @staticmethod
+    def _notify(notices):
+        for maker, msg in notices:
+            maker._notify_fill(msg)
+
+    # ---------- 淨額化與掛單 ----------
+    def _collect(self):
+        desires = []
+        for name, maker in sorted(self.members.items()):
+            for side, (price, volume) in maker.netting_desires().items():
+                desires.append((name, side, price, volume))
+        return desires
+
+    def _requote(self, messages):
+        if not self.active:
+            # 成員不足兩個：撤掉代掛的單，讓剩下的策略自行掛單
+            if self._live():
+                self._cancel_all()
+            return
+        crosses, levels = net_desires(self._collect())
+        if crosses:
+            self._cross(crosses, messages)
+            # 內部撮合改變了持倉，依新持倉重算一次；再出現的交叉留待下輪
+            _, levels = net_desires(self._collect())
+        self._place_levels(levels)
+
+    def _cross(self, crosses, messages):
+        """價格交叉的部分內部撮合：以兩價中點成交，不經交易所、不付手續費。"""
+        any_maker = next(iter(self.members.values()))
+        for buyer, seller, buy_price, sell_price, qty in crosses:
+            price = any_maker._align((buy_price + sell_price) / 2)
+            shares = {buyer: qty, seller: qty}
+            sides = {buyer: "buy", seller: "sell"}
+
+            def record(maker, share, sides=sides, price=price):
+                side = sides[maker.config.strategy_name]
+                return maker._record_fill(side, price, share, fee=0.0, label="內部撮合")
+
+            notices = self._commit(shares, record, lambda: None)
+            if notices is None:
+                return
+            for name, side in sides.items():
+                messages.setdefault(name, []).append(f"{side} {qty:.8f}@{price:,.0f}（內部撮合）")
+            self._notify(notices)
+
+    def _place_levels(self, levels):
+        """讓外部掛單與合併後的目標一致：相同的保留，其餘撤掉重掛。"""
+        any_maker = next(iter(self.members.values()))
+        targets = {}
+        for (side, price), allocations in levels.items():
+            total = sum(allocations.values())
+            sized = any_maker._size(price, total)
+            if sized <= 0:
+                continue
+            targets[(side, price)] = {name: volume * sized / total for name, volume in allocations.items()}
+
+        for oid, info in self._live().items():
+            key = (info["side"], float(info["price"]))
+            if info.get("pending"):
+                targets.pop(key, None)   # 結果不明的單對回前不撤，這一價位本輪也不重掛
+                continue
+            wanted = targets.get(key)
+            if wanted is not None and self._same_allocations(info.get("allocations", {}), wanted):
+                targets.pop(key)         # 目標單已存在，不動
+                continue
+            if not self._cancel(oid):
+                targets.pop(key, None)   # 撤單失敗：保留舊單、這一價位本輪不重掛
+
+        for (side, price), allocations in targets.items():
+            self._place(side, price, allocations)
+
+    @staticmethod
+    def _same_allocations(current, wanted):
+        if set(current) != set(wanted):
+            return False
+        return all(abs(float(current[name]) - volume) / max(volume, 1e-9) < _VOL_TOL
+                   for name, volume in wanted.items())
+
+    def _place(self, side, price, allocations):
+        volume = sum(allocations.values())
+        try:
+            order, client_oid = place_limit_order(self.client, self.market, side, price, volume,
+                                                  self.group_id, self.logger)
+        except Exception as e:
+            self.logger.error(f"掛合併 {side} 限價單被拒: {e}")
+            return
+        if order is None:
+            self.tracked[client_oid] = pending_order(side, price, volume, client_oid,
+                                                     allocations=allocations)
+            return
+        oid = str(order["id"])
+        self.logger.info(f"掛合併 {side} 限價單 {volume:.8f} @ {price:,.2f} "
+                         f"({len(allocations)} 個策略, id={oid})")
+        self.tracked[oid] = {
+            "side": side, "price": float(price), "volume": float(volume), "recorded": 0.0,
+            "grouped": True, "client_oid": client_oid, "allocations": allocations,
+        }
+
+    # 撤單後不立刻移出 tracked：撤單前可能還有未對帳的成交，下輪對帳記完帳、
+    # 看到單已結束（cancel）才移除，確保每一筆成交都分配到策略。
+    def _live(self):
+        return {oid: info for oid, info in self.tracked.items() if not info.get("cancelled")}
+
+    def _cancel(self, oid):
+        try:
+            self.client.cancel_order(int(oid))
+        except Exception as e:
+            self.logger.warning(f"撤合併單 {oid} 失敗: {e}")
+            return False
+        self.tracked[oid]["cancelled"] = True
+        return True
+
+    def _cancel_all(self):
+        bulk = getattr(self.client, "cancel_orders", None)
+        if bulk is not None:
+            try:
+                bulk(market=self.market, group_id=self.group_id)
+                for info in self.tracked.values():
+                    info["cancelled"] = True
+                return
+            except Exception as e:
+                self.logger.warning(f"批次撤合併單失敗，改為逐張撤單: {e}")
+        for oid, info in self._live().items():
+            if not info.get("pending"):
+                self._cancel(oid)
@@ -1,53 +1,284 @@
 import os
 import json
+import time
+import asyncio
 import logging
 import datetime
 import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List, Dict, Optional
 from ..models.strategy_config import TradingStrategyConfig
 from ..utils.paths import strategies_dir, records_dir
+from ..utils.trade_store import get_trade_store
+from ..services.price_service import PriceService
+from ..utils.config_loader import ConfigService, config_service as shared_config_service
+from max.async_client import AsyncClientV3
 from .auto_trade_strategy import AutoTradeStrategy
+from .order_netting import NettingBook
+
+# 事件驅動模式下，串流現價觸發喚醒的最短間隔（秒）
+WAKE_DEBOUNCE = 5.0
+
+
+def empty_trading_stats() -> Dict:
+    """沒有任何成交（或查不到策略）時的交易統計"""
+    return {
+        'total_trades': 0,
+        'total_amount': 0,
+        'avg_amount': 0,
+        'net_profit': 0,
+        'current_position_value': 0,
+        'realized_profit': 0
+    }
+
 
 class StrategyManager:
-    def __init__(self, client):
+    def __init__(self, client, market_stream=None, user_stream=None,
+                 config_service: Optional[ConfigService] = None):
         self.client = client
+        # 設定與 Telegram notifier 由同一個服務提供，所有策略共用（不再各自讀設定檔）
+        self.config_service = config_service or shared_config_service
+        # WebSocket 行情串流（可為 None）：有的話價格/委託簿直接讀記憶體
+        self.market_stream = market_stream
+        # 私有訂單串流（可為 None）：成交事件即時轉給對應策略的 maker，輪詢只當安全網
+        self.user_stream = user_stream
+        # strategies 只放已載入（hydrate）的策略；_configs 是所有策略的設定。
+        # 啟動時只讀設定檔與策略索引：啟用中的策略在背景並行載入，停用的等第一次用到才載入，
+        # 沒載入前以索引摘要（過期時才讀完整記錄）顯示狀態
         self.strategies: Dict[str, AutoTradeStrategy] = {}
+        self._configs: Dict[str, TradingStrategyConfig] = {}
+        self._index: Dict[str, Dict] = {}
+        self._index_saved: Dict[str, str] = {}
+        self._hydrate_locks: Dict[str, threading.Lock] = {}
         self.logger = logging.getLogger("strategy_manager")
         self._strategy_lock = threading.Lock()  # 添加鎖機制
+        # 各策略並行執行：每個策略一把鎖（上一輪超時還沒跑完的策略本輪跳過），
+        # 整輪有時間預算，超過就先回報已完成的結果
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('ROOSTER_STRATEGY_WORKERS', '8')),
+            thread_name_prefix="strategy",
+        )
+        self._run_locks: Dict[str, threading.Lock] = {}
+        self._run_locks_guard = threading.Lock()
+        # 私有串流的訂單事件在這條專用執行緒依序處理（撤單重掛、寫資料庫），
+        # 不佔用串流讀取執行緒，也不和每輪的策略工作搶執行緒
+        self._event_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="order-events")
+        self.cycle_budget = float(os.getenv('ROOSTER_CYCLE_BUDGET', '50'))
+        # 同市場多策略的掛單淨額化（預設關閉）：每個市場一本 NettingBook 合併代掛
+        self.netting_enabled = os.getenv('ROOSTER_ORDER_NETTING', '0').lower() in ('1', 'true', 'yes')
+        self._books: Dict[str, NettingBook] = {}
+        self._books_checked = set()
+        # 事件驅動模式（預設關閉）：策略只在現價接近觸發價、或距上次執行超過 trigger_max_idle 秒
+        # （漏接事件的安全網）時才執行；閒置的策略一輪不打任何 API
+        self.event_driven = os.getenv('ROOSTER_EVENT_DRIVEN', '0').lower() in ('1', 'true', 'yes')
+        self.trigger_proximity = float(os.getenv('ROOSTER_TRIGGER_PROXIMITY', '0.002'))
+        self.trigger_max_idle = float(os.getenv('ROOSTER_TRIGGER_MAX_IDLE', '600'))
+        self._last_run: Dict[str, float] = {}
+        self._wake_listeners = []
+        self._last_wake = float('-inf')
+        self.trigger_stats = {"due": 0, "idle": 0, "wakeups": 0}
+        # 所有策略共用的現價服務：同市場的查價合併成一次請求
+        self.price_service = PriceService(
+            client, ttl=float(os.getenv('ROOSTER_PRICE_TTL', '2')), stream=market_stream
+        )
+        # 跨市場/跨訂單的查詢在同一個 event loop 扇出，限制同時在途請求數
+        self.async_client = AsyncClientV3(
+            client,
+            max_concurrency=int(os.getenv('MAX_ASYNC_CONCURRENCY', '8')),
+            timeout=float(os.getenv('MAX_ASYNC_TIMEOUT', '15')),
+        )
         self._load_all_strategies()
+        if user_stream is not None:
+            user_stream.add_listener(self._on_user_event)
+        if market_stream is not None and self.event_driven:
+            market_stream.add_price_listener(self._on_price)
 
     def _load_all_strategies(self):
-        """載入所有已保存的策略"""
+        """讀取所有策略設定與索引；啟用中的策略交給執行緒池並行載入，不阻塞啟動"""
         strategy_dir = strategies_dir()
 
         # 載入所有策略配置（不論啟用與否都載入，這樣 UI 才能顯示停用中的策略；
         # 是否要執行交易由 execute_all_strategies 依 is_active 判斷）
-        for filename in os.listdir(strategy_dir):
+        for filename in sorted(os.listdir(strategy_dir)):
             if filename.endswith('.json'):
                 strategy_name = filename[:-5]  # 移除 .json 副檔名
                 config = TradingStrategyConfig.load(strategy_name)
                 if config:
-                    strategy = AutoTradeStrategy(
-                        self.client,
-                        config,
-                        strategy_manager=self
-                    )
-                    # TradingRecord 在初始化時已載入記錄，這裡不需要重複處理
-                    self.strategies[strategy_name] = strategy
+                    self._configs[strategy_name] = config
+
+        store = get_trade_store()
+        last_ids = store.last_fill_ids()
+        self._index = {
+            name: entry for name, entry in store.load_strategy_index().items()
+            if entry['last_fill_id'] == last_ids.get(name, 0)
+        }
+        for name, config in self._configs.items():
+            if config.is_active:
+                self._executor.submit(self._hydrate, name)
+
+    def _hydrate(self, strategy_name: str) -> Optional[AutoTradeStrategy]:
+        """建立（載入成交與 maker 狀態）策略物件；同一策略只建一次，並行呼叫會等待同一份結果"""
+        with self._run_locks_guard:
+            lock = self._hydrate_locks.setdefault(strategy_name, threading.Lock())
+        with lock:
+            strategy = self.strategies.get(strategy_name)
+            config = self._configs.get(strategy_name)
+            if strategy is None and config is not None:
+                strategy = self._new_strategy(config)
+                self.strategies[strategy_name] = strategy
+                self._watch_market(strategy)
+                self._save_index(strategy)
+            return strategy
+
+    def _hydrate_all(self, names) -> None:
+        """並行載入尚未載入的策略；個別策略載入失敗只記錄，不影響其他策略"""
+        futures = {name: self._executor.submit(self._hydrate, name)
+                   for name in names if name not in self.strategies}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                self.logger.error(f"載入策略 {name} 失敗: {e}")
+
+    def _summary(self, strategy: AutoTradeStrategy) -> Dict:
+        summary = strategy.trading_record.summary()
+        maker = getattr(strategy, 'maker', None)
+        summary['open_price'] = maker.open_price if maker and maker.open_price else 0
+        summary['phase'] = maker.phase if maker else 'trading'
+        return summary
+
+    def _save_index(self, strategy: AutoTradeStrategy) -> None:
+        """更新策略索引（內容沒變就不寫）"""
+        config = strategy.config
+        try:
+            summary = self._summary(strategy)
+            key = json.dumps([config.is_active, config.coin_type, summary], sort_keys=True)
+            if self._index_saved.get(config.strategy_name) == key:
+                return
+            strategy.trading_record.store.save_strategy_index(
+                config.strategy_name, config.is_active, config.coin_type, summary)
+            self._index_saved[config.strategy_name] = key
+        except Exception as e:
+            self.logger.warning(f"更新策略索引失敗 {config.strategy_name}: {e}")
+
+    def _all_configs(self) -> Dict[str, TradingStrategyConfig]:
+        """所有策略的設定（含已載入但不在設定清單中的策略）"""
+        configs = dict(self._configs)
+        for name, strategy in list(self.strategies.items()):
+            configs.setdefault(name, strategy.config)
+        return configs
+
+    def _strategy_summary(self, name: str) -> Dict:
+        """已載入的策略讀即時累計值；未載入且索引仍有效時用索引摘要，否則載入策略"""
+        strategy = self.strategies.get(name)
+        if strategy is None and name in self._index:
+            summary = dict(self._index[name]['summary'])
+            if summary.get('today') != datetime.date.today().isoformat():
+                summary['today_count'] = 0
+            return summary
+        strategy = strategy or self._hydrate(name)
+        return self._summary(strategy)
+
+    def _current_price(self, config: TradingStrategyConfig) -> float:
+        strategy = self.strategies.get(config.strategy_name)
+        if strategy is not None:
+            return strategy.get_current_price()
+        return self.price_service.get_price(f"{config.coin_type.lower()}twd")
+
+    def _new_strategy(self, config: TradingStrategyConfig) -> AutoTradeStrategy:
+        return AutoTradeStrategy(
+            self.client,
+            config,
+            strategy_manager=self,
+            notifier=self.config_service.notifier(),
+        )
+
+    def _on_user_event(self, kind: str, data: Dict):
+        """私有串流事件（在串流執行緒上）：只排入事件執行緒，不在這裡打 API 或寫資料庫。"""
+        if kind != 'order':
+            return
+        self._event_executor.submit(self._dispatch_order_event, data)
+
+    def _dispatch_order_event(self, data: Dict):
+        """訂單更新轉給追蹤該訂單的掛單簿或 maker（依市場篩選）；maker 內部持鎖，與對帳互斥。"""
+        market = (data.get('market') or '').lower()
+        try:
+            book = self._books.get(market)
+            if book is not None and book.on_order_update(data):
+                return
+            for strategy in list(self.strategies.values()):
+                if strategy.maker.market == market and strategy.maker.on_order_update(data):
+                    return
+        except Exception as e:
+            self.logger.error(f"處理訂單事件 {data.get('id')} 失敗: {e}")
+
+    def add_wake_listener(self, callback) -> None:
+        """事件驅動模式下，串流現價接近某策略觸發價時呼叫 callback()（例如喚醒策略排程）。"""
+        self._wake_listeners.append(callback)
+
+    def _near_trigger(self, strategy: AutoTradeStrategy, price: float) -> bool:
+        levels = strategy.trigger_levels()
+        if levels is None:
+            return True
+        low, high = levels
+        return price <= low * (1 + self.trigger_proximity) or price >= high * (1 - self.trigger_proximity)
+
+    def _is_due(self, name: str, strategy: AutoTradeStrategy) -> bool:
+        """事件驅動模式：本輪是否需要執行此策略（現價接近觸發價或閒置過久）。"""
+        if time.monotonic() - self._last_run.get(name, float('-inf')) >= self.trigger_max_idle:
+            return True
+        try:
+            return self._near_trigger(strategy, self.price_service.get_price(strategy.maker.market))
+        except Exception as e:
+            self.logger.warning(f"策略 {name} 取價失敗，照常執行: {e}")
+            return True
+
+    @staticmethod
+    def _orders_changed(strategy: AutoTradeStrategy, open_orders) -> bool:
+        """追蹤中的掛單有任何一張不在掛單列表（已成交或被撤），或該市場掛單列表查詢失敗。"""
+        tracked = strategy.maker.tracked
+        if not tracked:
+            return False
+        listed = open_orders.get(strategy.maker.market)
+        if listed is None:
+            return True
+        open_ids = {str(o.get("id")) for o in listed}
+        return any(order_id not in open_ids for order_id in tracked)
+
+    def _on_price(self, market: str, price: float):
+        """行情串流成交價：接近任一策略的觸發價就喚醒排程（不必等下個週期）。"""
+        for strategy in list(self.strategies.values()):
+            if (strategy.config.is_active and strategy.maker.market == market
+                    and strategy.trigger_levels() is not None and self._near_trigger(strategy, price)):
+                # 價格在觸發價附近來回時每筆成交都會進來：限制喚醒頻率
+                now = time.monotonic()
+                if now - self._last_wake < WAKE_DEBOUNCE:
+                    return
+                self._last_wake = now
+                self.trigger_stats["wakeups"] += 1
+                for callback in list(self._wake_listeners):
+                    try:
+                        callback()
+                    except Exception as e:
+                        self.logger.error(f"喚醒回呼失敗: {e}")
+                return
+
+    def _watch_market(self, strategy: AutoTradeStrategy):
+        """讓行情串流訂閱策略的市場（沒有串流時不做事）。"""
+        if self.market_stream is not None:
+            self.market_stream.subscribe(strategy.maker.market)
 
     def create_strategy(self, config: TradingStrategyConfig) -> bool:
         """創建新的交易策略"""
         try:
-            if config.strategy_name in self.strategies:
+            if config.strategy_name in self._all_configs():
                 self.logger.error(f"策略 {config.strategy_name} 已存在")
                 return False
 
             config.save()
-            self.strategies[config.strategy_name] = AutoTradeStrategy(
-                self.client, 
-                config,
-                strategy_manager=self
-            )
+            self._configs[config.strategy_name] = config
+            self._hydrate(config.strategy_name)
             self.logger.info(f"成功創建策略: {config.strategy_name}")
             return True
         except Exception as e:
@@ -57,16 +288,15 @@ class StrategyManager:
     def update_strategy(self, config: TradingStrategyConfig) -> bool:
         """更新現有的交易策略"""
         try:
-            if config.strategy_name not in self.strategies:
+            if config.strategy_name not in self._all_configs():
                 self.logger.error(f"策略 {config.strategy_name} 不存在")
                 return False
 
             config.save()
-            self.strategies[config.strategy_name] = AutoTradeStrategy(
-                self.client, 
-                config,
-                strategy_manager=self
-            )
+            self._configs[config.strategy_name] = config
+            self.strategies.pop(config.strategy_name, None)
+            self._index_saved.pop(config.strategy_name, None)
+            self._hydrate(config.strategy_name)
             self.logger.info(f"成功更新策略: {config.strategy_name}")
             return True
         except Exception as e:
@@ -76,7 +306,7 @@ class StrategyManager:
     def delete_strategy(self, strategy_name: str) -> bool:
         """刪除交易策略"""
         try:
-            if strategy_name not in self.strategies:
+            if strategy_name not in self._all_configs():
                 self.logger.error(f"策略 {strategy_name} 不存在")
                 return False
 
@@ -85,21 +315,18 @@ class StrategyManager:
             if os.path.exists(config_file):
                 os.remove(config_file)
 
-            # 備份並刪除交易記錄文件
-            record_file = os.path.join(records_dir(), f"trading_records_{strategy_name}.json")
-            if os.path.exists(record_file):
-                # 確保備份目錄存在
-                backup_dir = os.path.join(os.path.dirname(records_dir()), "records_backup")
-                if not os.path.exists(backup_dir):
-                    os.makedirs(backup_dir)
-                # 生成帶時間戳的備份文件名
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_file = os.path.join(backup_dir, f"trading_records_{strategy_name}_{timestamp}.json")
-                # 移動文件到備份目錄
-                os.rename(record_file, backup_file)
+            # 備份交易記錄（匯出成 JSON）後刪除成交與掛單狀態
+            strategy = self.strategies.get(strategy_name)
+            store = strategy.trading_record.store if strategy else get_trade_store()
+            backup_dir = os.path.join(os.path.dirname(records_dir()), "records_backup")
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_file = os.path.join(backup_dir, f"trading_records_{strategy_name}_{timestamp}.json")
+            if store.export_fills(strategy_name, backup_file):
                 self.logger.info(f"交易記錄已備份到: {backup_file}")
+            store.delete_strategy(strategy_name)
 
-            del self.strategies[strategy_name]
+            for table in (self.strategies, self._configs, self._index, self._index_saved):
+                table.pop(strategy_name, None)
             self.logger.info(f"成功刪除策略: {strategy_name}")
             return True
         except Exception as e:
@@ -107,57 +334,39 @@ class StrategyManager:
             return False
 
     def get_strategy(self, strategy_name: str) -> Optional[AutoTradeStrategy]:
-        """獲取指定的策略"""
-        return self.strategies.get(strategy_name)
+        """獲取指定的策略（尚未載入時在此載入）"""
+        return self.strategies.get(strategy_name) or self._hydrate(strategy_name)
 
     def get_all_strategies(self) -> List[Dict]:
         """獲取所有策略的設定和當前狀態"""
+        with self.price_service.cycle():
+            return self._collect_strategy_status()
+
+    def _collect_strategy_status(self) -> List[Dict]:
         result = []
-        for strategy in self.strategies.values():
+        for name, config in self._all_configs().items():
             try:
-                # 獲取當前市場數據
-                current_balance = strategy.get_coin_balance()
-                current_price = strategy.get_current_price()
-                current_value = strategy.get_current_market_value()
-                
-                # 計算交易次數
-                trade_records = strategy.trading_record.trade_records
-                trade_count = len(trade_records)
-                
-                # 計算今日交易次數
-                today_trade_count = strategy.trading_record.get_today_trade_count()
-                
-                # 計算已實現的套利金額（只考慮買賣差額）
-                realized_profit = 0
-                for record in trade_records:
-                    if record['action'] == 'sell':
-                        realized_profit += record['price'] * record['volume']
-                    else:  # buy
-                        realized_profit -= record['price'] * record['volume']
-                
-                # 計算當前持倉的市值
-                current_position_value = current_balance * current_price
+                summary = self._strategy_summary(name)
+                current_balance = summary['balance']
+                current_price = self._current_price(config)
+                current_value = current_balance * current_price
+
+                # 計算已實現的套利金額（只考慮買賣差額 = 賣出額 − 買入額）
+                net_investment = summary['net_investment']
+                realized_profit = -net_investment
 
                 # 計算總套利金額（已實現收益 + 當前持倉市值）
-                net_profit = realized_profit + current_position_value
+                net_profit = realized_profit + current_value
 
                 # 目前持倉均價 = 淨投資 / 持倉數量（淨投資 = 買入額 − 賣出額）
-                net_investment = strategy.trading_record.get_net_investment()
                 avg_cost = net_investment / current_balance if current_balance > 1e-12 else 0
 
                 # 開倉幣價：建倉完成時記錄的均價；舊資料退回第一筆買單價
-                maker = getattr(strategy, 'maker', None)
-                open_price = maker.open_price if maker and maker.open_price else 0
-                if not open_price:
-                    for r in trade_records:
-                        if r.get('action') == 'buy':
-                            open_price = r['price']
-                            break
-                phase = maker.phase if maker else 'trading'
+                open_price = summary['open_price'] or summary['first_buy_price'] or 0
 
                 # 計算買入和賣出觸發價格
-                target_value = strategy.config.investment_amount
-                auto_trade_percent = strategy.config.auto_trade_percent / 100  # 轉換為小數
+                target_value = config.investment_amount
+                auto_trade_percent = config.auto_trade_percent / 100  # 轉換為小數
 
                 if current_balance > 0:
                     # 當有持倉時的觸發價格計算
@@ -169,15 +378,15 @@ class StrategyManager:
                     sell_trigger_price = current_price * (1 + auto_trade_percent)
                 
                 strategy_info = {
-                    'config': strategy.config.__dict__,  # Convert to dict for JSON serialization
+                    'config': config.__dict__,  # Convert to dict for JSON serialization
                     'current_balance': current_balance,
                     'current_price': current_price,
                     'current_value': current_value,
                     'avg_cost': avg_cost,
                     'open_price': open_price,
-                    'phase': phase,
-                    'trade_count': trade_count,
-                    'today_trade_count': today_trade_count,
+                    'phase': summary['phase'],
+                    'trade_count': summary['trade_count'],
+                    'today_trade_count': summary['today_count'],
                     'net_profit': net_profit,
                     'buy_trigger_price': buy_trigger_price,
                     'sell_trigger_price': sell_trigger_price
@@ -186,7 +395,7 @@ class StrategyManager:
             except Exception as e:
                 self.logger.error(f"獲取策略狀態時發生錯誤: {e}")
                 strategy_info = {
-                    'config': strategy.config.__dict__,  # Convert to dict for JSON serialization
+                    'config': config.__dict__,  # Convert to dict for JSON serialization
                     'current_balance': 0,
                     'current_price': 0,
                     'current_value': 0,
@@ -206,13 +415,14 @@ class StrategyManager:
     def enable_strategy(self, strategy_name: str) -> bool:
         """啟用策略"""
         try:
-            strategy = self.strategies.get(strategy_name)
+            strategy = self.get_strategy(strategy_name)
             if not strategy:
                 self.logger.error(f"策略 {strategy_name} 不存在")
                 return False
                 
             strategy.config.is_active = True
             strategy.config.save()
+            self._save_index(strategy)
             self.logger.info(f"已啟用策略: {strategy_name}")
             return True
         except Exception as e:
@@ -222,13 +432,14 @@ class StrategyManager:
     def disable_strategy(self, strategy_name: str) -> bool:
         """停用策略"""
         try:
-            strategy = self.strategies.get(strategy_name)
+            strategy = self.get_strategy(strategy_name)
             if not strategy:
                 self.logger.error(f"策略 {strategy_name} 不存在")
                 return False
                 
             strategy.config.is_active = False
             strategy.config.save()
+            self._save_index(strategy)
             self.logger.info(f"已停用策略: {strategy_name}")
             return True
         except Exception as e:
@@ -236,65 +447,54 @@ class StrategyManager:
             return False
     
     def get_trading_history(self, strategy_name: Optional[str] = None) -> List[Dict]:
-        """獲取交易歷史記錄"""
-        all_records = []
-        
+        """獲取交易歷史記錄（全部，依時間由新到舊）"""
+        return self.get_trading_history_page(strategy_name, limit=None)['records']
+
+    def get_trading_history_page(self, strategy_name: Optional[str] = None, start: Optional[str] = None,
+                                 end: Optional[str] = None, cursor: Optional[str] = None,
+                                 limit: Optional[int] = 500) -> Dict:
+        """分頁查詢交易歷史：{'records': [...], 'next_cursor': str|None}。
+
+        直接在成交資料庫上依 (時間, id) 排序分頁，不必把所有策略的記錄讀進來合併排序；
+        每筆記錄附上策略的 coin_type（回傳的是新 dict，不會改到策略的記錄）。
+        """
+        configs = self._all_configs()
         if strategy_name:
-            strategy = self.strategies.get(strategy_name)
-            if strategy:
-                strategy.trading_record.refresh()
-                records = strategy.trading_record.trade_records
-                for record in records:
-                    record['coin_type'] = strategy.config.coin_type
-                all_records.extend(records)
-        else:
-            for strategy in self.strategies.values():
-                strategy.trading_record.refresh()
-                records = strategy.trading_record.trade_records
-                for record in records:
-                    record['coin_type'] = strategy.config.coin_type
-                all_records.extend(records)
-        
-        all_records.sort(key=lambda x: x['trade_time'], reverse=True)
-        return all_records
-    
+            configs = {strategy_name: configs[strategy_name]} if strategy_name in configs else {}
+        if not configs:
+            return {'records': [], 'next_cursor': None}
+        coin_types = {name: config.coin_type for name, config in configs.items()}
+        store = get_trade_store()
+        records, next_cursor = store.query_fills(coin_types, start=start, end=end,
+                                                 cursor=cursor, limit=limit)
+        for record in records:
+            record['coin_type'] = coin_types.get(record['strategy_name'])
+        return {'records': records, 'next_cursor': next_cursor}
+
     def get_trading_stats(self, strategy_name: Optional[str] = None) -> Dict:
         """獲取交易統計數據"""
+        configs = self._all_configs()
         if strategy_name:
-            strategy = self.strategies.get(strategy_name)
-            if not strategy:
-                return {
-                    'total_trades': 0,
-                    'total_amount': 0,
-                    'avg_amount': 0,
-                    'net_profit': 0,
-                    'current_position_value': 0,
-                    'realized_profit': 0
-                }
-            records = strategy.trading_record.trade_records
-            current_balance = strategy.get_coin_balance()
-            current_price = strategy.get_current_price()
-        else:
-            records = []
-            current_balance = 0
-            current_price = 0
-            for strategy in self.strategies.values():
-                records.extend(strategy.trading_record.trade_records)
-                current_balance += strategy.get_coin_balance()
-                if current_price == 0:
-                    current_price = strategy.get_current_price()
+            if strategy_name not in configs:
+                return empty_trading_stats()
+            configs = {strategy_name: configs[strategy_name]}
 
-        total_trades = len(records)
-        total_amount = sum(record['price'] * record['volume'] for record in records)
-        avg_amount = total_amount / total_trades if total_trades > 0 else 0
-        
+        # 各策略的累計值已在 TradingRecord 內維護（未載入的策略讀索引摘要），不必逐筆掃描
+        total_trades = 0
+        total_amount = 0
         realized_profit = 0
-        for record in records:
-            if record['action'] == 'sell':
-                realized_profit += record['price'] * record['volume']
-            else:  # buy
-                realized_profit -= record['price'] * record['volume']
-        
+        current_balance = 0
+        current_price = 0
+        for name, config in configs.items():
+            summary = self._strategy_summary(name)
+            total_trades += summary['trade_count']
+            total_amount += summary['total_amount']
+            realized_profit -= summary['net_investment']   # 賣出額 − 買入額
+            current_balance += summary['balance']
+            if current_price == 0:
+                current_price = self._current_price(config)
+        avg_amount = total_amount / total_trades if total_trades > 0 else 0
+
         current_position_value = current_balance * current_price
         net_profit = realized_profit + current_position_value
         
@@ -307,6 +507,11 @@ class StrategyManager:
             'realized_profit': realized_profit
         }
 
+    def get_all_trading_stats(self) -> Dict[str, Dict]:
+        """每個策略各自的交易統計 {strategy_name: stats}（runner 發布快照用）"""
+        with self.price_service.cycle():
+            return {name: self.get_trading_stats(name) for name in self._all_configs()}
+
     def execute_all_strategies(self) -> List[Dict]:
         """執行所有活躍的策略"""
         if not self._strategy_lock.acquire(blocking=False):
@@ -314,30 +519,168 @@ class StrategyManager:
             return []
 
         try:
-            results = []
-            for strategy_name, strategy in self.strategies.items():
-                if strategy.config.is_active:
-                    self.logger.info(f"開始執行策略: {strategy_name}")
-                    
-                    take_profit_result = strategy.check_take_profit()
-                    if take_profit_result:
-                        results.append({
-                            "strategy_name": strategy_name,
-                            "action": "take_profit",
-                            "message": take_profit_result
-                        })
-                        continue
-
-                    trade_result = strategy.check_and_trade()
-                    if trade_result:
-                        results.append({
-                            "strategy_name": strategy_name,
-                            "action": "trade",
-                            "message": trade_result
-                        })
-                    
-                    self.logger.info(f"完成策略執行: {strategy_name}")
+            with self.price_service.cycle():
+                return self._run_active_strategies()
+        finally:
+            self._strategy_lock.release()
+
+    def _prefetch_open_orders(self, markets=None) -> Dict[str, Optional[List[Dict]]]:
+        """每個有活躍策略或淨額化掛單簿的市場（或指定的 markets）只查一次掛單列表，供各策略對帳共用。
+
+        各市場的查詢在同一個 event loop 並行送出；查詢失敗（含逾時）的市場
+        對應 None，該市場的策略退回逐張 get_order 對帳。
+        """
+        if markets is None:
+            markets = {s.maker.market for s in self.strategies.values() if s.config.is_active}
+            markets |= set(self._books)
+        markets = sorted(markets)
+        if not markets:
+            return {}
+        fetched = asyncio.run(self.async_client.get_orders_many(markets, 'wait'))
+        open_orders = {}
+        for market, result in fetched.items():
+            if isinstance(result, BaseException):
+                self.logger.warning(f"查詢 {market} 掛單列表失敗，改為逐張對帳: {result!r}")
+                open_orders[market] = None
+            else:
+                open_orders[market] = result or []
+        return open_orders
+
+    def _sync_netting(self, open_orders) -> Dict[str, List[str]]:
+        """更新各市場淨額化掛單簿的成員並同步；回傳 {strategy_name: [訊息]}。
+
+        同市場有兩個以上交易階段的活躍策略才淨額化；成員不足時掛單簿撤掉代掛的單，
+        等殘單對帳完才移除。每個市場第一次同步時會載入上次留下的掛單簿狀態（重啟後對帳）。
+        """
+        if not self.netting_enabled and not self._books:
+            return {}
+        members: Dict[str, List] = {}
+        if self.netting_enabled:
+            for strategy in self.strategies.values():
+                if strategy.config.is_active and strategy.maker.phase == "trading":
+                    members.setdefault(strategy.maker.market, []).append(strategy.maker)
+        messages: Dict[str, List[str]] = {}
+        for market in sorted(set(members) | set(self._books)):
+            candidates = members.get(market, [])
+            makers = candidates if len(candidates) >= 2 else []
+            book = self._books.get(market)
+            if book is None:
+                if not makers and market in self._books_checked:
+                    continue
+                self._books_checked.add(market)
+                store = candidates[0].store if candidates else get_trade_store()
+                try:
+                    book = NettingBook(self.client, market, store)
+                except Exception as e:
+                    self.logger.error(f"載入 {market} 淨額化掛單簿失敗: {e}")
+                    continue
+                if not makers and not book.tracked:
+                    continue
+                self._books[market] = book
+            # 單一策略不淨額化，但仍登記給掛單簿，上次留下的合併單成交才記得到它
+            book.set_members(makers, known=candidates)
+            for name, msgs in book.sync(open_orders.get(market)).items():
+                messages.setdefault(name, []).extend(msgs)
+            if not makers and not book.tracked:
+                del self._books[market]
+        return messages
+
+    def _run_lock(self, strategy_name: str) -> threading.Lock:
+        with self._run_locks_guard:
+            lock = self._run_locks.get(strategy_name)
+            if lock is None:
+                lock = self._run_locks[strategy_name] = threading.Lock()
+            return lock
 
+    def _run_strategy(self, strategy_name: str, strategy: AutoTradeStrategy, open_orders) -> List[Dict]:
+        """執行單一策略（在工作執行緒）：停利檢查 → 交易/maker 對帳。錯誤只影響本策略。"""
+        lock = self._run_lock(strategy_name)
+        if not lock.acquire(blocking=False):
+            self.logger.warning(f"策略 {strategy_name} 上一輪仍在執行，本輪跳過")
+            return []
+        try:
+            self._last_run[strategy_name] = time.monotonic()
+            self.logger.info(f"開始執行策略: {strategy_name}")
+            take_profit_result = strategy.check_take_profit()
+            if take_profit_result:
+                return [{
+                    "strategy_name": strategy_name,
+                    "action": "take_profit",
+                    "message": take_profit_result
+                }]
+
+            results = []
+            trade_result = strategy.check_and_trade(open_orders)
+            if trade_result:
+                results.append({
+                    "strategy_name": strategy_name,
+                    "action": "trade",
+                    "message": trade_result
+                })
+            self.logger.info(f"完成策略執行: {strategy_name}")
+            self._save_index(strategy)
             return results
+        except Exception as e:
+            self.logger.error(f"策略 {strategy_name} 執行失敗: {e}")
+            return [{"strategy_name": strategy_name, "action": "error", "message": str(e)}]
         finally:
-            self._strategy_lock.release()
+            lock.release()
+
+    def _run_active_strategies(self) -> List[Dict]:
+        """並行執行活躍策略；同一輪內所有策略共用同一份價格快照與掛單列表。
+
+        結果依策略順序回報（與逐一執行時相同）；超過 cycle_budget 秒仍未完成的策略
+        回報 timeout，讓它在背景跑完，下一輪會因策略鎖仍被持有而跳過它。
+        """
+        started = time.monotonic()
+        configs = self._all_configs()
+        self._hydrate_all(name for name, config in configs.items() if config.is_active)
+        due = [name for name in configs
+               if name in self.strategies and self.strategies[name].config.is_active]
+        # 掛單列表一律查所有活躍市場：淨額化掛單簿與成交偵測都要用，避免退回逐張 get_order
+        open_orders = self._prefetch_open_orders()
+        netted = self._sync_netting(open_orders)
+        if self.event_driven:
+            active = len(due)
+            due = [name for name in due
+                   if name in netted
+                   or self._orders_changed(self.strategies[name], open_orders)
+                   or self._is_due(name, self.strategies[name])]
+            self.trigger_stats["due"] += len(due)
+            self.trigger_stats["idle"] += active - len(due)
+        futures = {}
+        for strategy_name in due:
+            strategy = self.strategies[strategy_name]
+            # 每個工作帶著本輪的 context（價格快照）執行
+            context = contextvars.copy_context()
+            futures[strategy_name] = self._executor.submit(
+                context.run, self._run_strategy, strategy_name, strategy,
+                open_orders.get(strategy.maker.market),
+            )
+        if futures:
+            remaining = max(0.0, self.cycle_budget - (time.monotonic() - started))
+            wait(list(futures.values()), timeout=remaining)
+
+        # 淨額化結果（掛單簿代記的成交）不論策略本輪是否執行都要回報
+        names = list(configs) + [name for name in netted if name not in configs]
+        results = []
+        for strategy_name in names:
+            if strategy_name in netted:
+                results.append({
+                    "strategy_name": strategy_name,
+                    "action": "trade",
+                    "message": "；".join(netted[strategy_name]),
+                })
+            future = futures.get(strategy_name)
+            if future is None:
+                continue
+            if future.done():
+                results.extend(future.result())
+            else:
+                self.logger.warning(f"策略 {strategy_name} 超過本輪時間預算 {self.cycle_budget:.0f} 秒，留待背景完成")
+                results.append({
+                    "strategy_name": strategy_name,
+                    "action": "timeout",
+                    "message": f"超過本輪時間預算 {self.cycle_budget:.0f} 秒",
+                })
+        return results
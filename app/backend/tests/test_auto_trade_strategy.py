@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import Mock, patch
 import os
+import tempfile
 from datetime import datetime
 from ..strategies.auto_trade_strategy import AutoTradeStrategy
 from ..models.strategy_config import TradingStrategyConfig
@@ -8,6 +9,13 @@ from max.client import Client
 
 class TestAutoTradeStrategy(unittest.TestCase):
     def setUp(self):
+        # 成交資料庫改到暫存目錄，測試之間不共用狀態
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        env = patch.dict(os.environ, {"ROOSTER_TRADE_DB": os.path.join(self.tmp.name, "trading.db")})
+        env.start()
+        self.addCleanup(env.stop)
+
         # 模擬MAX API客戶端
         self.mock_client = Mock(spec=Client)
         
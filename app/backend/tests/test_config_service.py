@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ..utils import config_loader
+from ..utils.config_loader import ConfigService
+
+
+class TestConfigService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "config.json")
+        self._write({"TELEGRAM_BOT_TOKEN": "t1", "TELEGRAM_CHAT_ID": "c1"})
+        env = mock.patch.dict(os.environ, {}, clear=False)
+        env.start()
+        self.addCleanup(env.stop)
+        for name in ("TELEGRAM_BOT_TOKEN", "telegram_bot_token", "TELEGRAM_CHAT_ID", "telegram_chat_id"):
+            os.environ.pop(name, None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, data, mtime=None):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_parses_once_until_file_changes(self):
+        service = ConfigService(self.path)
+        with mock.patch.object(config_loader, "load_config", wraps=config_loader.load_config) as load:
+            for _ in range(50):
+                self.assertEqual(service.get()["telegram_bot_token"], "t1")
+            self.assertEqual(load.call_count, 1)
+
+            self._write({"TELEGRAM_BOT_TOKEN": "t2", "TELEGRAM_CHAT_ID": "c1"}, mtime=2_000_000_000)
+            self.assertEqual(service.get()["telegram_bot_token"], "t2")
+            self.assertEqual(load.call_count, 2)
+
+    def test_shared_notifier_follows_reload(self):
+        service = ConfigService(self.path)
+        notifier = service.notifier()
+        self.assertIs(service.notifier(), notifier)
+        self._write({"TELEGRAM_BOT_TOKEN": "t3", "TELEGRAM_CHAT_ID": "c3"}, mtime=2_000_000_000)
+        self.assertIs(service.notifier(), notifier)
+        self.assertEqual((notifier.bot_token, notifier.chat_id), ("t3", "c3"))
+
+    def test_no_notifier_without_keys(self):
+        self._write({})
+        self.assertIsNone(ConfigService(self.path).notifier())
+
+    def test_returned_config_is_a_copy(self):
+        service = ConfigService(self.path)
+        service.get()["telegram_bot_token"] = "changed"
+        self.assertEqual(service.get()["telegram_bot_token"], "t1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from ..utils import http_cassette, http_metrics
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status = 500 if self.path.startswith("/fail") else 200
+        data = json.dumps({"path": self.path}).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpMetrics(unittest.TestCase):
+    def setUp(self):
+        http_metrics.reset()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        http_metrics.reset()
+
+    def test_latency_errors_and_sizes_per_endpoint(self):
+        session = http_metrics.session("venue_a")
+        for oid in (1, 2, 3):
+            session.get(f"{self.base}/orders/{oid}", params={"signature": "secret"})
+        session.get(f"{self.base}/fail")
+
+        venue = http_metrics.snapshot()["venue_a"]
+        host = f"127.0.0.1:{self.server.server_port}"
+        orders = venue["endpoints"][f"GET {host}/orders/{{id}}"]
+        self.assertEqual(orders["count"], 3)
+        self.assertEqual(orders["errors"], 0)
+        self.assertEqual(sum(orders["histogram"].values()), 3)
+        self.assertGreater(orders["bytes_in"], 0)
+        self.assertEqual(venue["endpoints"][f"GET {host}/fail"]["status"], {"500": 1})
+        self.assertEqual(venue["errors"], 1)
+        self.assertNotIn("secret", json.dumps(venue))
+
+    def test_connection_error_is_counted_and_reraised(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        session = http_metrics.session("venue_b")
+        with self.assertRaises(requests.ConnectionError):
+            session.get(f"http://127.0.0.1:{port}/x", timeout=2)
+        stats = http_metrics.snapshot()["venue_b"]
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(list(stats["endpoints"].values())[0]["status"], {"exception": 1})
+
+    def test_instrument_twice_does_not_double_count(self):
+        session = http_metrics.session("venue_c")
+        http_metrics.instrument(session, "venue_c")
+        session.get(f"{self.base}/ok")
+        self.assertEqual(http_metrics.snapshot()["venue_c"]["count"], 1)
+
+    def test_telegram_token_is_masked(self):
+        name = http_metrics.endpoint_name("POST", "https://api.telegram.org/bot123:ABC/sendMessage")
+        self.assertEqual(name, "POST api.telegram.org/bot{token}/sendMessage")
+
+
+class TestHttpCassette(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "bench.json.gz")
+
+    def tearDown(self):
+        http_cassette.activate(None)
+        self.tmp.cleanup()
+
+    def test_record_then_replay_offline(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        session = http_metrics.session("venue_d")
+        try:
+            http_cassette.activate(http_cassette.Cassette(self.path, mode="record"))
+            recorded = session.get(f"{base}/orders", params={"market": "btctwd", "nonce": 1}).json()
+            http_cassette.active().save()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        cassette = http_cassette.activate(http_cassette.Cassette(self.path, mode="replay", latency=0))
+        # 伺服器已關閉；nonce 不同仍對得上
+        replayed = session.get(f"{base}/orders", params={"nonce": 2, "market": "btctwd"})
+        self.assertEqual(replayed.status_code, 200)
+        self.assertEqual(replayed.json(), recorded)
+        with self.assertRaises(http_cassette.CassetteMiss):
+            session.get(f"{base}/orders", params={"market": "ethtwd"})
+        self.assertEqual((cassette.hits, cassette.misses), (1, 1))
+
+    def test_request_key_ignores_volatile_fields(self):
+        a = http_cassette.request_key("POST", "https://x/api/order",
+                                      b'{"nonce": 1, "market": "btctwd", "client_oid": "rt-a"}')
+        b = http_cassette.request_key("POST", "https://x/api/order",
+                                      b'{"market": "btctwd", "nonce": 2, "client_oid": "rt-b"}')
+        self.assertEqual(a, b)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,265 @@
+import glob
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock
+
+import requests
+
+from ..models.strategy_config import TradingStrategyConfig
+from ..strategies.maker_orders import PENDING_GRACE, MakerOrderManager, pending_order
+from ..utils.paths import records_dir
+from ..utils.trade_store import TradeStore
+from max.mock_client import MockClientV3
+
+NAME = "__maker_unittest__"
+
+
+class _MakerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = MockClientV3()
+        self.client.set_price("btctwd", 3_000_000)
+        self.client.get_order = Mock(side_effect=self.client.get_order)
+        config = TradingStrategyConfig(
+            strategy_name=NAME, coin_type="BTC", investment_amount=30000.0,
+            auto_trade_percent=5.0, take_profit=60000.0, max_position=30000.0,
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        record = Mock()
+        record.get_current_balance.return_value = 0.0
+        record.store = TradeStore(os.path.join(self.tmp.name, "trading.db"))
+        self.maker = MakerOrderManager(self.client, config, record)
+        self.record = record
+
+    def tearDown(self):
+        for p in glob.glob(os.path.join(records_dir(), f"*{NAME}*")):
+            os.remove(p)
+        self.tmp.cleanup()
+
+    def _track(self, side, price, volume):
+        order = self.client.create_order("btctwd", side, volume, price=price, order_type="limit")
+        self.maker.tracked[str(order["id"])] = {
+            "side": side, "price": price, "volume": volume, "recorded": 0.0,
+        }
+        return str(order["id"])
+
+
+class TestMakerReconcile(_MakerTestCase):
+    def test_open_orders_skip_individual_queries(self):
+        buy = self._track("buy", 2_900_000, 0.01)
+        sell = self._track("sell", 3_100_000, 0.01)
+        open_orders = self.client.get_orders("btctwd", "wait")
+
+        self.assertEqual(self.maker._reconcile(open_orders), [])
+        self.client.get_order.assert_not_called()
+        self.assertEqual(set(self.maker.tracked), {buy, sell})
+
+    def test_vanished_order_fetched_for_final_fill(self):
+        buy = self._track("buy", 2_900_000, 0.01)
+        sell = self._track("sell", 3_100_000, 0.01)
+        self.client.set_price("btctwd", 2_800_000)   # 買單成交，從掛單列表消失
+        open_orders = self.client.get_orders("btctwd", "wait")
+
+        messages = self.maker._reconcile(open_orders)
+
+        self.client.get_order.assert_called_once_with(int(buy))
+        self.assertEqual(len(messages), 1)
+        self.record.add_trade_record.assert_called_once()
+        self.assertEqual(set(self.maker.tracked), {sell})
+
+    def test_without_open_orders_falls_back_to_per_order(self):
+        self._track("buy", 2_900_000, 0.01)
+        self._track("sell", 3_100_000, 0.01)
+        self.maker._reconcile()
+        self.assertEqual(self.client.get_order.call_count, 2)
+
+
+class TestMakerGroupCancel(_MakerTestCase):
+    def test_cancel_all_is_one_bulk_request(self):
+        self.client.cancel_order = Mock(side_effect=self.client.cancel_order)
+        self.client.cancel_orders = Mock(side_effect=self.client.cancel_orders)
+        self.maker._place("buy", 2_900_000, 0.01)
+        self.maker._place("sell", 3_100_000, 0.01)
+        legacy = self._track("sell", 3_200_000, 0.01)     # 舊資料：沒有群組 id
+
+        self.maker._cancel_all()
+
+        self.client.cancel_orders.assert_called_once_with(market="btctwd", group_id=self.maker.group_id)
+        self.client.cancel_order.assert_called_once_with(int(legacy))
+        self.assertEqual(self.maker.tracked, {})
+        self.assertEqual(self.client.get_orders("btctwd", "wait"), [])
+
+    def test_group_id_is_stable_per_strategy(self):
+        from ..strategies.maker_orders import group_id_for
+        self.assertEqual(group_id_for(NAME), self.maker.group_id)
+        self.assertNotEqual(group_id_for("other"), self.maker.group_id)
+        self.assertTrue(0 < self.maker.group_id < 2 ** 31)
+
+
+class TestMakerReplace(_MakerTestCase):
+    def _slow(self, name, delay=0.1):
+        real = getattr(self.client, name)
+
+        def call(*args, **kwargs):
+            time.sleep(delay)
+            return real(*args, **kwargs)
+        setattr(self.client, name, Mock(side_effect=call))
+
+    def test_both_sides_replaced_concurrently(self):
+        buy = self._track("buy", 2_900_000, 0.01)
+        sell = self._track("sell", 3_100_000, 0.01)
+        self._slow("cancel_order")
+        self._slow("create_order")
+
+        start = time.time()
+        self.maker._replace_sides({
+            "buy": (buy, 2_950_000, 0.01),
+            "sell": (sell, 3_050_000, 0.01),
+        })
+        elapsed = time.time() - start
+
+        self.assertLess(elapsed, 0.35)      # 依序需 0.4 秒，並行約 0.2 秒
+        prices = sorted(info["price"] for info in self.maker.tracked.values())
+        self.assertEqual(prices, [2_950_000, 3_050_000])
+        self.assertEqual(len(self.client.get_orders("btctwd", "wait")), 2)
+
+    def test_failed_cancel_keeps_old_order_tracked(self):
+        buy = self._track("buy", 2_900_000, 0.01)
+        sell = self._track("sell", 3_100_000, 0.01)
+        real_cancel = self.client.cancel_order
+
+        def cancel(order_id, *args, **kwargs):
+            if str(order_id) == sell:
+                raise Exception("API請求失敗: 500")
+            return real_cancel(order_id, *args, **kwargs)
+        self.client.cancel_order = Mock(side_effect=cancel)
+
+        self.maker._replace_sides({
+            "buy": (buy, 2_950_000, 0.01),
+            "sell": (sell, 3_050_000, 0.01),
+        })
+
+        self.assertIn(sell, self.maker.tracked)
+        self.assertNotIn(buy, self.maker.tracked)
+        sides = sorted(info["side"] for info in self.maker.tracked.values())
+        self.assertEqual(sides, ["buy", "sell"])   # 賣方沒有重複掛單
+
+    def test_ambiguous_create_recovered_by_client_oid(self):
+        real_create = self.client.create_order
+
+        def create(*args, **kwargs):
+            real_create(*args, **kwargs)            # 交易所已收單，但回應遺失
+            raise requests.exceptions.ReadTimeout("Read timed out")
+        self.client.create_order = Mock(side_effect=create)
+
+        self.maker._place("buy", 2_900_000, 0.01)
+
+        self.client.create_order.assert_called_once()
+        self.assertEqual(len(self.maker.tracked), 1)
+        self.assertEqual(len(self.client.get_orders("btctwd", "wait")), 1)
+        oid, info = next(iter(self.maker.tracked.items()))
+        self.assertEqual(self.client.get_order(int(oid))["client_oid"], info["client_oid"])
+
+    def test_rejected_create_is_not_looked_up_or_resent(self):
+        response = Mock(status_code=400)
+        wrapped = Exception("API請求失敗: 餘額不足")        # ClientV3 包裝過的 4xx
+        wrapped.__cause__ = requests.HTTPError("400 Client Error", response=response)
+        self.client.create_order = Mock(side_effect=wrapped)
+        self.client.get_order_by_client_oid = Mock()
+
+        self.maker._place("buy", 2_900_000, 0.01)
+
+        self.client.create_order.assert_called_once()
+        self.client.get_order_by_client_oid.assert_not_called()
+        self.assertEqual(self.maker.tracked, {})
+
+
+    def test_unresolved_create_is_claimed_on_next_sync(self):
+        real_create = self.client.create_order
+        real_lookup = self.client.get_order_by_client_oid
+
+        def create(*args, **kwargs):
+            real_create(*args, **kwargs)            # 重送時交易所以重複編號拒絕（4xx）
+            raise requests.exceptions.ReadTimeout("Read timed out")   # 第一次已收單，但回應遺失
+        self.client.create_order = Mock(side_effect=create)
+        self.client.get_order_by_client_oid = Mock(
+            side_effect=requests.exceptions.ReadTimeout("Read timed out"))
+
+        self.maker._place("buy", 2_900_000, 0.01)
+
+        self.assertEqual(self.client.create_order.call_count, 2)
+        (key, info), = self.maker.tracked.items()
+        self.assertTrue(info["pending"])
+        self.assertEqual(key, info["client_oid"])
+        self.assertIsNone(self.maker.trigger_levels())
+
+        # 下一輪：查詢恢復，對回交易所上的那張單，不另掛新單
+        self.client.get_order_by_client_oid = Mock(side_effect=real_lookup)
+        self.maker._reconcile(self.client.get_orders("btctwd", "wait"))
+        self.maker._ensure_single_buy(2_900_000, 0.01)
+        (oid, info), = self.maker.tracked.items()
+        self.assertNotIn("pending", info)
+        self.assertEqual(self.client.get_order(int(oid))["client_oid"], key)
+        self.assertEqual(len(self.client.get_orders("btctwd", "wait")), 1)
+
+    def test_pending_dropped_when_exchange_confirms_missing(self):
+        self.maker.tracked["rt-missing"] = pending_order("buy", 2_900_000, 0.01, "rt-missing")
+        self.maker._reconcile([])
+        self.assertIn("rt-missing", self.maker.tracked)          # 剛送出：404 可能只是還沒寫入
+
+        self.maker.tracked["rt-missing"]["since"] -= PENDING_GRACE
+        self.maker._reconcile([])
+        self.assertEqual(self.maker.tracked, {})
+
+
+class TestMakerTriggerLevels(_MakerTestCase):
+    def test_levels_follow_resting_orders(self):
+        self.assertIsNone(self.maker.trigger_levels())       # 建倉中：無法預知
+        self.maker.phase = "trading"
+        self.record.get_current_balance.return_value = 0.01
+        self.record.get_net_investment.return_value = 30000.0
+        self.record.get_today_trade_count.return_value = 0
+
+        self.maker.sync()
+
+        prices = {info["side"]: info["price"] for info in self.maker.tracked.values()}
+        self.assertEqual(self.maker.trigger_levels(), (prices["buy"], prices["sell"]))
+        self.maker.netting = object()
+        self.maker.sync()
+        self.assertIsNone(self.maker.trigger_levels())
+
+
+class TestMakerPersistence(_MakerTestCase):
+    def test_unchanged_state_is_not_rewritten(self):
+        store = self.maker.store
+        store.save_maker_state = Mock(side_effect=store.save_maker_state)
+        self._track("buy", 2_900_000, 0.01)
+        self.maker._save_state()
+        self.maker._save_state()
+        self.assertEqual(store.save_maker_state.call_count, 1)
+
+    def test_fill_and_state_commit_together(self):
+        from ..utils.trading_record import TradingRecord
+        record = TradingRecord(NAME, store=self.maker.store)
+        self.maker.trading_record = record
+        buy = self._track("buy", 2_900_000, 0.01)
+        self.client.set_price("btctwd", 2_800_000)
+        record.store.save_maker_state = Mock(side_effect=RuntimeError("disk full"))
+
+        with self.assertRaises(RuntimeError):
+            self.maker._apply_order(buy, self.maker.tracked[buy], self.client.get_order(int(buy)))
+
+        # 狀態寫入失敗 → 成交也一起回滾，記憶體與資料庫都沒有這筆
+        self.assertEqual(TradingRecord(NAME, store=self.maker.store).trade_records, [])
+        self.assertEqual(record.trade_records, [])
+        self.assertEqual(self.maker.tracked[buy]["recorded"], 0.0)
+
+        del record.store.save_maker_state
+        self.maker._apply_order(buy, self.maker.tracked[buy], self.client.get_order(int(buy)))
+        self.assertEqual(len(TradingRecord(NAME, store=self.maker.store).trade_records), 1)
+        self.assertEqual(self.maker.store.load_maker_state(NAME)[0], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
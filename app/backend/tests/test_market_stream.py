@@ -0,0 +1,262 @@
+import base64
+import glob
+import hashlib
+import hmac
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from ..models.strategy_config import TradingStrategyConfig
+from ..services.price_service import PriceService
+from ..strategies.maker_orders import MakerOrderManager
+from ..utils.paths import records_dir
+from max.market_stream import MarketDataStream
+from max.mock_client import MockClientV3
+from max.orderbook import OrderBook
+from max.user_stream import UserDataStream
+from max.ws import OP_TEXT, encode_frame, parse_frame
+
+# 錄下來的 MAX 串流訊息（btctwd，節錄），第 4 則 update 故意跳號觸發重新同步
+RECORDED = [
+    {"e": "subscribed", "s": [{"channel": "book", "market": "btctwd", "depth": 10},
+                              {"channel": "trade", "market": "btctwd"}], "i": "rooster"},
+    {"c": "trade", "M": "btctwd", "e": "snapshot", "T": 1700000000000,
+     "t": [{"p": "3000000", "v": "0.01", "T": 1700000000000, "tr": "up"},
+           {"p": "2999000", "v": "0.02", "T": 1699999990000, "tr": "down"}]},
+    {"c": "book", "M": "btctwd", "e": "snapshot", "fi": 100, "li": 100, "T": 1700000000100,
+     "b": [["2999000", "0.5"], ["2998000", "1.0"]],
+     "a": [["3001000", "0.3"], ["3002000", "0.8"]]},
+    {"c": "book", "M": "btctwd", "e": "update", "fi": 101, "li": 101, "T": 1700000000200,
+     "b": [["2999500", "0.2"]], "a": [["3001000", "0"]]},
+    {"c": "trade", "M": "btctwd", "e": "update", "T": 1700000000300,
+     "t": [{"p": "3001000", "v": "0.3", "T": 1700000000300, "tr": "up"}]},
+    {"c": "book", "M": "btctwd", "e": "update", "fi": 105, "li": 105, "T": 1700000000400,
+     "b": [["2999600", "0.1"]], "a": []},
+]
+RESYNC_SNAPSHOT = {
+    "c": "book", "M": "btctwd", "e": "snapshot", "fi": 110, "li": 110, "T": 1700000000500,
+    "b": [["2999700", "0.4"]], "a": [["3001500", "0.6"]],
+}
+
+
+def _handshake(sock):
+    data = b""
+    while b"\r\n\r\n" not in data:
+        data += sock.recv(4096)
+    key = [l.split(":", 1)[1].strip() for l in data.decode().split("\r\n")
+           if l.lower().startswith("sec-websocket-key")][0]
+    accept = base64.b64encode(
+        hashlib.sha1((key + "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode()).digest()
+    ).decode()
+    sock.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+
+def _messages(sock):
+    """逐則產生用戶端送來的 JSON 訊息，連線關閉時結束。"""
+    buf = bytearray()
+    while True:
+        frame = parse_frame(buf)
+        if frame is None:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return
+            buf += chunk
+            continue
+        _, opcode, payload, used = frame
+        del buf[:used]
+        if opcode != OP_TEXT:
+            return
+        yield json.loads(payload)
+
+
+def _send(sock, msg):
+    sock.sendall(encode_frame(OP_TEXT, json.dumps(msg).encode(), mask=False))
+
+
+class _ReplayHandler(socketserver.BaseRequestHandler):
+    """本機替身 WebSocket server：握手後重播 RECORDED，收到 book 重新訂閱時回新 snapshot。"""
+
+    def handle(self):
+        _handshake(self.request)
+        replayed = False
+        for msg in _messages(self.request):
+            self.server.received.append(msg)
+            if msg["action"] == "sub" and not replayed:
+                replayed = True
+                for recorded in RECORDED:
+                    _send(self.request, recorded)
+            elif msg["action"] == "sub":
+                _send(self.request, RESYNC_SNAPSHOT)
+
+
+class _UserEventsHandler(socketserver.BaseRequestHandler):
+    """本機替身私有頻道：驗證簽章後回 authenticated，接著送出 server.events。"""
+
+    def handle(self):
+        _handshake(self.request)
+        for msg in _messages(self.request):
+            self.server.received.append(msg)
+            expected = hmac.new(b"secret", str(msg["nonce"]).encode(), hashlib.sha256).hexdigest()
+            if msg["action"] != "auth" or msg["signature"] != expected:
+                _send(self.request, {"e": "error", "E": ["invalid signature"]})
+                return
+            _send(self.request, {"e": "authenticated", "i": msg["id"]})
+            for event in self.server.events:
+                _send(self.request, event)
+
+
+class TestOrderBook(unittest.TestCase):
+    def test_snapshot_and_deltas_keep_levels_sorted(self):
+        book = OrderBook("btctwd")
+        book.apply_snapshot([["100", "1"], ["98", "2"]], [["101", "1"], ["103", "1"]], last_id=1)
+        self.assertTrue(book.apply_update([["99", "3"], ["100", "0"]], [["102", "4"]], 2, 2))
+        self.assertEqual(book.top(3), {
+            "bids": [[99.0, 3.0], [98.0, 2.0]],
+            "asks": [[101.0, 1.0], [102.0, 4.0], [103.0, 1.0]],
+        })
+        self.assertEqual((book.best_bid(), book.best_ask()), (99.0, 101.0))
+
+    def test_sequence_gap_invalidates_book(self):
+        book = OrderBook("btctwd")
+        book.apply_snapshot([["100", "1"]], [["101", "1"]], last_id=10)
+        self.assertTrue(book.apply_update([], [], 9, 10))      # 已包含在 snapshot
+        self.assertFalse(book.apply_update([["100.5", "1"]], [], 12, 12))
+        self.assertFalse(book.synced)
+        self.assertEqual(book.gaps, 1)
+        self.assertEqual(book.best_bid(), 100.0)               # 缺口後的增量不套用
+
+
+class TestPriceListener(unittest.TestCase):
+    def test_listener_sees_newer_trades_only(self):
+        stream = MarketDataStream(["btctwd"])
+        seen = []
+        stream.add_price_listener(lambda market, price: seen.append((market, price)))
+        stream._handle(RECORDED[1])
+        stream._handle(RECORDED[4])
+        stream._handle(RECORDED[1])      # 較舊的成交不觸發
+        self.assertEqual(seen, [("btctwd", 3000000.0), ("btctwd", 3001000.0)])
+
+
+class TestMarketDataStream(unittest.TestCase):
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _ReplayHandler)
+        self.server.daemon_threads = True
+        self.server.received = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        url = f"ws://127.0.0.1:{self.server.server_address[1]}/ws"
+        self.stream = MarketDataStream(["btctwd"], url=url, idle_timeout=5)
+
+    def tearDown(self):
+        self.stream.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _wait_for(self, predicate, timeout=3):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_replay_builds_book_and_resyncs_on_gap(self):
+        self.stream.start()
+        self.assertTrue(self._wait_for(lambda: self.stream.resyncs == 1
+                                       and self.stream.top_of_book("btctwd") is not None))
+        self.assertEqual(self.stream.last_price("btctwd"), 3001000.0)
+        self.assertEqual(self.stream.top_of_book("btctwd"),
+                         {"bids": [[2999700.0, 0.4]], "asks": [[3001500.0, 0.6]]})
+        actions = [m["action"] for m in self.server.received]
+        self.assertEqual(actions, ["sub", "unsub", "sub"])
+        self.assertEqual(self.server.received[1]["subscriptions"],
+                         [{"channel": "book", "market": "btctwd", "depth": 10}])
+
+    def test_price_service_reads_stream_without_rest(self):
+        self.stream.start()
+        self.assertTrue(self.stream.wait_ready("btctwd"))
+        client = Mock()
+        service = PriceService(client, stream=self.stream)
+        self.assertEqual(service.get_price("BTCTWD"), self.stream.last_price("btctwd"))
+        self.assertIsNotNone(service.get_top_of_book("btctwd"))
+        client.get_trades.assert_not_called()
+
+        self.stream.stop()
+        self.assertIsNone(self.stream.last_price("btctwd"))
+        client.get_trades.return_value = [{"price": "123"}]
+        self.assertEqual(service.get_price("btctwd"), 123.0)   # 斷線退回 REST
+
+
+class TestUserDataStream(unittest.TestCase):
+    NAME = "__user_stream_unittest__"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        env = patch.dict(os.environ, {"ROOSTER_TRADE_DB": os.path.join(self.tmp.name, "trading.db")})
+        env.start()
+        self.addCleanup(env.stop)
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _UserEventsHandler)
+        self.server.daemon_threads = True
+        self.server.received = []
+        self.server.events = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        url = f"ws://127.0.0.1:{self.server.server_address[1]}/ws"
+        self.stream = UserDataStream("key", "secret", url=url, idle_timeout=5)
+
+        self.client = MockClientV3()
+        self.client.set_price("btctwd", 3_000_000)
+        config = TradingStrategyConfig(
+            strategy_name=self.NAME, coin_type="BTC", investment_amount=30000.0,
+            auto_trade_percent=5.0, take_profit=60000.0, max_position=30000.0,
+        )
+        self.record = Mock()
+        self.record.get_current_balance.return_value = 0.0
+        self.maker = MakerOrderManager(self.client, config, self.record)
+
+    def tearDown(self):
+        self.stream.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        for p in glob.glob(os.path.join(records_dir(), f"*{self.NAME}*")):
+            os.remove(p)
+
+    def test_fill_event_records_and_requotes_immediately(self):
+        order = self.client.create_order("btctwd", "buy", 0.01, price=2_900_000, order_type="limit")
+        oid = str(order["id"])
+        self.maker.tracked[oid] = {"side": "buy", "price": 2_900_000, "volume": 0.01, "recorded": 0.0}
+        self.server.events = [
+            {"c": "user", "e": "order_update", "o": [{
+                "i": 999, "M": "btctwd", "sd": "sell", "p": "3100000", "v": "0.01",
+                "ev": "0.01", "rv": "0", "S": "done"}]},
+            {"c": "user", "e": "order_update", "o": [{
+                "i": order["id"], "M": "btctwd", "sd": "buy", "ot": "limit", "p": "2900000",
+                "ap": "2900000", "v": "0.01", "ev": "0.01", "rv": "0", "S": "done"}]},
+        ]
+        handled = []
+        self.stream.add_listener(
+            lambda kind, data: handled.append(self.maker.on_order_update(data))
+        )
+        self.stream.start()
+
+        deadline = time.time() + 3
+        while time.time() < deadline and len(handled) < 2:
+            time.sleep(0.01)
+
+        self.assertEqual(handled, [False, True])            # 別人的單不處理
+        self.assertTrue(self.stream.is_live())
+        self.assertEqual(self.server.received[0]["action"], "auth")
+        self.record.add_trade_record.assert_called_once()
+        self.assertEqual(self.record.add_trade_record.call_args.args[1:4], (2900000.0, 0.01, "buy"))
+        self.assertNotIn(oid, self.maker.tracked)
+        # 建倉尚未完成 → 立即重掛一張新的建倉買單
+        self.assertEqual([i["side"] for i in self.maker.tracked.values()], ["buy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,422 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+import requests
+
+from max.async_client import AsyncClientV3
+from max.client import Client
+from max.client_v3 import ClientV3
+from max.markets import MarketCatalog
+from max.mock_client import MockClientV3
+from max.nonce import NonceGenerator
+from max.pagination import PageCache, iter_pages
+from max.rate_limit import RateLimiter, RateLimitTimeout, TokenBucket
+from max.transport import HttpTransport
+
+
+def _response(payload, status=200):
+    response = Mock()
+    response.status_code = status
+    response.json.return_value = payload
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestHttpTransport(unittest.TestCase):
+    def test_session_pool_and_retry_only_on_connect(self):
+        transport = HttpTransport(pool_maxsize=8, retries=3)
+        adapter = transport.session.get_adapter("https://max-api.maicoin.com")
+        self.assertEqual(adapter._pool_maxsize, 8)
+        self.assertEqual(adapter.max_retries.connect, 3)
+        # 讀取逾時與 5xx 不在 transport 重送（nonce 已固定在請求裡）
+        self.assertEqual(adapter.max_retries.read, 0)
+        self.assertEqual(adapter.max_retries.status, 0)
+
+    def test_default_and_per_call_timeout(self):
+        transport = HttpTransport(timeout=7)
+        transport.session.request = Mock(return_value=_response([]))
+        transport.request("GET", "https://example.test/a")
+        self.assertEqual(transport.session.request.call_args.kwargs["timeout"], 7)
+        transport.request("GET", "https://example.test/a", timeout=2)
+        self.assertEqual(transport.session.request.call_args.kwargs["timeout"], 2)
+
+
+class TestClientV3Transport(unittest.TestCase):
+    def setUp(self):
+        self.transport = Mock()
+        self.client = ClientV3("key", "secret", transport=self.transport)
+
+    def test_get_goes_through_shared_transport(self):
+        self.transport.request.return_value = _response([{"price": "100"}])
+        trades = self.client.get_trades("BTCTWD", limit=1)
+        self.assertEqual(trades[0]["price"], "100")
+        method, url = self.transport.request.call_args.args
+        self.assertEqual(method, "GET")
+        self.assertTrue(url.startswith("https://max-api.maicoin.com/api/v3/trades?"))
+        self.assertIn("market=btctwd", url)
+
+    def test_post_sends_signed_body(self):
+        self.transport.request.return_value = _response({"id": 1})
+        self.client.create_order("btctwd", "buy", 0.001, price=100, order_type="limit")
+        method, url = self.transport.request.call_args.args
+        body = json.loads(self.transport.request.call_args.kwargs["data"])
+        self.assertEqual(method, "POST")
+        self.assertTrue(url.endswith("/api/v3/wallet/spot/order"))
+        self.assertEqual(body["volume"], "0.001")
+        self.assertIn("X-MAX-SIGNATURE", self.transport.request.call_args.kwargs["headers"])
+
+
+class TestNonceGenerator(unittest.TestCase):
+    def test_strictly_increasing_across_threads(self):
+        generator = NonceGenerator()
+        issued = []
+        lock = threading.Lock()
+
+        def worker():
+            values = [generator.next() for _ in range(500)]
+            with lock:
+                issued.extend(values)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(issued), len(set(issued)))
+
+    def test_shared_state_file_orders_independent_generators(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "nonce.state")
+            a, b = NonceGenerator(path), NonceGenerator(path)
+            values = []
+            for _ in range(200):
+                values.append(a.next())
+                values.append(b.next())
+            self.assertEqual(values, sorted(values))
+            self.assertEqual(len(values), len(set(values)))
+
+    def test_align_to_server_clock(self):
+        generator = NonceGenerator()
+        self.assertEqual(generator.align(time.time()), 0)          # 秒級誤差內不校正
+        offset = generator.align(time.time() + 60)
+        self.assertAlmostEqual(offset, 60000, delta=1500)
+        self.assertGreater(generator.next(), int(time.time() * 1000) + 58000)
+
+
+class TestClientV3ServerTime(unittest.TestCase):
+    def test_first_signed_request_aligns_nonce(self):
+        transport = Mock()
+        transport.request.side_effect = [
+            _response({"timestamp": int(time.time()) + 120}),
+            _response([]),
+        ]
+        client = ClientV3("sync-key", "secret", transport=transport)
+        client._nonce = NonceGenerator()
+        client.get_orders("btctwd")
+        self.assertTrue(transport.request.call_args_list[0].args[1].endswith("/api/v3/timestamp"))
+        self.assertAlmostEqual(client._nonce.offset_ms, 120000, delta=1500)
+
+
+class TestMarketCatalog(unittest.TestCase):
+    MARKETS = [
+        {"id": "btctwd", "base_unit_precision": 8, "min_base_amount": 0.0001,
+         "quote_unit_precision": 1, "min_quote_amount": 250},
+        {"id": "usdttwd", "base_unit_precision": 2, "min_base_amount": 8,
+         "quote_unit_precision": 3, "min_quote_amount": 250},
+    ]
+
+    def test_precision_served_from_single_load(self):
+        loader = Mock(return_value=self.MARKETS)
+        catalog = MarketCatalog(loader)
+        self.assertEqual(catalog.tick_size("BTCTWD"), 0.1)
+        self.assertEqual(catalog.round_price("btctwd", 3250000.06), 3250000.1)
+        self.assertEqual(catalog.round_price("usdttwd", 32.34567), 32.346)
+        self.assertEqual(catalog.round_volume("usdttwd", 10.239), 10.23)
+        self.assertEqual(catalog.min_volume("usdttwd", 32.0), 8)
+        self.assertAlmostEqual(catalog.min_volume("btctwd", 2_000_000), 0.000125)
+        loader.assert_called_once()
+
+    def test_ttl_reload_keeps_old_data_on_failure(self):
+        loader = Mock(side_effect=[self.MARKETS, RuntimeError("down")])
+        catalog = MarketCatalog(loader, ttl=0)
+        self.assertEqual(catalog.tick_size("btctwd"), 0.1)
+        self.assertEqual(catalog.tick_size("btctwd"), 0.1)
+        self.assertEqual(loader.call_count, 2)
+        with self.assertRaises(KeyError):
+            catalog.get("ethtwd")
+
+    def test_client_tick_size_does_not_fetch_trades(self):
+        transport = Mock()
+        transport.request.return_value = _response(self.MARKETS)
+        client = ClientV3("catalog-key", "secret", transport=transport)
+        client._nonce = NonceGenerator()
+        client._nonce.mark_synced()
+        for _ in range(5):
+            self.assertEqual(client.tick_size("btctwd"), 0.1)
+        self.assertEqual(transport.request.call_count, 1)
+        self.assertIn("/api/v3/markets", transport.request.call_args.args[1])
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_bucket_waits_when_empty(self):
+        bucket = TokenBucket("private", rate=100, capacity=2)
+        self.assertEqual(bucket.acquire(), 0)
+        bucket.acquire()
+        waited = bucket.acquire()
+        self.assertGreater(waited, 0.005)
+        stats = bucket.stats()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["waits"], 1)
+        self.assertGreater(stats["peak_utilization"], 0.99)
+
+    def test_timeout_and_weights(self):
+        limiter = RateLimiter(private_rate=0.1, private_burst=5)
+        self.assertEqual(limiter.weight("/api/v3/wallet/spot/orders/clear"), 5)
+        self.assertEqual(limiter.weight("orders/clear"), 5)
+        self.assertEqual(limiter.weight("/api/v3/wallet/spot/order"), 1)
+        limiter.acquire("private", "/api/v3/wallet/spot/orders/clear")
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire("private", "/api/v3/wallet/spot/order", timeout=0.01)
+        # public bucket 不受影響
+        self.assertEqual(limiter.acquire("public", "/api/v3/trades"), 0)
+
+    def test_scope_matches_exact_public_paths(self):
+        self.assertEqual(ClientV3._scope("/api/v3/trades"), "public")
+        self.assertEqual(ClientV3._scope("/api/v3/trades/my"), "private")
+        self.assertEqual(ClientV3._scope("/api/v3/wallet/spot/orders"), "private")
+
+    def test_server_time_reports_status_to_limiter(self):
+        transport = Mock()
+        throttled = _response({}, status=429)
+        throttled.headers = {"Retry-After": "0"}
+        throttled.raise_for_status.side_effect = requests.HTTPError("429")
+        transport.request.return_value = throttled
+        limiter = RateLimiter()
+        client = ClientV3("key", "secret", transport=transport, rate_limiter=limiter)
+        with self.assertRaises(requests.HTTPError):
+            client.get_server_time()
+        self.assertEqual(limiter.stats()["public"]["throttled"], 1)
+
+    @patch("max.rate_limit.BACKOFF_BASE", 0.01)
+    def test_429_backs_off_and_retries(self):
+        transport = Mock()
+        throttled = _response({}, status=429)
+        throttled.headers = {"Retry-After": "0"}
+        transport.request.side_effect = [throttled, _response({"id": 7})]
+        limiter = RateLimiter()
+        client = ClientV3("key", "secret", transport=transport, rate_limiter=limiter)
+        client._nonce.mark_synced()
+
+        order = client.create_order("btctwd", "buy", 0.001, price=100, order_type="limit")
+
+        self.assertEqual(order, {"id": 7})
+        self.assertEqual(transport.request.call_count, 2)
+        first = json.loads(transport.request.call_args_list[0].kwargs["data"])
+        second = json.loads(transport.request.call_args_list[1].kwargs["data"])
+        self.assertLess(first["nonce"], second["nonce"])
+        stats = limiter.stats()["private"]
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["requests"], 2)
+
+    @patch("max.client_v3.TRANSIENT_BACKOFF", 0)
+    @patch("max.rate_limit.SERVER_ERROR_BACKOFF", 0)
+    def test_transient_get_errors_are_resigned(self):
+        transport = Mock()
+        transport.request.side_effect = [
+            requests.exceptions.ReadTimeout("slow"),
+            _response({}, status=503),
+            _response([{"id": 1}]),
+        ]
+        limiter = RateLimiter()
+        client = ClientV3("key", "secret", transport=transport, rate_limiter=limiter)
+        client._nonce.mark_synced()
+
+        self.assertEqual(client.get_orders("btctwd"), [{"id": 1}])
+
+        nonces = [int(call.args[1].split("nonce=")[1].split("&")[0])
+                  for call in transport.request.call_args_list]
+        self.assertEqual(len(nonces), 3)
+        self.assertEqual(nonces, sorted(set(nonces)))
+        self.assertEqual(limiter.stats()["private"]["requests"], 3)
+
+    def test_post_is_not_resent_on_timeout(self):
+        transport = Mock()
+        transport.request.side_effect = requests.exceptions.ReadTimeout("slow")
+        client = ClientV3("key", "secret", transport=transport, rate_limiter=RateLimiter())
+        client._nonce.mark_synced()
+        with self.assertRaises(Exception):
+            client.create_order("btctwd", "buy", 0.001, price=100, order_type="limit")
+        self.assertEqual(transport.request.call_count, 1)
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PageCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _fake_pages(self, total, limit, delay=0.05):
+        calls = []
+
+        def fetch(page):
+            calls.append(page)
+            time.sleep(delay)
+            start = (page - 1) * limit
+            return [{"id": i} for i in range(start, min(start + limit, total))]
+        return fetch, calls
+
+    def test_prefetch_streams_in_order_and_stops_at_last_page(self):
+        fetch, calls = self._fake_pages(total=23, limit=5)
+        started = time.time()
+        ids = [r["id"] for r in iter_pages(fetch, 5, prefetch=4)]
+        elapsed = time.time() - started
+        self.assertEqual(ids, list(range(23)))
+        self.assertLess(elapsed, 0.2)             # 依序抓 5 頁需要 0.25 秒以上
+        self.assertLessEqual(max(calls), 8)       # 預取超過最後一頁的部分有上限
+
+    def test_full_pages_cached_on_disk(self):
+        fetch, calls = self._fake_pages(total=12, limit=5, delay=0)
+        key = PageCache.make_key("trades/my", "btctwd")
+        full = lambda rows: len(rows) == 5
+        first = list(iter_pages(fetch, 5, prefetch=1, cache=self.cache, cache_key=key, is_immutable=full))
+        self.assertEqual(calls, [1, 2, 3])
+        calls.clear()
+        second = list(iter_pages(fetch, 5, prefetch=1, cache=self.cache, cache_key=key, is_immutable=full))
+        self.assertEqual(first, second)
+        self.assertEqual(calls, [3])              # 只有未滿的最後一頁重新查詢
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_client_trade_history_iterator(self):
+        client = Client("key", "secret", page_cache=self.cache)
+        pages = {1: [{"id": 1}, {"id": 2}], 2: [{"id": 3}]}
+        client.get_private_trade_history = Mock(
+            side_effect=lambda pair, page, limit, **kw: pages.get(page, [])
+        )
+        trades = list(client.iter_private_trade_history("BTCTWD", limit=2, prefetch=2))
+        self.assertEqual([t["id"] for t in trades], [1, 2, 3])
+        kwargs = client.get_private_trade_history.call_args.kwargs
+        self.assertEqual(kwargs["sort"], "asc")
+
+    def test_open_window_deposits_not_cached(self):
+        client = Client("key", "secret", page_cache=self.cache)
+        client.get_private_deposit_history = Mock(
+            side_effect=lambda currency, page, **kw: [{"state": "accepted"}] if page == 1 else []
+        )
+        list(client.iter_private_deposit_history("twd", limit=1, prefetch=1, use_cache=True))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        list(client.iter_private_deposit_history("twd", to=1, limit=1, prefetch=1))
+        self.assertGreater(len(os.listdir(self.tmp.name)), 0)
+
+
+class _SlowOrdersHandler(BaseHTTPRequestHandler):
+    """本機替身 HTTP server：查訂單列表固定延遲 0.2 秒。"""
+
+    def do_GET(self):
+        if self.path.startswith("/api/v3/timestamp"):
+            body = {"timestamp": int(time.time())}
+        else:
+            time.sleep(0.2)
+            body = []
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAsyncClientV3(unittest.TestCase):
+    def test_fan_out_against_mock_client(self):
+        mock = MockClientV3()
+        mock.set_price("btctwd", 3_000_000)
+        order = mock.create_order("btctwd", "buy", 0.01, price=2_900_000, order_type="limit")
+
+        async def run():
+            async with AsyncClientV3(mock, max_concurrency=4) as ac:
+                orders = await ac.get_orders_many(["btctwd", "ethtwd"])
+                one = await ac.get_order(order["id"])
+                return orders, one
+
+        orders, one = asyncio.run(run())
+        self.assertEqual([o["id"] for o in orders["btctwd"]], [order["id"]])
+        self.assertEqual(orders["ethtwd"], [])
+        self.assertEqual(one["state"], "wait")
+
+    def test_create_order_forwards_group_and_client_oid(self):
+        mock = MockClientV3()
+        mock.set_price("btctwd", 3_000_000)
+
+        async def run():
+            async with AsyncClientV3(mock) as ac:
+                await ac.create_order("btctwd", "buy", 0.01, price=2_900_000, order_type="limit",
+                                      group_id=7, client_oid="oid-1")
+                found = await ac.get_order_by_client_oid("oid-1")
+                await ac.cancel_orders(group_id=7)
+                return found
+
+        found = asyncio.run(run())
+        self.assertEqual(found["client_oid"], "oid-1")
+        self.assertEqual(mock.get_orders("btctwd", "wait"), [])
+
+    def test_in_flight_capped(self):
+        client = Mock()
+        client.get_order.side_effect = lambda oid, wallet_type="spot": time.sleep(0.05) or {"id": oid}
+        ac = AsyncClientV3(client, max_concurrency=2)
+        results = asyncio.run(ac.get_order_many(range(6)))
+        ac.close()
+        self.assertEqual(sorted(r["id"] for r in results.values()), list(range(6)))
+        self.assertEqual(ac.peak_in_flight, 2)
+
+    def test_timeout_and_cancellation(self):
+        client = Mock()
+        client.get_trades.side_effect = lambda market, limit=1: time.sleep(0.3) or []
+        ac = AsyncClientV3(client, max_concurrency=1, timeout=0.05)
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await ac.get_trades("btctwd")
+            task = asyncio.ensure_future(ac.get_trades("ethtwd", timeout=5))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        ac.close(wait=True)
+        # 第二個請求在佇列中就被取消，沒有真的送出
+        self.assertEqual(client.get_trades.call_count, 1)
+
+    def test_concurrent_requests_against_local_server(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowOrdersHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = ClientV3("key", "secret", transport=HttpTransport(retries=0))
+            client._api_url = f"http://127.0.0.1:{server.server_port}"
+            client.sync_time()
+            ac = AsyncClientV3(client, max_concurrency=4, timeout=5)
+            started = time.time()
+            results = asyncio.run(ac.get_orders_many(["btctwd", "ethtwd", "usdttwd", "soltwd"]))
+            elapsed = time.time() - started
+            ac.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(list(results.values()), [[], [], [], []])
+        self.assertLess(elapsed, 0.6)      # 依序執行需要 0.8 秒
+
+
+if __name__ == "__main__":
+    unittest.main()
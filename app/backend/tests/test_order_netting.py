@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+
+from max.mock_client import MockClientV3
+
+from ..models.strategy_config import TradingStrategyConfig
+from ..strategies.maker_orders import MAKER_FEE_RATE, MakerOrderManager
+from ..strategies.order_netting import NettingBook, allocate, net_desires
+from ..utils.trade_store import TradeStore
+from ..utils.trading_record import TradingRecord
+
+
+class TestNetDesires(unittest.TestCase):
+    def test_same_price_merges_and_crossing_matches(self):
+        crosses, levels = net_desires([
+            ("a", "buy", 100.0, 1.0), ("b", "buy", 100.0, 2.0),
+            ("a", "sell", 120.0, 1.0), ("c", "sell", 99.0, 0.5),
+        ])
+        self.assertEqual(crosses, [("a", "c", 100.0, 99.0, 0.5)])
+        self.assertEqual(levels[("buy", 100.0)], {"a": 0.5, "b": 2.0})
+        self.assertEqual(levels[("sell", 120.0)], {"a": 1.0})
+        self.assertNotIn(("sell", 99.0), levels)
+
+    def test_allocate_sums_exactly(self):
+        shares = allocate({"a": 1.0, "b": 1.0, "c": 1.0}, 0.01)
+        self.assertAlmostEqual(shares["a"], 0.01 / 3)
+        self.assertEqual(sum(shares.values()), 0.01)
+
+
+class TestNettingBook(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TradeStore(os.path.join(self.tmp.name, "trading.db"))
+        self.client = MockClientV3()
+        self.client.set_price("btctwd", 3_000_000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _maker(self, name, balance):
+        config = TradingStrategyConfig(
+            strategy_name=name, coin_type="BTC", investment_amount=30000.0,
+            auto_trade_percent=5.0, take_profit=60000.0, max_position=30000.0,
+        )
+        record = TradingRecord(name, store=self.store)
+        record.add_trade_record("2024-01-01T00:00:00", 3_000_000, balance, "buy")
+        maker = MakerOrderManager(self.client, config, record)
+        self.assertEqual(maker.phase, "trading")
+        return maker
+
+    def test_merged_orders_and_pro_rata_fills(self):
+        a, b = self._maker("net_a", 0.01), self._maker("net_b", 0.01)
+        a._place("sell", 3_200_000, 0.001)        # 加入前自己掛的單會被撤掉
+        book = NettingBook(self.client, "btctwd", self.store)
+        book.set_members([a, b])
+        book.sync()
+
+        self.assertEqual(a.tracked, {})
+        open_orders = self.client.get_orders("btctwd", "wait")
+        self.assertEqual(sorted(o["side"] for o in open_orders), ["buy", "sell"])
+        buy_price, buy_volume = a._desired_orders()["buy"]
+        buy = next(o for o in open_orders if o["side"] == "buy")
+        self.assertAlmostEqual(float(buy["volume"]), 2 * buy_volume, places=6)
+
+        # 沒有變化：不撤不重掛
+        book.sync()
+        self.assertEqual(len(self.client.get_orders("btctwd", "wait")), 2)
+
+        self.client.set_price("btctwd", buy_price - 10_000)
+        messages = book.sync(self.client.get_orders("btctwd", "wait"))
+
+        self.assertEqual(set(messages), {"net_a", "net_b"})
+        for maker in (a, b):
+            fill = maker.trading_record.trade_records[-1]
+            self.assertEqual(fill["action"], "buy")
+            self.assertAlmostEqual(fill["volume"], float(buy["volume"]) / 2)
+            self.assertAlmostEqual(fill["fee"], fill["price"] * fill["volume"] * MAKER_FEE_RATE)
+        # 重啟後從資料庫讀回同一份外部單狀態
+        self.assertEqual(NettingBook(self.client, "btctwd", self.store).tracked, book.tracked)
+
+    def test_crossing_desires_match_internally(self):
+        a = self._maker("net_a", 0.01)         # 買價 2.85M
+        b = self._maker("net_b", 0.0115)       # 賣價約 2.74M，低於 a 的買價
+        book = NettingBook(self.client, "btctwd", self.store)
+        book.set_members([a, b])
+
+        messages = book.sync()
+
+        self.assertIn("內部撮合", messages["net_a"][0])
+        bought = a.trading_record.trade_records[-1]
+        sold = b.trading_record.trade_records[-1]
+        self.assertEqual((bought["action"], sold["action"]), ("buy", "sell"))
+        self.assertEqual(bought["volume"], sold["volume"])
+        self.assertEqual(bought["price"], sold["price"])
+        self.assertEqual(bought["fee"], 0.0)
+        for order in self.client.get_orders("btctwd", "wait"):
+            self.assertEqual(float(order["executed_volume"] or 0), 0.0)
+
+    def test_single_member_cancels_merged_orders(self):
+        a, b = self._maker("net_a", 0.01), self._maker("net_b", 0.01)
+        book = NettingBook(self.client, "btctwd", self.store)
+        book.set_members([a, b])
+        book.sync()
+        book.set_members([], known=[a])
+        book.sync()
+        self.assertIsNone(b.netting)
+        self.assertEqual(self.client.get_orders("btctwd", "wait"), [])
+        book.sync()
+        self.assertEqual(book.tracked, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+
+from ..services.price_service import PriceService
+
+
+class _SlowClient:
+    """get_trades 會卡一下，並可透過 price 改變回傳價。"""
+
+    def __init__(self, price=100.0, delay=0.05):
+        self.price = price
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_trades(self, market, limit=1):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return [{"price": str(self.price)}]
+
+
+class TestPriceService(unittest.TestCase):
+    def test_concurrent_requests_are_coalesced(self):
+        client = _SlowClient()
+        service = PriceService(client, ttl=10)
+        results = []
+
+        def worker():
+            results.append(service.get_price("BTCTWD"))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [100.0] * 8)
+        self.assertEqual(client.calls, 1)
+        self.assertEqual(service.fetch_count, 1)
+
+    def test_cycle_freezes_price_until_exit(self):
+        client = _SlowClient(delay=0)
+        service = PriceService(client, ttl=0)
+
+        with service.cycle():
+            self.assertEqual(service.get_price("btctwd"), 100.0)
+            client.price = 120.0
+            self.assertEqual(service.get_price("btctwd"), 100.0)
+            with service.cycle():
+                self.assertEqual(service.get_price("btctwd"), 100.0)
+
+        self.assertEqual(service.get_price("btctwd"), 120.0)
+
+    def test_fetch_error_is_shared_and_not_cached(self):
+        client = _SlowClient(delay=0)
+        client.get_trades = lambda market, limit=1: []
+        service = PriceService(client, ttl=10)
+        with self.assertRaises(ValueError):
+            service.get_price("btctwd")
+        client.get_trades = lambda market, limit=1: [{"price": "5"}]
+        self.assertEqual(service.get_price("btctwd"), 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from max.mock_client import MockClientV3
+
+from ..models.strategy_config import TradingStrategyConfig
+from ..strategies.strategy_manager import StrategyManager
+from ..utils.trade_store import get_trade_store
+
+
+class _FakeStrategy:
+    """只實作 StrategyManager 執行一輪會用到的介面。"""
+
+    def __init__(self, delay=0.0, result=None, error=None, take_profit=None):
+        self.config = SimpleNamespace(is_active=True)
+        self.maker = SimpleNamespace(market="btctwd", tracked={})
+        self.delay = delay
+        self.result = result
+        self.error = error
+        self.take_profit = take_profit
+        self.prices = []
+        self.levels = None
+
+    def trigger_levels(self):
+        return self.levels
+
+    def check_take_profit(self):
+        return self.take_profit
+
+    def check_and_trade(self, open_orders=None):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class TestParallelExecution(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(StrategyManager, "_load_all_strategies"):
+            self.manager = StrategyManager(mock.Mock())
+        self.manager._prefetch_open_orders = lambda: {}
+        self.manager._save_index = lambda strategy: None
+
+    def tearDown(self):
+        self.manager._executor.shutdown(wait=True)
+
+    def test_strategies_run_concurrently_in_order(self):
+        self.manager.strategies = {
+            f"s{i}": _FakeStrategy(delay=0.2, result=f"done {i}") for i in range(4)
+        }
+        start = time.monotonic()
+        results = self.manager.execute_all_strategies()
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual([r["strategy_name"] for r in results], ["s0", "s1", "s2", "s3"])
+        self.assertEqual({r["action"] for r in results}, {"trade"})
+
+    def test_error_is_isolated_per_strategy(self):
+        self.manager.strategies = {
+            "bad": _FakeStrategy(error=RuntimeError("boom")),
+            "tp": _FakeStrategy(take_profit="停利完成"),
+            "ok": _FakeStrategy(result="買入"),
+        }
+        results = self.manager.execute_all_strategies()
+        self.assertEqual(results, [
+            {"strategy_name": "bad", "action": "error", "message": "boom"},
+            {"strategy_name": "tp", "action": "take_profit", "message": "停利完成"},
+            {"strategy_name": "ok", "action": "trade", "message": "買入"},
+        ])
+
+    def test_overrun_reports_timeout_and_skips_next_cycle(self):
+        release = threading.Event()
+        slow = _FakeStrategy(result="slow")
+        slow.check_and_trade = lambda open_orders=None: release.wait(2) and "slow"
+        self.manager.strategies = {"slow": slow, "fast": _FakeStrategy(result="fast")}
+        self.manager.cycle_budget = 0.1
+
+        first = self.manager.execute_all_strategies()
+        self.assertEqual([r["action"] for r in first], ["timeout", "trade"])
+        # 上一輪還沒跑完：本輪直接跳過，不會疊兩個執行
+        second = self.manager.execute_all_strategies()
+        self.assertEqual(second, [{"strategy_name": "fast", "action": "trade", "message": "fast"}])
+        release.set()
+
+
+class TestUserEvents(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(StrategyManager, "_load_all_strategies"):
+            self.manager = StrategyManager(mock.Mock())
+
+    def tearDown(self):
+        self.manager._event_executor.shutdown(wait=True)
+        self.manager._executor.shutdown(wait=True)
+
+    def test_order_events_are_handled_off_the_stream_thread(self):
+        release = threading.Event()
+        handled = []
+
+        def on_order_update(order):
+            release.wait(2)
+            handled.append((order["id"], threading.current_thread().name))
+            return True
+
+        strategy = _FakeStrategy()
+        strategy.maker = SimpleNamespace(market="btctwd", on_order_update=on_order_update)
+        self.manager.strategies = {"s": strategy}
+
+        start = time.monotonic()
+        self.manager._on_user_event("order", {"id": 1, "market": "btctwd"})
+        self.manager._on_user_event("order", {"id": 2, "market": "btctwd"})
+        self.manager._on_user_event("trade", {"id": 3, "market": "btctwd"})
+        self.assertLess(time.monotonic() - start, 0.1)       # 串流執行緒不被阻塞
+
+        release.set()
+        self.manager._event_executor.shutdown(wait=True)
+        self.assertEqual([oid for oid, _ in handled], [1, 2])  # 依序處理
+        self.assertTrue(all(name.startswith("order-events") for _, name in handled))
+
+
+class TestEventDriven(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(StrategyManager, "_load_all_strategies"):
+            self.manager = StrategyManager(mock.Mock())
+        self.manager.event_driven = True
+        prices = {"btctwd": 3_000_000.0, "ethtwd": 100_000.0}
+        self.manager.price_service.get_price = prices.get
+        self.prefetched = []
+        self.open_orders = {}
+        self.manager._prefetch_open_orders = (
+            lambda markets=None: self.prefetched.append(markets) or self.open_orders)
+        self.manager._save_index = lambda strategy: None
+
+    def tearDown(self):
+        self.manager._executor.shutdown(wait=True)
+
+    def test_idle_strategies_are_skipped(self):
+        idle = _FakeStrategy(result="idle")
+        idle.levels = (2_900_000.0, 3_100_000.0)
+        near = _FakeStrategy(result="near")
+        near.levels = (2_995_000.0, 3_100_000.0)
+        other = _FakeStrategy(result="other")
+        other.maker = SimpleNamespace(market="ethtwd", tracked={})
+        other.levels = (90_000.0, 110_000.0)
+        self.manager.strategies = {"idle": idle, "near": near, "other": other}
+
+        # 第一次一律執行（還沒有執行記錄）
+        self.assertEqual(len(self.manager.execute_all_strategies()), 3)
+        results = self.manager.execute_all_strategies()
+        self.assertEqual([r["strategy_name"] for r in results], ["near"])
+        self.assertIsNone(self.prefetched[-1])          # 掛單列表仍查所有活躍市場
+        self.assertEqual(self.manager.trigger_stats["idle"], 2)
+
+        # 閒置超過上限：安全網照常執行
+        self.manager.trigger_max_idle = 0
+        self.assertEqual(len(self.manager.execute_all_strategies()), 3)
+
+    def test_missing_tracked_order_makes_strategy_due(self):
+        strategy = _FakeStrategy(result="filled")
+        strategy.levels = (2_900_000.0, 3_100_000.0)
+        strategy.maker.tracked = {"1": {}, "2": {}}
+        self.manager.strategies = {"s": strategy}
+        self.open_orders = {"btctwd": [{"id": 1}, {"id": 2}]}
+        self.manager.execute_all_strategies()
+        self.assertEqual(self.manager.execute_all_strategies(), [])
+
+        self.open_orders = {"btctwd": [{"id": 1}]}      # 2 號單成交或被撤
+        results = self.manager.execute_all_strategies()
+        self.assertEqual([r["strategy_name"] for r in results], ["s"])
+
+    def test_netting_messages_reported_for_idle_members(self):
+        idle = _FakeStrategy(result="idle")
+        idle.levels = (2_900_000.0, 3_100_000.0)
+        self.manager.strategies = {"idle": idle}
+        self.manager.execute_all_strategies()
+        self.manager._sync_netting = lambda open_orders: {"idle": ["合併單成交"]}
+        with mock.patch.object(self.manager, "_is_due", return_value=False), \
+                mock.patch.object(self.manager, "_run_strategy", return_value=[]):
+            results = self.manager.execute_all_strategies()
+        self.assertEqual(results, [{"strategy_name": "idle", "action": "trade", "message": "合併單成交"}])
+
+    def test_stream_price_near_trigger_wakes_once(self):
+        strategy = _FakeStrategy()
+        strategy.levels = (2_900_000.0, 3_100_000.0)
+        self.manager.strategies = {"s": strategy}
+        wakes = []
+        self.manager.add_wake_listener(lambda: wakes.append(1))
+
+        self.manager._on_price("btctwd", 3_000_000.0)
+        self.assertEqual(wakes, [])
+        self.manager._on_price("btctwd", 3_095_000.0)
+        self.manager._on_price("btctwd", 3_096_000.0)     # 短時間內不重複喚醒
+        self.assertEqual(wakes, [1])
+
+
+class TestLazyLoading(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(os.environ, {
+            "CONFIG_DIR": self.tmp.name,
+            "ROOSTER_TRADE_DB": os.path.join(self.tmp.name, "trading.db"),
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        os.makedirs(os.path.join(self.tmp.name, "strategies"))
+        for name, active in (("active", True), ("idle", False)):
+            TradingStrategyConfig(strategy_name=name, coin_type="BTC", investment_amount=10000.0,
+                                  max_position=0, take_profit=9e9, auto_trade_percent=5.0,
+                                  is_active=active).save()
+        self.store = get_trade_store()
+        self._fill("idle", "buy", 0.01)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _fill(self, name, action, volume):
+        self.store.append_fill({"strategy_name": name, "trade_time": "2024-01-01T00:00:00",
+                                "price": 1_000_000.0, "volume": volume, "action": action,
+                                "confirmed": False, "amount": 1_000_000.0 * volume, "fee": 0.0})
+
+    def _manager(self):
+        manager = StrategyManager(MockClientV3())
+        self.addCleanup(manager._executor.shutdown, wait=True)
+        manager._hydrate_all(["active"])
+        return manager
+
+    def _status(self, manager, name):
+        return next(s for s in manager.get_all_strategies() if s["config"]["strategy_name"] == name)
+
+    def test_inactive_strategy_served_from_index(self):
+        first = self._manager()
+        self.assertEqual(set(first.strategies), {"active"})
+        # 第一次啟動沒有索引：顯示狀態時載入並寫入索引
+        self.assertAlmostEqual(self._status(first, "idle")["current_balance"], 0.01)
+        self.assertIn("idle", first.strategies)
+
+        second = self._manager()
+        status = self._status(second, "idle")
+        self.assertNotIn("idle", second.strategies)
+        self.assertAlmostEqual(status["current_balance"], 0.01)
+        self.assertEqual(status["trade_count"], 1)
+        self.assertEqual(second.get_trading_stats("idle")["total_trades"], 1)
+        self.assertNotIn("idle", second.strategies)
+        # 第一次存取策略物件時才載入
+        self.assertIsNotNone(second.get_strategy("idle"))
+        self.assertIn("idle", second.strategies)
+
+    def test_stale_index_falls_back_to_full_load(self):
+        self._status(self._manager(), "idle")
+        self._fill("idle", "buy", 0.02)
+        manager = self._manager()
+        self.assertAlmostEqual(self._status(manager, "idle")["current_balance"], 0.03)
+        self.assertIn("idle", manager.strategies)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from ..models.strategy_config import TradingStrategyConfig
+from ..services.strategy_runner import RemoteStrategyManager, RunnerChannel, RunnerError, StrategyRunner
+from ..strategies.strategy_manager import empty_trading_stats
+
+
+class _FakeManager:
+    def __init__(self):
+        self.created = []
+
+    def create_strategy(self, config):
+        self.created.append(config)
+        return True
+
+    def delete_strategy(self, strategy_name):
+        raise RuntimeError(f"{strategy_name} 正在執行")
+
+    def get_trading_stats(self, strategy_name=None):
+        return {"total_trades": len(self.created), "strategy_name": strategy_name}
+
+    def get_all_trading_stats(self):
+        return {c.strategy_name: self.get_trading_stats(c.strategy_name) for c in self.created}
+
+    def get_all_strategies(self):
+        return [{"name": c.strategy_name} for c in self.created]
+
+
+class TestStrategyRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.channel = RunnerChannel(os.path.join(self.tmp.name, "runner.db"))
+        self.manager = _FakeManager()
+        self.remote = RemoteStrategyManager(self.channel, timeout=5)
+
+    def _serve(self):
+        runner = StrategyRunner(self.manager, self.channel, poll=0.02,
+                                status_sources={"scheduler": lambda: {"role": "leader"}})
+        thread = threading.Thread(target=runner.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(runner.stop)
+        return runner
+
+    def _config(self, name):
+        return TradingStrategyConfig(strategy_name=name, investment_amount=1000.0, max_position=0,
+                                     take_profit=2000.0, auto_trade_percent=5.0, coin_type="BTC")
+
+    def test_commands_and_snapshots_round_trip(self):
+        self._serve()
+        time.sleep(0.1)
+        self.assertTrue(self.remote.create_strategy(self._config("s1")))
+        self.assertEqual(self.manager.created[0].strategy_name, "s1")
+        self.assertEqual(self.remote.get_trading_stats("s1"), {"total_trades": 1, "strategy_name": "s1"})
+
+        # 變更類指令完成後立即重發快照
+        deadline = time.time() + 2
+        while self.remote.get_all_strategies() != [{"name": "s1"}] and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(self.remote.get_all_strategies(), [{"name": "s1"}])
+        self.assertEqual(self.remote.status("scheduler"), {"role": "leader"})
+
+    def test_errors_are_reported_to_web(self):
+        self._serve()
+        time.sleep(0.1)
+        self.assertFalse(self.remote.delete_strategy("s1"))
+        with self.assertRaises(RunnerError):
+            self.channel.call("get_trading_stats", {"bogus": 1})
+
+    def test_no_runner_fails_fast(self):
+        start = time.monotonic()
+        self.assertFalse(self.remote.create_strategy(self._config("s1")))
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_queries_degrade_without_runner(self):
+        start = time.monotonic()
+        self.assertEqual(self.remote.get_trading_stats(), empty_trading_stats())
+        self.assertEqual(self.remote.get_trading_stats("s1"), empty_trading_stats())
+        page = self.remote.get_trading_history_page("s1")
+        self.assertEqual((page["records"], page["next_cursor"]), ([], None))
+        self.assertIn("error", page)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_strategy_stats_read_from_snapshot(self):
+        self.channel.publish("strategy_stats", {"s1": {"total_trades": 3}})
+        self.assertEqual(self.remote.get_trading_stats("s1"), {"total_trades": 3})   # 不經 runner
+        self.assertEqual(self.remote.get_trading_stats("s2"), empty_trading_stats())
+
+    def test_expired_commands_are_not_executed(self):
+        self.channel.submit("create_strategy", {"config": self._config("late").to_dict()}, timeout=0)
+        self.assertEqual(self.channel.claim(), [])
+        self._serve()
+        time.sleep(0.1)
+        self.assertEqual(self.manager.created, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
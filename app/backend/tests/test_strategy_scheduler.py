@@ -0,0 +1,106 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from ..services import strategy_scheduler
+from ..services.strategy_scheduler import StrategyScheduler
+
+
+class TestStrategyScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lock_path = os.path.join(self.tmp.name, "scheduler.lock")
+        self.schedulers = []
+
+    def tearDown(self):
+        for scheduler in self.schedulers:
+            scheduler.stop()
+        self.tmp.cleanup()
+
+    def _scheduler(self, run_cycle, interval=1, jitter=0):
+        scheduler = StrategyScheduler(run_cycle, self.lock_path, interval=interval, jitter=jitter)
+        self.schedulers.append(scheduler)
+        return scheduler
+
+    @unittest.skipIf(strategy_scheduler.fcntl is None, "需要 fcntl 檔案鎖")
+    def test_only_one_leader_runs_cycles(self):
+        calls = []
+        first = self._scheduler(lambda: calls.append("a") or [])
+        second = self._scheduler(lambda: calls.append("b") or [])
+        first.start()
+        time.sleep(0.2)
+        second.start()
+        time.sleep(0.3)
+        self.assertEqual(first.stats()["role"], "leader")
+        self.assertEqual(second.stats()["role"], "standby")
+        self.assertEqual(set(calls), {"a"})
+        # 待命者回報 leader 寫出的狀態
+        status = second.status()
+        self.assertEqual(status["role"], "leader")
+        self.assertEqual(status["worker_role"], "standby")
+        self.assertEqual(status["pid"], os.getpid())
+
+    @unittest.skipIf(strategy_scheduler.fcntl is None, "需要 fcntl 檔案鎖")
+    def test_manual_run_respects_leader(self):
+        leader = self._scheduler(lambda: [{"action": "trade"}], interval=30)
+        leader.start()
+        time.sleep(0.2)
+        manual = self._scheduler(lambda: [{"action": "manual"}])
+        self.assertIsNone(manual.run_now())                  # 別的 worker 是 leader：不執行
+        self.assertEqual(leader.run_now(), [{"action": "trade"}])
+        leader.stop()
+        # 排程停用（沒有 start）時只在執行期間持有鎖
+        self.assertEqual(manual.run_now(), [{"action": "manual"}])
+        self.assertFalse(manual.is_leader)
+
+    def test_stats_errors_and_overrun(self):
+        scheduler = self._scheduler(lambda: [{"action": "trade"}, {"action": "trade"}, {"action": "error"}])
+        scheduler.run_once()
+        stats = scheduler.stats()
+        self.assertEqual(stats["cycles"], 1)
+        self.assertEqual(stats["last_results"], {"trade": 2, "error": 1})
+        self.assertEqual(stats["overruns"], 0)
+
+        def boom():
+            raise RuntimeError("down")
+        scheduler.run_cycle = boom
+        scheduler.run_once()
+        self.assertEqual(scheduler.stats()["errors"], 1)
+        self.assertEqual(scheduler.stats()["last_error"], "down")
+
+        scheduler.interval = 0.05
+        scheduler.run_cycle = lambda: time.sleep(0.1) or []
+        scheduler.run_once()
+        self.assertEqual(scheduler.stats()["overruns"], 1)
+
+    def test_overrun_skips_missed_slots_without_drift(self):
+        scheduler = self._scheduler(lambda: [], interval=10)
+        self.assertEqual(scheduler._next_slot(100.0, 105.0), 110.0)
+        self.assertEqual(scheduler._next_slot(100.0, 135.0), 140.0)
+        self.assertEqual(scheduler.stats()["skipped"], 3)
+
+    def test_wake_runs_early_without_shifting_schedule(self):
+        calls = []
+        scheduler = self._scheduler(lambda: calls.append(time.monotonic()) or [], interval=30)
+        scheduler.start()
+        time.sleep(0.2)
+        self.assertEqual(len(calls), 1)
+        scheduler.wake()
+        time.sleep(0.2)
+        self.assertEqual(len(calls), 2)
+        stats = scheduler.stats()
+        self.assertEqual(stats["wakeups"], 1)
+        self.assertEqual(stats["skipped"], 0)
+
+    def test_jitter_is_bounded(self):
+        started = threading.Event()
+        scheduler = self._scheduler(lambda: started.set() or [], interval=1, jitter=5)
+        self.assertEqual(scheduler.jitter, 0.5)
+        scheduler.start()
+        self.assertTrue(started.wait(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from max.mock_client import MockClientV3
+
+from ..models.strategy_config import TradingStrategyConfig
+from ..strategies import auto_trade_strategy
+from ..strategies.auto_trade_strategy import AutoTradeStrategy
+from ..utils.telegram_handler import TelegramCallbackHandler
+from ..utils.trade_store import TradeStore
+
+
+class TestConfirmationStateMachine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TradeStore(os.path.join(self.tmp.name, "trading.db"))
+        self.handler = TelegramCallbackHandler(store=self.store, timeout=60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_answer_wakes_listener_and_persists(self):
+        woken = []
+        self.handler.add_listener(woken.append)
+        trade_id = self.handler.add_pending_trade("s1", {"action": "buy", "volume": 1})
+        self.assertEqual(self.handler.get_intent("s1")["status"], "pending")
+
+        self.handler.confirm_trade(trade_id)
+        self.assertEqual(woken, [trade_id])
+        # 另一個 process（新的 handler）也讀得到答覆
+        other = TelegramCallbackHandler(store=self.store)
+        self.assertEqual(other.get_intent("s1")["status"], "confirmed")
+        self.assertTrue(other.wait_for_confirmation(trade_id, timeout=1))
+        self.assertIsNone(self.handler.get_intent("s1"))
+
+    def test_late_answer_after_expiry_is_ignored(self):
+        trade_id = self.handler.add_pending_trade("s1", {"action": "sell"}, timeout=0)
+        self.assertEqual(self.handler.get_intent("s1")["status"], "expired")
+        self.handler.confirm_trade(trade_id)
+        self.assertEqual(self.handler.get_intent("s1")["status"], "expired")
+
+    def test_wait_returns_immediately_on_answer(self):
+        trade_id = self.handler.add_pending_trade("s1", {"action": "buy"})
+        self.handler.cancel_trade(trade_id)
+        start = time.monotonic()
+        self.assertFalse(self.handler.wait_for_confirmation(trade_id, timeout=30))
+        self.assertLess(time.monotonic() - start, 1)
+
+
+class TestNonBlockingExecuteTrade(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(os.environ, {"ROOSTER_TRADE_DB": os.path.join(self.tmp.name, "trading.db")})
+        env.start()
+        self.addCleanup(env.stop)
+        self.handler = TelegramCallbackHandler(timeout=60)
+        patcher = mock.patch.object(auto_trade_strategy, "callback_handler", self.handler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        config = TradingStrategyConfig(strategy_name="confirm_test", coin_type="BTC",
+                                       investment_amount=10000.0, max_position=0, take_profit=20000.0,
+                                       auto_trade_percent=5.0, confirm_amount_threshold=1.0)
+        self.client = MockClientV3()
+        self.strategy = AutoTradeStrategy(self.client, config)
+        self.strategy.notifier = mock.Mock()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_confirmation_resumes_in_later_cycle(self):
+        start = time.monotonic()
+        self.assertFalse(self.strategy.execute_trade("buy", 0.001))
+        self.assertLess(time.monotonic() - start, 1)      # 不再阻塞等待
+        trade_id = self.strategy.notifier.send_trade_confirmation.call_args[0][-1]
+
+        # 尚未答覆：不重複發送確認請求
+        self.assertFalse(self.strategy.execute_trade("buy", 0.001))
+        self.assertEqual(self.strategy.notifier.send_trade_confirmation.call_count, 1)
+
+        self.handler.confirm_trade(trade_id)
+        self.assertTrue(self.strategy.execute_trade("buy", 0.001))
+        self.assertAlmostEqual(self.strategy.get_coin_balance(), 0.001)
+        self.assertIsNone(self.handler.get_intent("confirm_test"))
+
+    def test_cancelled_intent_is_reported_once(self):
+        self.strategy.execute_trade("buy", 0.001)
+        trade_id = self.strategy.notifier.send_trade_confirmation.call_args[0][-1]
+        self.handler.cancel_trade(trade_id)
+        self.assertFalse(self.strategy.execute_trade("buy", 0.001))
+        self.strategy.notifier.send_trade_result.assert_called_with("confirm_test", False, "用戶取消交易")
+        self.assertEqual(self.strategy.get_coin_balance(), 0)
+
+    def _hold(self, volume, price):
+        self.strategy.trading_record.add_trade_record("2024-01-01T00:00:00", price, volume, "buy")
+        self._set_price(price)
+
+    def _set_price(self, price):
+        self.client.set_price("btctwd", price)
+        self.strategy.price_service.get_price = lambda market: float(price)   # 略過價格快取
+
+    def test_take_profit_sell_clamped_to_balance_after_fill(self):
+        self._hold(0.01, 2_000_000)                       # 市值 20,000 = 停利金額
+        self.assertIsNone(self.strategy.check_take_profit())
+        trade_id = self.strategy.notifier.send_trade_confirmation.call_args[0][-1]
+
+        # 等待確認期間 maker 賣單成交，持倉變少
+        self.strategy.trading_record.add_trade_record("2024-01-01T00:01:00", 2_000_000, 0.004, "sell")
+        self._set_price(4_000_000)                        # 剩餘持倉市值仍達停利
+        self.handler.confirm_trade(trade_id)
+
+        self.assertIsNotNone(self.strategy.check_take_profit())
+        self.assertAlmostEqual(self.strategy.trading_record.trade_records[-1]["volume"], 0.006)
+        self.assertAlmostEqual(self.strategy.get_coin_balance(), 0.0)
+
+    def test_take_profit_intent_expires_when_condition_no_longer_holds(self):
+        self._hold(0.01, 2_000_000)
+        self.strategy.check_take_profit()
+        trade_id = self.strategy.notifier.send_trade_confirmation.call_args[0][-1]
+
+        self._set_price(1_500_000)                        # 確認前價格回落，停利不再成立
+        self.assertIsNone(self.strategy.check_take_profit())
+        self.assertIsNone(self.handler.get_intent("confirm_test"))
+
+        self.handler.confirm_trade(trade_id)              # 事後才按確認：不會賣出
+        self._set_price(2_000_000)
+        self.assertIsNone(self.strategy.check_take_profit())
+        self.assertAlmostEqual(self.strategy.get_coin_balance(), 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
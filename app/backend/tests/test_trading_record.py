@@ -1,19 +1,29 @@
 import unittest
 import os
 import json
+import tempfile
 from datetime import datetime
+from unittest import mock
+from ..utils.trade_store import TradeStore, get_trade_store
 from ..utils.trading_record import TradingRecord
 
+def _isolate_records(test):
+    """成交資料庫與 records 目錄改到暫存目錄，測試之間不共用狀態。"""
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    env = mock.patch.dict(os.environ, {
+        "ROOSTER_TRADE_DB": os.path.join(tmp.name, "trading.db"),
+        "ROOSTER_RECORDS_DIR": tmp.name,
+    })
+    env.start()
+    test.addCleanup(env.stop)
+
+
 class TestTradingRecord(unittest.TestCase):
     def setUp(self):
+        _isolate_records(self)
         self.strategy_name = "test_strategy"
         self.trading_record = TradingRecord(self.strategy_name)
-        self.test_file = f"trading_records_{self.strategy_name}.json"
-    
-    def tearDown(self):
-        # 清理測試文件
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
     
     def test_init_and_load(self):
         """測試初始化和加載功能"""
@@ -50,10 +60,13 @@ class TestTradingRecord(unittest.TestCase):
         self.assertEqual(record['volume'], 1.0)
         self.assertEqual(record['action'], 'buy')
         
-        # 驗證文件是否正確保存
-        with open(self.test_file, 'r') as f:
-            data = json.load(f)
-            self.assertEqual(len(data['trade_records']), 1)
+        # 驗證成交已寫入 SQLite 儲存
+        fills, cursor = self.trading_record.store.query_fills([self.strategy_name])
+        self.assertIsNone(cursor)
+        self.assertEqual([(r['price'], r['volume'], r['action']) for r in fills], [(100.0, 1.0, 'buy')])
+        summary = self.trading_record.summary()
+        self.assertEqual(summary['trade_count'], 1)
+        self.assertAlmostEqual(summary['balance'], 1.0)
     
     def test_get_current_balance(self):
         """測試餘額計算"""
@@ -127,5 +140,85 @@ class TestTradingRecord(unittest.TestCase):
         )
         self.assertEqual(self.trading_record.get_current_balance(), 0.0)
 
+
+class TestTradingRecordAggregates(unittest.TestCase):
+    NAME = "__aggregate_unittest__"
+
+    def setUp(self):
+        _isolate_records(self)
+        self.record = TradingRecord(self.NAME)
+
+    def test_running_totals_match_full_scan(self):
+        today = datetime.now().isoformat()
+        self.record.add_trade_record("2020-01-01T10:00:00", 100.0, 2.0, 'buy', fee=0.2)
+        self.record.add_trade_record(today, 120.0, 0.5, 'sell', fee=0.06)
+        self.record.add_trade_record(today, 90.0, 1.0, 'buy', fee=0.09)
+
+        for record in (self.record, TradingRecord(self.NAME)):   # 累加與載入時重建一致
+            self.assertAlmostEqual(record.get_current_balance(), 2.5)
+            self.assertAlmostEqual(record.get_net_investment(), 200.0 - 60.0 + 90.0)
+            self.assertAlmostEqual(record.get_total_fee(), 0.35)
+            self.assertEqual(record.get_first_buy_price(), 100.0)
+            self.assertEqual(record.get_today_trade_count(), 2)
+
+    def test_direct_list_mutation_triggers_rebuild(self):
+        self.record.add_trade_record(datetime.now().isoformat(), 100.0, 1.0, 'buy')
+        self.record.trade_records.clear()
+        self.assertEqual(self.record.get_current_balance(), 0.0)
+        self.assertEqual(self.record.get_today_trade_count(), 0)
+
+    def test_legacy_json_is_migrated_once(self):
+        legacy = os.path.join(self.record.records_dir, "trading_records_" + self.NAME + "_legacy.json")
+        name = self.NAME + "_legacy"
+        with open(legacy, 'w', encoding='utf-8') as f:
+            json.dump({'trade_records': [{
+                'strategy_name': name, 'trade_time': '2024-01-01T00:00:00', 'price': 100.0,
+                'volume': 1.0, 'action': 'buy', 'confirmed': False, 'amount': 100.0, 'fee': 0.1,
+            }]}, f)
+        self.assertEqual(len(TradingRecord(name).trade_records), 1)
+        self.assertFalse(os.path.exists(legacy))
+        self.assertTrue(os.path.exists(legacy + '.migrated'))
+        self.assertEqual(len(TradingRecord(name).trade_records), 1)   # 不重複匯入
+
+    def test_shared_store_cached_until_env_changes(self):
+        store = get_trade_store()
+        with mock.patch("os.path.exists", side_effect=AssertionError("不應 stat")):
+            self.assertIs(get_trade_store(), store)
+        _isolate_records(self)
+        self.assertIsNot(get_trade_store(), store)
+
+
+class TestTradeStoreHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = TradeStore(os.path.join(self.tmp.name, "trading.db"))
+        for day in range(1, 8):
+            for name in ("a", "b"):
+                self.store.append_fill({
+                    'strategy_name': name, 'trade_time': f"2024-01-0{day}T12:00:00",
+                    'price': 100.0 + day, 'volume': 1.0, 'action': 'buy',
+                })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cursor_pages_cover_merged_history_in_order(self):
+        seen, cursor = [], None
+        while True:
+            page, cursor = self.store.query_fills(["a", "b"], cursor=cursor, limit=4)
+            seen.extend(page)
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 14)
+        times = [r['trade_time'] for r in seen]
+        self.assertEqual(times, sorted(times, reverse=True))
+
+    def test_strategy_and_time_range_filters(self):
+        page, cursor = self.store.query_fills(["b"], start="2024-01-03", end="2024-01-05", limit=10)
+        self.assertIsNone(cursor)
+        self.assertEqual([r['trade_time'][:10] for r in page], ["2024-01-05", "2024-01-04", "2024-01-03"])
+        self.assertTrue(all(r['strategy_name'] == "b" for r in page))
+
+
 if __name__ == '__main__':
     unittest.main()
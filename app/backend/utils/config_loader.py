@@ -7,11 +7,17 @@
   `TELEGRAM_BOT_TOKEN`（大寫），Telegram 通知永遠初始化失敗。
 
 這裡用別名表把這些寫法都接受，回傳統一的小寫鍵。
+
+load_config() 每次呼叫都重新讀檔解析；執行中的程式請改用共用的 config_service：
+只解析一次並快取，設定檔 mtime 改變時才重讀，並提供全 process 共用的 TelegramNotifier。
 """
 import os
 import json
 import logging
+import threading
+from typing import Dict, Optional
 
+from .notification import TelegramNotifier
 from .paths import config_path
 
 logger = logging.getLogger("config_loader")
@@ -37,9 +43,9 @@ def _truthy(v):
     return str(v).lower() in ("1", "true", "yes", "on")
 
 
-def load_config():
+def load_config(path: Optional[str] = None):
     """回傳正規化後的設定 dict，並附帶 `demo_mode` 旗標。"""
-    path = config_path()
+    path = path or config_path()
     raw = {}
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -65,3 +71,66 @@ def load_config():
     no_keys = not (cfg["max_api_key"] and cfg["max_secret_key"])
     cfg["demo_mode"] = env_demo or cfg_demo or no_keys
     return cfg
+
+
+class ConfigService:
+    """快取解析後的設定；設定檔修改（mtime 改變）時自動重讀。"""
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._config: Optional[Dict] = None
+        self._mtime = None
+        self._notifier: Optional[TelegramNotifier] = None
+        self.reload_count = 0
+
+    @property
+    def path(self) -> str:
+        return self._path or config_path()
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self) -> Dict:
+        """回傳設定（副本，呼叫端修改不影響快取）。"""
+        mtime = self._current_mtime()
+        with self._lock:
+            if self._config is None or mtime != self._mtime:
+                self._reload(mtime)
+            return dict(self._config)
+
+    def reload(self) -> Dict:
+        """強制重讀（例如環境變數改變時）。"""
+        with self._lock:
+            self._reload(self._current_mtime())
+            return dict(self._config)
+
+    def _reload(self, mtime):
+        previous = self._config
+        self._config = load_config(self.path)
+        self._mtime = mtime
+        self.reload_count += 1
+        if previous is not None:
+            logger.info(f"設定檔已變更，重新載入: {self.path}")
+        # 共用的 notifier 就地更新金鑰，已注入的策略不必重建
+        if self._notifier is not None:
+            self._notifier.bot_token = self._config["telegram_bot_token"]
+            self._notifier.chat_id = self._config["telegram_chat_id"]
+
+    def notifier(self) -> Optional[TelegramNotifier]:
+        """全 process 共用的 TelegramNotifier；未設定 Telegram 金鑰時回傳 None。"""
+        cfg = self.get()
+        token, chat_id = cfg.get("telegram_bot_token"), cfg.get("telegram_chat_id")
+        if not (token and chat_id):
+            return None
+        with self._lock:
+            if self._notifier is None:
+                self._notifier = TelegramNotifier(token, chat_id)
+            return self._notifier
+
+
+# 全域共用實例
+config_service = ConfigService()
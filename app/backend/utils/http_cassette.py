@@ -0,0 +1,203 @@
+"""HTTP 錄製/重播（cassette），讓整個 app 能離線、可重現地跑基準測試。
+
+掛在 http_metrics.instrument 的 send 包裝之下，所以凡是經過統計 session 的請求
+（MAX ClientV3、BingX / 幣安 / 派網、TWSE、Yahoo、資金費率、Telegram）都涵蓋：
+
+    record：照常連線，把回應（狀態碼、Content-Type、內容、耗時）存進 cassette；
+    replay：完全不連網，依請求鍵找回錄好的回應，並模擬延遲。
+
+請求鍵 = 方法 + host + 路徑 + query + body，但去掉每次都會變的欄位
+（nonce、timestamp、signature、recvWindow、client_oid），同一個鍵錄到多筆時依序重播，
+播完後重複最後一筆。重播找不到對應請求時丟 CassetteMiss（ConnectionError 子類別），
+呼叫端會當成網路錯誤處理。
+
+環境變數（app 啟動時由 configure_from_env 讀取）：
+    ROOSTER_CASSETTE           cassette 檔路徑（.json.gz）；未設定則停用
+    ROOSTER_CASSETTE_MODE      record | replay（預設 replay）
+    ROOSTER_CASSETTE_LATENCY   replay 延遲：recorded（照錄製時耗時，預設）或固定毫秒數
+
+cassette 內含帳戶餘額、部位等回應內容，請當成機密檔案保管，勿提交進版本控制。
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger("http_cassette")
+
+VOLATILE_FIELDS = frozenset({"nonce", "timestamp", "signature", "recvWindow", "client_oid"})
+FORMAT_VERSION = 1
+
+
+class CassetteMiss(requests.ConnectionError):
+    """重播模式下找不到錄製的回應。"""
+
+
+def request_key(method, url, body=None):
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k not in VOLATILE_FIELDS)
+    key = f"{method.upper()} {parts.netloc}{parts.path}"
+    if query:
+        key += "?" + urlencode(query)
+    if body:
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", "replace")
+        try:
+            data = json.loads(body)
+        except ValueError:
+            key += " " + body
+        else:
+            if isinstance(data, dict):
+                data = {k: v for k, v in data.items() if k not in VOLATILE_FIELDS}
+            key += " " + json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return key
+
+
+class Cassette(object):
+    def __init__(self, path, mode="replay", latency="recorded"):
+        """
+        :param path: cassette 檔路徑；replay 模式下必須存在
+        :param mode: "record" 或 "replay"
+        :param latency: replay 延遲，"recorded" 照錄製時耗時，數字則為固定毫秒
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"未知的 cassette 模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._interactions = {}       # key -> [錄製的回應, ...]
+        self._cursor = {}             # key -> 下一筆重播的位置
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        if mode == "replay" or os.path.exists(path):
+            self.load()
+
+    # ---------- 檔案 ----------
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != FORMAT_VERSION:
+            raise ValueError(f"不支援的 cassette 版本: {payload.get('version')}")
+        with self._lock:
+            self._interactions = payload.get("interactions", {})
+            self._cursor = {}
+
+    def save(self):
+        with self._lock:
+            payload = {"version": FORMAT_VERSION, "interactions": self._interactions}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    # ---------- 傳輸 ----------
+    def send(self, real_send, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        if self.mode == "replay":
+            return self._replay(key, request)
+        start = time.perf_counter()
+        response = real_send(request, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        entry = {
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type"),
+            "body": response.content.decode("utf-8", "replace"),
+            "elapsed_ms": round(elapsed_ms, 1),
+        }
+        with self._lock:
+            self._interactions.setdefault(key, []).append(entry)
+            self.recorded += 1
+        return response
+
+    def _replay(self, key, request):
+        with self._lock:
+            entries = self._interactions.get(key)
+            if not entries:
+                self.misses += 1
+                entry = None
+            else:
+                i = self._cursor.get(key, 0)
+                entry = entries[min(i, len(entries) - 1)]
+                self._cursor[key] = i + 1
+                self.hits += 1
+        if entry is None:
+            raise CassetteMiss(f"cassette 沒有錄到此請求: {key.split(' ', 2)[:2]}", request=request)
+        delay_ms = entry.get("elapsed_ms", 0) if self.latency == "recorded" else float(self.latency)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        return self._build_response(entry, request)
+
+    @staticmethod
+    def _build_response(entry, request):
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict()
+        if entry.get("content_type"):
+            response.headers["Content-Type"] = entry["content_type"]
+        response._content = entry["body"].encode("utf-8")
+        response.headers["Content-Length"] = str(len(response._content))
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.reason = "Replayed"
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path, "mode": self.mode, "latency": self.latency,
+                "keys": len(self._interactions), "hits": self.hits,
+                "misses": self.misses, "recorded": self.recorded,
+            }
+
+
+_active = None
+
+
+def activate(cassette):
+    """讓所有統計 session 改走此 cassette；傳 None 恢復直接連線。"""
+    global _active
+    _active = cassette
+    return cassette
+
+
+def active():
+    return _active
+
+
+def replaying():
+    return _active is not None and _active.mode == "replay"
+
+
+def send(real_send, request, **kwargs):
+    """http_metrics 的 send 包裝呼叫此函式；沒有啟用 cassette 時直接送出。"""
+    cassette = _active
+    if cassette is None:
+        return real_send(request, **kwargs)
+    return cassette.send(real_send, request, **kwargs)
+
+
+def configure_from_env():
+    """依 ROOSTER_CASSETTE* 環境變數啟用 cassette；record 模式在程式結束時自動存檔。"""
+    path = os.getenv("ROOSTER_CASSETTE")
+    if not path:
+        return None
+    mode = os.getenv("ROOSTER_CASSETTE_MODE", "replay").lower()
+    latency = os.getenv("ROOSTER_CASSETTE_LATENCY", "recorded")
+    cassette = activate(Cassette(path, mode=mode, latency=latency))
+    if mode == "record":
+        atexit.register(cassette.save)
+    logger.warning(f"HTTP cassette 已啟用（{mode}）：{path}")
+    return cassette
@@ -0,0 +1,179 @@
+"""對外 HTTP 請求的延遲直方圖、錯誤數與傳輸量統計。
+
+策略一輪或頁面載入變慢時，原本無從得知是哪個交易所/資料源拖慢。
+這裡在 requests.Session.send 外面包一層計時，所有經過該 session 的請求
+（含 Session.get/post 與 urllib3 層的重試）都會依「來源 + 方法 + 路徑」記錄；
+啟用 http_cassette 時也由這裡轉送，重播的請求同樣計入統計：
+
+    session = http_metrics.session("binance")        # 新建並掛上統計
+    http_metrics.instrument(existing_session, "max")  # 既有 session 掛上統計
+    http_metrics.snapshot()                           # 給 /api/admin/http-metrics
+
+路徑中的數字段（訂單 id 等）會正規化為 {id}，避免端點數無限增長；
+query string 一律不記（可能含簽章），Telegram 路徑中的 bot token 會遮蔽。
+"""
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from . import http_cassette
+
+# 直方圖上界（毫秒）；最後一格收所有超過 10 秒的請求
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_BOT_TOKEN = re.compile(r"/bot[^/]+")        # Telegram 的 token 在路徑裡，不可外露
+
+_lock = threading.Lock()
+_endpoints = {}          # (venue, "GET host/path") -> _EndpointStats
+
+
+class _EndpointStats(object):
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.status = {}
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.last_error = None
+
+    def observe(self, elapsed_ms, status, bytes_in, bytes_out, error):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+        key = str(status) if status is not None else "exception"
+        self.status[key] = self.status.get(key, 0) + 1
+        if error is not None:
+            self.errors += 1
+            self.last_error = error
+
+    def quantile(self, q):
+        """由直方圖估計分位數（回傳該格上界；落在最後一格時回傳觀察到的最大值）。"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return self.max_ms if bound == float("inf") else min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "status": dict(self.status),
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max_ms, 1),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "histogram": {("+inf" if b == float("inf") else str(b)): n
+                          for b, n in zip(BUCKETS_MS, self.buckets)},
+            "last_error": self.last_error,
+        }
+
+
+def endpoint_name(method, url):
+    parts = urlsplit(url)
+    path = _ID_SEGMENT.sub("/{id}", _BOT_TOKEN.sub("/bot{token}", parts.path)) or "/"
+    return f"{method.upper()} {parts.netloc}{path}"
+
+
+def record(venue, method, url, elapsed_ms, status=None, bytes_in=0, bytes_out=0, error=None):
+    """記錄一次請求；status 為 None 代表連線層例外。狀態碼 >= 400 也算錯誤。"""
+    if error is None and status is not None and status >= 400:
+        error = f"HTTP {status}"
+    key = (venue, endpoint_name(method, url))
+    with _lock:
+        stats = _endpoints.get(key)
+        if stats is None:
+            stats = _endpoints[key] = _EndpointStats()
+        stats.observe(elapsed_ms, status, bytes_in, bytes_out, error)
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    return 0     # 串流/檔案上傳不計
+
+
+def _response_size(response):
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    if response._content_consumed:
+        return len(response.content or b"")
+    return 0
+
+
+def instrument(session, venue):
+    """讓 session 的每個請求都記入 venue 名下；重複呼叫不會重複計數。回傳同一個 session。"""
+    if getattr(session, "_rooster_metrics_venue", None) is not None:
+        session._rooster_metrics_venue = venue
+        return session
+    send = session.send
+    session._rooster_metrics_venue = venue
+
+    def timed_send(request, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = http_cassette.send(send, request, **kwargs)
+        except Exception as e:
+            elapsed = (time.perf_counter() - start) * 1000
+            record(session._rooster_metrics_venue, request.method, request.url, elapsed,
+                   bytes_out=_body_size(request.body), error=type(e).__name__)   # 例外訊息可能帶完整 URL（含簽章），只記型別
+            raise
+        elapsed = (time.perf_counter() - start) * 1000
+        record(session._rooster_metrics_venue, request.method, request.url, elapsed,
+               status=response.status_code, bytes_in=_response_size(response),
+               bytes_out=_body_size(request.body))
+        return response
+
+    session.send = timed_send
+    return session
+
+
+def session(venue):
+    """建立已掛上統計的 requests.Session（取代模組層級的 requests.get/post）。"""
+    return instrument(requests.Session(), venue)
+
+
+def snapshot():
+    """依來源分組的統計；每個來源附上合計，方便一眼看出哪個來源最慢。"""
+    with _lock:
+        items = [(venue, name, stats.to_dict()) for (venue, name), stats in _endpoints.items()]
+    venues = {}
+    for venue, name, data in sorted(items):
+        entry = venues.setdefault(venue, {"count": 0, "errors": 0, "total_ms": 0.0,
+                                          "bytes_in": 0, "endpoints": {}})
+        entry["endpoints"][name] = data
+        entry["count"] += data["count"]
+        entry["errors"] += data["errors"]
+        entry["total_ms"] += (data["avg_ms"] or 0) * data["count"]
+        entry["bytes_in"] += data["bytes_in"]
+    for entry in venues.values():
+        entry["total_ms"] = round(entry["total_ms"], 1)
+        entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 1) if entry["count"] else None
+    return venues
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
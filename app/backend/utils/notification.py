@@ -1,6 +1,9 @@
 import json
 import logging
-import requests
+
+from . import http_metrics
+
+_session = http_metrics.session("telegram")
 
 class TelegramNotifier:
     def __init__(self, bot_token: str, chat_id: str):
@@ -12,7 +15,7 @@ class TelegramNotifier:
         """發送純文字通知（風控示警、自動補保證金等共用）。"""
         url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
         try:
-            response = requests.post(url, json={
+            response = _session.post(url, json={
                 'chat_id': self.chat_id, 'text': text, 'parse_mode': 'HTML',
             }, timeout=15)
             response.raise_for_status()
@@ -50,7 +53,7 @@ class TelegramNotifier:
         }
         
         try:
-            response = requests.post(url, json=data)
+            response = _session.post(url, json=data)
             response.raise_for_status()
             return response.json()['result']['message_id']  # 返回消息ID以便後續更新
         except Exception as e:
@@ -68,7 +71,7 @@ class TelegramNotifier:
             'parse_mode': 'HTML'
         }
         try:
-            response = requests.post(url, json=data)
+            response = _session.post(url, json=data)
             response.raise_for_status()
         except Exception as e:
             self.logger.error(f"發送交易結果通知失敗: {e}")
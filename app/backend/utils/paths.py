@@ -43,6 +43,7 @@ def strategies_dir():
 
 
 def records_dir():
-    d = os.path.join(APP_DIR, "records")
+    """成交記錄與快取目錄。ROOSTER_RECORDS_DIR 可改到別處（例如離線基準測試的暫存目錄）。"""
+    d = os.getenv("ROOSTER_RECORDS_DIR") or os.path.join(APP_DIR, "records")
     os.makedirs(d, exist_ok=True)
     return d
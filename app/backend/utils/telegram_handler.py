@@ -1,68 +1,130 @@
-import json
+"""Telegram 交易確認：以持久化的「待確認意圖」取代阻塞等待。
+
+原本 execute_trade 會每秒輪詢、最多卡 5 分鐘等使用者按鈕，期間握著策略鎖，其他策略全部停擺。
+現在的流程是狀態機：
+
+    pending ──確認──> confirmed ──策略下一輪執行後刪除
+        │    └─取消──> cancelled ──策略下一輪通知後刪除
+        └──逾時──> expired   ──策略下一輪通知後刪除
+
+意圖存在 TradeStore（SQLite），所以 Telegram 回覆由哪個 worker 收到、或中途重啟都不會遺失；
+使用者按下按鈕時會觸發 add_listener 註冊的回呼（例如喚醒策略排程立刻跑一輪），不必等下個週期。
+"""
 import logging
 import threading
 import time
-from typing import Dict, Optional
-from queue import Queue
+from typing import Callable, Dict, List, Optional
+
+from .trade_store import get_trade_store
+
+PENDING = "pending"
+CONFIRMED = "confirmed"
+CANCELLED = "cancelled"
+EXPIRED = "expired"
+
 
 class TelegramCallbackHandler:
-    def __init__(self):
-        self.pending_trades: Dict[str, Dict] = {}  # 存儲待確認的交易
-        self.confirmations: Dict[str, bool] = {}   # 存儲確認結果
+    def __init__(self, store=None, timeout: float = 300):
+        self._store = store
+        self.timeout = timeout                      # 確認期限（秒）
         self.logger = logging.getLogger("telegram_handler")
         self._lock = threading.Lock()
-        
-    def add_pending_trade(self, strategy_name: str, trade_info: Dict) -> str:
-        """添加待確認的交易"""
+        self._events: Dict[str, threading.Event] = {}   # trade_id -> 有答覆時 set
+        self._listeners: List[Callable[[str], None]] = []
+
+    @property
+    def store(self):
+        return self._store or get_trade_store()
+
+    def add_listener(self, callback: Callable[[str], None]) -> None:
+        """註冊答覆回呼（參數為 trade_id）；在收到答覆的執行緒上呼叫，請勿在回呼中做耗時工作。"""
+        self._listeners.append(callback)
+
+    def add_pending_trade(self, strategy_name: str, trade_info: Dict, timeout: Optional[float] = None) -> str:
+        """新增待確認的交易意圖，回傳 trade_id（放進 Telegram 按鈕的 callback_data）"""
+        trade_id = f"{strategy_name}_{int(time.time())}"
+        expires_at = time.time() + (self.timeout if timeout is None else timeout)
+        self.store.add_confirmation(trade_id, strategy_name, trade_info, expires_at)
         with self._lock:
-            trade_id = f"{strategy_name}_{int(time.time())}"
-            self.pending_trades[trade_id] = trade_info
-            self.confirmations[trade_id] = None
-            return trade_id
-            
+            self._events[trade_id] = threading.Event()
+        return trade_id
+
     def confirm_trade(self, trade_id: str) -> None:
         """確認交易"""
-        with self._lock:
-            if trade_id in self.confirmations:
-                self.confirmations[trade_id] = True
-                self.logger.info(f"交易已確認: {trade_id}")
-            
+        if self.store.set_confirmation_status(trade_id, CONFIRMED):
+            self.logger.info(f"交易已確認: {trade_id}")
+            self._answered(trade_id)
+        else:
+            self.logger.warning(f"交易已逾時或已處理，忽略確認: {trade_id}")
+
     def cancel_trade(self, trade_id: str) -> None:
         """取消交易"""
+        if self.store.set_confirmation_status(trade_id, CANCELLED):
+            self.logger.info(f"交易已取消: {trade_id}")
+            self._answered(trade_id)
+
+    def _answered(self, trade_id: str) -> None:
+        with self._lock:
+            event = self._events.get(trade_id)
+        if event is not None:
+            event.set()
+        for callback in list(self._listeners):
+            try:
+                callback(trade_id)
+            except Exception as e:
+                self.logger.error(f"交易確認回呼失敗: {e}")
+
+    def get_intent(self, strategy_name: str) -> Optional[Dict]:
+        """策略最新一筆未處理的意圖（含 trade_id、status、info）；過了期限的 pending 改為 expired。"""
+        intents = self.store.load_confirmations(strategy_name)
+        if not intents:
+            return None
+        intent = intents[-1]
+        if intent["status"] != PENDING and time.time() >= intent["expires_at"] + self.timeout:
+            # 有答覆但策略之後一直沒再觸發這筆交易：過時的確認不再採用
+            self.resolve(intent["trade_id"])
+            return None
+        if intent["status"] == PENDING and time.time() >= intent["expires_at"]:
+            if self.store.set_confirmation_status(intent["trade_id"], EXPIRED):
+                self.logger.warning(f"交易確認超時: {intent['trade_id']}")
+                return dict(intent, status=EXPIRED)
+            # 剛好在期限邊緣收到答覆：以資料庫中的最新狀態為準
+            return self.get_intent(strategy_name)
+        return intent
+
+    def resolve(self, trade_id: str) -> None:
+        """策略處理完意圖（已執行或已通知取消/逾時）後刪除。"""
+        self.store.delete_confirmation(trade_id)
         with self._lock:
-            if trade_id in self.confirmations:
-                self.confirmations[trade_id] = False
-                self.logger.info(f"交易已取消: {trade_id}")
-                
+            self._events.pop(trade_id, None)
+
     def wait_for_confirmation(self, trade_id: str, timeout: int = 300) -> Optional[bool]:
-        """等待交易確認
-        
+        """阻塞等待交易確認（保留給需要同步結果的呼叫端；策略流程不再使用）
+
         Args:
             trade_id: 交易ID
             timeout: 超時時間（秒）
-            
+
         Returns:
             bool: True表示確認，False表示取消，None表示超時
         """
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            with self._lock:
-                if trade_id in self.confirmations:
-                    result = self.confirmations[trade_id]
-                    if result is not None:
-                        # 清理已處理的交易
-                        del self.pending_trades[trade_id]
-                        del self.confirmations[trade_id]
-                        return result
-            time.sleep(1)  # 避免過度佔用CPU
-            
-        # 超時處理
         with self._lock:
-            if trade_id in self.pending_trades:
-                del self.pending_trades[trade_id]
-            if trade_id in self.confirmations:
-                del self.confirmations[trade_id]
-        
+            event = self._events.setdefault(trade_id, threading.Event())
+        deadline = time.time() + timeout
+        while True:
+            status = next((i["status"] for i in self.store.load_confirmations()
+                           if i["trade_id"] == trade_id), None)
+            if status in (CONFIRMED, CANCELLED):
+                self.resolve(trade_id)
+                return status == CONFIRMED
+            remaining = deadline - time.time()
+            if status is None or remaining <= 0:
+                break
+            # 同 process 的答覆會立刻喚醒；其他 worker 收到的答覆最慢 5 秒內讀到
+            event.wait(min(remaining, 5))
+
+        self.store.set_confirmation_status(trade_id, EXPIRED)
+        self.resolve(trade_id)
         self.logger.warning(f"交易確認超時: {trade_id}")
         return None
 
@@ -0,0 +1,421 @@
+"""成交記錄與 maker 掛單狀態的 SQLite（WAL）儲存。
+
+原本每筆成交都把整份 trading_records_<策略>.json 以 indent=4 重寫一次，
+maker 狀態 maker_orders_<策略>.json 也每輪重寫；成交與掛單狀態分兩個檔寫，
+中途當機就可能對不上（成交記了、掛單的 recorded 沒更新 → 重啟後重複記帳）。
+
+這裡改成單一 SQLite 檔（WAL 模式，讀寫互不阻塞）：
+- 成交只做 append（INSERT 一列），寫入量與歷史長度無關；
+- maker 狀態以策略名稱 upsert；
+- transaction() 讓「記一筆成交 + 更新掛單狀態」在同一個交易內提交；
+  同一執行緒內巢狀呼叫會共用外層交易。
+
+需要 Telegram 確認的交易以「待確認意圖」存在 trade_confirmations，策略不必卡住等回覆，
+之後的週期（或其他 worker）讀到使用者的答覆再繼續。
+
+strategy_index 是各策略的精簡摘要（啟用狀態、幣種、累計值），讓啟動時不必載入每個策略的
+完整成交；摘要記下當時最後一筆成交的 id，對不上就視為過期、改讀完整記錄。
+
+第一次讀取某策略時，會把舊的 JSON 檔匯入資料庫一次，原檔改名為 *.json.migrated 保留。
+"""
+import base64
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from .paths import records_dir
+
+FILL_FIELDS = ("strategy_name", "trade_time", "price", "volume", "action",
+               "confirmed", "amount", "fee")
+
+
+class TradeStore:
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self._local = threading.local()       # 目前執行緒進行中的交易連線
+        self._migrate_lock = threading.Lock()
+        self._migrated = set()                 # 已確認匯入過的策略（省去每次查表）
+        os.makedirs(os.path.dirname(database_path), exist_ok=True)
+        self._initialize()
+
+    def _connect(self):
+        # isolation_level=None：交易由 transaction() 明確 BEGIN/COMMIT
+        connection = sqlite3.connect(self.database_path, timeout=15, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA synchronous=NORMAL")   # WAL 下仍可保證交易不損毀
+        return connection
+
+    def _initialize(self):
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS trade_fills (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    strategy_name TEXT NOT NULL,
+                    trade_time TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    volume REAL NOT NULL,
+                    action TEXT NOT NULL,
+                    confirmed INTEGER NOT NULL DEFAULT 0,
+                    amount REAL NOT NULL DEFAULT 0,
+                    fee REAL NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_trade_fills_strategy
+                    ON trade_fills(strategy_name, id);
+                CREATE INDEX IF NOT EXISTS idx_trade_fills_time
+                    ON trade_fills(trade_time, id);
+                CREATE TABLE IF NOT EXISTS maker_state (
+                    strategy_name TEXT PRIMARY KEY,
+                    tracked TEXT NOT NULL,
+                    phase TEXT,
+                    open_price REAL NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS trade_confirmations (
+                    trade_id TEXT PRIMARY KEY,
+                    strategy_name TEXT NOT NULL,
+                    info TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    decided_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_trade_confirmations_strategy
+                    ON trade_confirmations(strategy_name, created_at);
+                CREATE TABLE IF NOT EXISTS strategy_index (
+                    strategy_name TEXT PRIMARY KEY,
+                    is_active INTEGER NOT NULL DEFAULT 0,
+                    coin_type TEXT,
+                    summary TEXT NOT NULL,
+                    last_fill_id INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS json_migrations (
+                    strategy_name TEXT PRIMARY KEY,
+                    migrated_at TEXT NOT NULL
+                );
+            """)
+        finally:
+            connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """寫入交易；同一執行緒內巢狀呼叫共用最外層的交易，最外層結束才提交。"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            yield connection
+            return
+        connection = self._connect()
+        self._local.connection = connection
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            self._local.connection = None
+            connection.close()
+
+    @contextmanager
+    def _reader(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            yield connection          # 交易中讀得到自己尚未提交的寫入
+            return
+        connection = self._connect()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    # ---------- 成交 ----------
+    def load_fills(self, strategy_name):
+        """依寫入順序回傳策略的所有成交（欄位同舊 JSON 記錄）。"""
+        self.migrate_json(strategy_name)
+        with self._reader() as connection:
+            rows = connection.execute(
+                "SELECT * FROM trade_fills WHERE strategy_name = ? ORDER BY id",
+                (strategy_name,),
+            ).fetchall()
+        return [self._fill_dict(row) for row in rows]
+
+    @staticmethod
+    def _fill_dict(row):
+        record = {field: row[field] for field in FILL_FIELDS}
+        record["confirmed"] = bool(record["confirmed"])
+        return record
+
+    def append_fill(self, record):
+        """新增一筆成交（record 需含 FILL_FIELDS）；回傳資料列 id。"""
+        with self.transaction() as connection:
+            return self._insert_fill(connection, record)
+
+    @staticmethod
+    def _insert_fill(connection, record):
+        cursor = connection.execute(
+            "INSERT INTO trade_fills (strategy_name, trade_time, price, volume, action, "
+            "confirmed, amount, fee) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (record["strategy_name"], record["trade_time"], record["price"], record["volume"],
+             record["action"], int(bool(record.get("confirmed"))),
+             record.get("amount", record["price"] * record["volume"]), record.get("fee") or 0.0),
+        )
+        return cursor.lastrowid
+
+    def query_fills(self, strategy_names, start=None, end=None, cursor=None, limit=None):
+        """跨策略的成交歷史，依時間由新到舊；回傳 (records, next_cursor)。
+
+        以 (trade_time, id) 做 keyset 分頁：cursor 是上一頁最後一筆的位置，
+        每頁成本只和頁大小有關，不隨歷史總筆數增加。
+        :param strategy_names: 要查的策略名稱
+        :param start / end: ISO 時間字串（含端點；只給日期時 end 視為當天結束）
+        :param limit: 每頁筆數；None 表示全部
+        """
+        names = list(strategy_names)
+        if not names:
+            return [], None
+        clauses = [f"strategy_name IN ({','.join('?' * len(names))})"]
+        params = list(names)
+        if start:
+            clauses.append("trade_time >= ?")
+            params.append(start)
+        if end:
+            clauses.append("trade_time <= ?")
+            params.append(end + "T23:59:59.999999" if len(end) == 10 else end)
+        if cursor:
+            trade_time, row_id = decode_cursor(cursor)
+            clauses.append("(trade_time < ? OR (trade_time = ? AND id < ?))")
+            params.extend([trade_time, trade_time, row_id])
+        sql = (f"SELECT * FROM trade_fills WHERE {' AND '.join(clauses)} "
+               "ORDER BY trade_time DESC, id DESC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit) + 1)       # 多取一筆判斷是否還有下一頁
+        for name in names:
+            self.migrate_json(name)
+        with self._reader() as connection:
+            rows = connection.execute(sql, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["trade_time"], rows[-1]["id"])
+        return [self._fill_dict(row) for row in rows], next_cursor
+
+    # ---------- maker 狀態 ----------
+    def load_maker_state(self, strategy_name):
+        """回傳 (tracked, phase, open_price)；沒有記錄時回傳 None。"""
+        self.migrate_json(strategy_name)
+        with self._reader() as connection:
+            row = connection.execute(
+                "SELECT tracked, phase, open_price FROM maker_state WHERE strategy_name = ?",
+                (strategy_name,),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row["tracked"]), row["phase"], float(row["open_price"] or 0)
+
+    def save_maker_state(self, strategy_name, tracked, phase, open_price):
+        with self.transaction() as connection:
+            self._upsert_maker_state(connection, strategy_name, tracked, phase, open_price)
+
+    @staticmethod
+    def _upsert_maker_state(connection, strategy_name, tracked, phase, open_price):
+        connection.execute(
+            "INSERT INTO maker_state (strategy_name, tracked, phase, open_price, updated_at) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(strategy_name) DO UPDATE SET "
+            "tracked = excluded.tracked, phase = excluded.phase, "
+            "open_price = excluded.open_price, updated_at = excluded.updated_at",
+            (strategy_name, json.dumps(tracked, ensure_ascii=False), phase,
+             float(open_price or 0), datetime.datetime.now().isoformat()),
+        )
+
+    # ---------- 待確認交易 ----------
+    def add_confirmation(self, trade_id, strategy_name, info, expires_at):
+        now = datetime.datetime.now().timestamp()
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO trade_confirmations "
+                "(trade_id, strategy_name, info, status, created_at, expires_at) "
+                "VALUES (?, ?, ?, 'pending', ?, ?)",
+                (trade_id, strategy_name, json.dumps(info, ensure_ascii=False), now, float(expires_at)),
+            )
+
+    def load_confirmations(self, strategy_name=None):
+        """依建立順序回傳待確認意圖（可限定策略）；info 已解析成 dict。"""
+        sql = "SELECT * FROM trade_confirmations"
+        params = ()
+        if strategy_name is not None:
+            sql += " WHERE strategy_name = ?"
+            params = (strategy_name,)
+        with self._reader() as connection:
+            rows = connection.execute(sql + " ORDER BY created_at", params).fetchall()
+        return [dict(row, info=json.loads(row["info"])) for row in rows]
+
+    def set_confirmation_status(self, trade_id, status, expected=("pending",)):
+        """只在目前狀態屬於 expected 時更新（避免逾時後才按的確認被接受）；回傳是否有更新。"""
+        marks = ",".join("?" * len(expected))
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                f"UPDATE trade_confirmations SET status = ?, decided_at = ? "
+                f"WHERE trade_id = ? AND status IN ({marks})",
+                (status, datetime.datetime.now().timestamp(), trade_id, *expected),
+            )
+            return cursor.rowcount > 0
+
+    def delete_confirmation(self, trade_id):
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM trade_confirmations WHERE trade_id = ?", (trade_id,))
+
+    # ---------- 策略索引 ----------
+    def load_strategy_index(self):
+        """回傳 {策略名稱: {is_active, coin_type, summary, last_fill_id}}。"""
+        with self._reader() as connection:
+            rows = connection.execute("SELECT * FROM strategy_index").fetchall()
+        return {
+            row["strategy_name"]: {
+                "is_active": bool(row["is_active"]),
+                "coin_type": row["coin_type"],
+                "summary": json.loads(row["summary"]),
+                "last_fill_id": row["last_fill_id"],
+            }
+            for row in rows
+        }
+
+    def save_strategy_index(self, strategy_name, is_active, coin_type, summary):
+        """寫入策略摘要；last_fill_id 取寫入當下該策略最後一筆成交的 id。"""
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO strategy_index "
+                "(strategy_name, is_active, coin_type, summary, last_fill_id, updated_at) "
+                "VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(id), 0) FROM trade_fills WHERE strategy_name = ?), ?) "
+                "ON CONFLICT(strategy_name) DO UPDATE SET is_active = excluded.is_active, "
+                "coin_type = excluded.coin_type, summary = excluded.summary, "
+                "last_fill_id = excluded.last_fill_id, updated_at = excluded.updated_at",
+                (strategy_name, int(bool(is_active)), coin_type,
+                 json.dumps(summary, ensure_ascii=False), strategy_name,
+                 datetime.datetime.now().isoformat()),
+            )
+
+    def last_fill_ids(self):
+        """各策略最後一筆成交的 id（用來判斷索引摘要是否過期）。"""
+        with self._reader() as connection:
+            rows = connection.execute(
+                "SELECT strategy_name, MAX(id) AS last_id FROM trade_fills GROUP BY strategy_name"
+            ).fetchall()
+        return {row["strategy_name"]: row["last_id"] for row in rows}
+
+    # ---------- 舊 JSON 匯入 / 刪除 ----------
+    def _json_paths(self, strategy_name):
+        base = records_dir()
+        return (os.path.join(base, f"trading_records_{strategy_name}.json"),
+                os.path.join(base, f"maker_orders_{strategy_name}.json"))
+
+    def migrate_json(self, strategy_name):
+        """把策略的舊 JSON 檔匯入資料庫（每個策略只做一次）。"""
+        if strategy_name in self._migrated:
+            return False
+        with self._migrate_lock:
+            with self._reader() as connection:
+                done = connection.execute(
+                    "SELECT 1 FROM json_migrations WHERE strategy_name = ?", (strategy_name,)
+                ).fetchone()
+            if done:
+                self._migrated.add(strategy_name)
+                return False
+            records_file, state_file = self._json_paths(strategy_name)
+            fills = self._read_json(records_file, {}).get("trade_records", [])
+            state = self._read_json(state_file, None)
+            with self.transaction() as connection:
+                for record in fills:
+                    self._insert_fill(connection, dict(record, strategy_name=strategy_name))
+                if isinstance(state, dict):
+                    if "tracked" in state:
+                        tracked, phase = state.get("tracked", {}), state.get("phase")
+                        open_price = state.get("open_price", 0)
+                    else:                 # 更舊的格式：整個 dict 即 tracked
+                        tracked, phase, open_price = state, None, 0
+                    self._upsert_maker_state(connection, strategy_name, tracked, phase, open_price)
+                connection.execute(
+                    "INSERT INTO json_migrations (strategy_name, migrated_at) VALUES (?, ?)",
+                    (strategy_name, datetime.datetime.now().isoformat()),
+                )
+            for path in (records_file, state_file):
+                if os.path.exists(path):
+                    os.replace(path, path + ".migrated")
+            self._migrated.add(strategy_name)
+            return True
+
+    @staticmethod
+    def _read_json(path, default):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return default
+
+    def export_fills(self, strategy_name, path):
+        """把策略成交匯出成舊格式 JSON（刪除策略前的備份用）；沒有成交回傳 False。"""
+        fills = self.load_fills(strategy_name)
+        if not fills:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"strategy_name": strategy_name, "trade_records": fills},
+                      f, ensure_ascii=False, indent=4)
+        return True
+
+    def delete_strategy(self, strategy_name):
+        """刪除策略的成交、maker 狀態、待確認交易與索引（含匯入標記，之後同名策略重新開始）。"""
+        with self.transaction() as connection:
+            for table in ("trade_fills", "maker_state", "trade_confirmations", "strategy_index",
+                          "json_migrations"):
+                connection.execute(f"DELETE FROM {table} WHERE strategy_name = ?", (strategy_name,))
+        self._migrated.discard(strategy_name)
+
+
+def encode_cursor(trade_time, row_id):
+    raw = json.dumps([trade_time, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """解析分頁 cursor；格式錯誤時丟 ValueError。"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        trade_time, row_id = json.loads(raw)
+        return str(trade_time), int(row_id)
+    except Exception:
+        raise ValueError("無效的分頁 cursor")
+
+
+_shared = None                  # (環境變數, TradeStore)
+_shared_lock = threading.Lock()
+
+
+def default_database_path():
+    return os.getenv("ROOSTER_TRADE_DB") or os.path.join(records_dir(), "trading.db")
+
+
+def get_trade_store():
+    """回傳 process 內共用的 TradeStore。
+
+    以環境變數（ROOSTER_TRADE_DB / ROOSTER_RECORDS_DIR）快取：變數沒變就直接回傳，
+    不必每次解析路徑或 stat 檔案；測試切換暫存目錄時才重建。
+    """
+    global _shared
+    env = (os.getenv("ROOSTER_TRADE_DB"), os.getenv("ROOSTER_RECORDS_DIR"))
+    cached = _shared
+    if cached is not None and cached[0] == env:
+        return cached[1]
+    with _shared_lock:
+        if _shared is None or _shared[0] != env:
+            path = default_database_path()
+            store = _shared[1] if _shared is not None and _shared[1].database_path == path else None
+            _shared = (env, store or TradeStore(path))
+        return _shared[1]
@@ -1,27 +1,63 @@
-import os
-import json
 import datetime
 from typing import Tuple
 
 from .paths import records_dir
+from .trade_store import get_trade_store
 
 class TradingRecord:
-    def __init__(self, strategy_name):
+    def __init__(self, strategy_name, store=None):
         self.strategy_name = strategy_name
+        # 成交存在共用的 SQLite 儲存（舊 JSON 檔在第一次載入時自動匯入）
+        self.store = store or get_trade_store()
         self.creation_time = datetime.datetime.now().isoformat()
         self.trade_records = []
+        self._reset_aggregates()
         self.records_dir = records_dir()
-        self.filename = os.path.join(self.records_dir, f"trading_records_{strategy_name}.json")
         self.load_records()  # 初始化時載入已有記錄
     
     def load_records(self):
         """載入策略的交易記錄"""
+        self.trade_records = self.store.load_fills(self.strategy_name)
+        self._rebuild_aggregates()
+
+    # ---------- 累計值（載入時重建一次，之後每筆成交 O(1) 更新）----------
+    def _reset_aggregates(self):
+        self._balance = 0.0
+        self._net_investment = 0.0
+        self._total_amount = 0.0
+        self._total_fee = 0.0
+        self._first_buy_price = None
+        self._daily_counts = {}       # date -> 當日交易筆數
+        self._aggregated = 0          # 已計入累計值的記錄筆數
+
+    def _rebuild_aggregates(self):
+        self._reset_aggregates()
+        for record in self.trade_records:
+            self._accumulate(record)
+
+    def _accumulate(self, record):
+        amount = record['price'] * record['volume']
+        if record['action'] == 'buy':
+            self._balance += record['volume']
+            self._net_investment += amount
+            if self._first_buy_price is None:
+                self._first_buy_price = record['price']
+        elif record['action'] == 'sell':
+            self._balance -= record['volume']
+            self._net_investment -= amount
+        self._total_amount += amount
+        self._total_fee += record.get('fee') or 0.0
         try:
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.trade_records = data.get('trade_records', [])
-        except FileNotFoundError:
-            self.trade_records = []
+            day = datetime.datetime.fromisoformat(str(record['trade_time'])).date()
+        except ValueError:
+            day = None                # 格式異常的舊記錄不計入每日筆數
+        self._daily_counts[day] = self._daily_counts.get(day, 0) + 1
+        self._aggregated += 1
+
+    def _sync_aggregates(self):
+        """trade_records 被外部直接增刪時（筆數對不上）重建一次，確保累計值不會過期。"""
+        if self._aggregated != len(self.trade_records):
+            self._rebuild_aggregates()
     
     def refresh(self):
         """重新從文件載入記錄"""
@@ -39,29 +75,51 @@ class TradingRecord:
             'amount': price * volume,  # 交易金額
             'fee': fee  # 手續費
         }
+        self._sync_aggregates()
+        # 只 append 一列（在呼叫端的 store.transaction() 內則隨外層一起提交）
+        self.store.append_fill(record)
         self.trade_records.append(record)
-        self.save_to_json()  # 每次交易後立即保存
+        self._accumulate(record)
     
     def get_current_balance(self):
         """計算當前持有餘額"""
-        balance = 0.0
-        for record in self.trade_records:
-            if record['action'] == 'buy':
-                balance += record['volume']
-            elif record['action'] == 'sell':
-                balance -= record['volume']
-        return balance
+        self._sync_aggregates()
+        return self._balance
 
     def get_net_investment(self):
         """計算淨投資金額（買入金額總和減去賣出金額總和）"""
-        net_investment = 0.0
-        for record in self.trade_records:
-            amount = record['price'] * record['volume']
-            if record['action'] == 'buy':
-                net_investment += amount
-            elif record['action'] == 'sell':
-                net_investment -= amount
-        return net_investment
+        self._sync_aggregates()
+        return self._net_investment
+
+    def get_total_amount(self):
+        """所有交易的成交金額總和（買賣皆計）"""
+        self._sync_aggregates()
+        return self._total_amount
+
+    def get_total_fee(self):
+        """累計手續費"""
+        self._sync_aggregates()
+        return self._total_fee
+
+    def get_first_buy_price(self):
+        """第一筆買入的價格；沒有買入記錄時回傳 None"""
+        self._sync_aggregates()
+        return self._first_buy_price
+
+    def summary(self):
+        """累計值摘要（寫入策略索引，讓未載入的策略也能顯示狀態）"""
+        self._sync_aggregates()
+        today = datetime.datetime.now().date()
+        return {
+            'balance': self._balance,
+            'net_investment': self._net_investment,
+            'total_amount': self._total_amount,
+            'total_fee': self._total_fee,
+            'first_buy_price': self._first_buy_price,
+            'trade_count': len(self.trade_records),
+            'today': today.isoformat(),
+            'today_count': self._daily_counts.get(today, 0),
+        }
 
     def get_current_market_value(self, current_price):
         """計算當前市值"""
@@ -70,13 +128,8 @@ class TradingRecord:
 
     def get_today_trade_count(self):
         """獲取今日交易次數"""
-        today = datetime.datetime.now().date()
-        count = 0
-        for record in self.trade_records:
-            trade_date = datetime.datetime.fromisoformat(record['trade_time']).date()
-            if trade_date == today:
-                count += 1
-        return count
+        self._sync_aggregates()
+        return self._daily_counts.get(datetime.datetime.now().date(), 0)
 
     def check_trade_conditions(self, amount: float, daily_limit: int, amount_threshold: float) -> Tuple[bool, str]:
         """檢查交易條件
@@ -99,41 +152,3 @@ class TradingRecord:
             return True, f"交易金額 ({amount:.2f}) 超過閾值 ({amount_threshold:.2f})"
             
         return False, ""
-
-    def save_to_json(self):
-        """保存交易記錄到特定策略的JSON文件"""
-        try:
-            # 確保目錄存在
-            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
-            
-            # 準備要保存的數據
-            data_to_save = {
-                'strategy_name': self.strategy_name,
-                'creation_time': self.creation_time,
-                'trade_records': self.trade_records
-            }
-            
-            # 先寫入臨時文件，然後原子性地移動到目標文件
-            temp_filename = self.filename + '.tmp'
-            with open(temp_filename, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=4)
-            
-            # 原子性地移動文件
-            if os.path.exists(temp_filename):
-                if os.path.exists(self.filename):
-                    os.remove(self.filename)
-                os.rename(temp_filename, self.filename)
-            
-            # 記錄成功保存的日誌
-            import logging
-            logger = logging.getLogger(f"trading_record.{self.strategy_name}")
-            logger.info(f"成功保存交易記錄到: {self.filename}, 共 {len(self.trade_records)} 筆記錄")
-            
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(f"trading_record.{self.strategy_name}")
-            logger.error(f"保存交易記錄失敗: {e}")
-            logger.error(f"目標文件: {self.filename}")
-            logger.error(f"記錄數量: {len(self.trade_records)}")
-            # 重新拋出異常，讓調用者知道保存失敗
-            raise
@@ -12,18 +12,24 @@ load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from max.client_v3 import ClientV3
+from max.market_stream import MarketDataStream
+from max.user_stream import UserDataStream
 from max.mock_client import MockClientV3
+from max.transport import configure_shared_transport
 from backend.models.strategy_config import TradingStrategyConfig
 from backend.strategies.strategy_manager import StrategyManager
 from backend.utils.trading_record import TradingRecord
-from backend.utils.config_loader import load_config
+from backend.utils.config_loader import config_service
 from backend.utils.paths import APP_DIR
+from backend.utils import http_cassette, http_metrics
 from backend.services import twse_data, tw_backtest, twse_stocks, tw_backtest_db, us_quote
 from backend.services.risk_watcher import RiskWatcher
+from backend.services.strategy_scheduler import StrategyScheduler
+from backend.services.strategy_runner import RemoteStrategyManager, RunnerChannel
 from backend.services.funding_rates import (
     FundingRateStore, FundingCollector, RWA_GROUPS
 )
-from backend.utils.notification import TelegramNotifier
+from backend.utils.telegram_handler import callback_handler
 from backend.arb_monitor import risk_engine
 from backend.hedge_monitor.providers import (
     BinanceReadOnlyClient, BingXReadOnlyClient, MaxPublicClient,
@@ -32,6 +38,9 @@ from backend.hedge_monitor.providers import (
 from backend.hedge_monitor.repository import HedgeRepository
 from backend.hedge_monitor.service import HedgeMonitorService
 
+# 離線基準測試：ROOSTER_CASSETTE 指定時錄製/重播所有對外 HTTP（須在建立任何 client 之前）
+http_cassette.configure_from_env()
+
 app = Flask(__name__)
 log_dir = os.path.join(APP_DIR, 'log')
 
@@ -49,9 +58,21 @@ logging.basicConfig(
 )
 
 # 載入設定（金鑰命名已正規化，並判斷是否進入 demo 模式）
-config = load_config()
+config = config_service.get()
 DEMO_MODE = config.get('demo_mode', False)
 
+# 策略在哪個 process 執行：
+#   inline   — 本 process（預設）；策略、串流與背景巡檢都在 web process 內，gunicorn 只能開 1 個 worker
+#   external — 交給獨立的策略執行程序（app/runner.py），web worker 只處理 HTTP，可開多個
+#   runner   — 由 runner.py 設定：建立策略與背景服務，但不對外提供 HTTP
+RUNNER_MODE = os.getenv('ROOSTER_RUNNER', 'inline').lower()
+WEB_ONLY = RUNNER_MODE == 'external'
+runner_channel = None
+if RUNNER_MODE in ('external', 'runner'):
+    runner_channel = RunnerChannel(
+        os.getenv('ROOSTER_RUNNER_DB', os.path.join(APP_DIR, 'data', 'strategy_runner.db'))
+    )
+
 hedge_repository = HedgeRepository(
     os.getenv('HEDGE_DATABASE_PATH', os.path.join(APP_DIR, 'data', 'hedge_monitor.db'))
 )
@@ -89,8 +110,25 @@ if DEMO_MODE:
     app.logger.warning("以 DEMO 模式啟動：使用模擬行情與帳戶資料，不會送出真實交易")
     client = MockClientV3()
 else:
+    # 所有策略共用同一個 keep-alive 連線池；策略很多時可用環境變數調大
+    transport = configure_shared_transport(
+        pool_maxsize=int(os.getenv('MAX_HTTP_POOL_SIZE', '32')),
+        timeout=float(os.getenv('MAX_HTTP_TIMEOUT', '30')),
+    )
+    http_metrics.instrument(transport.session, 'max')
     client = ClientV3(config['max_api_key'], config['max_secret_key'])
 
+# MAX WebSocket 串流：行情（現價與委託簿改讀記憶體）與私有訂單事件（成交即時處理），
+# 斷線時自動退回 REST 輪詢
+market_stream = None
+user_stream = None
+if not WEB_ONLY and not DEMO_MODE and os.getenv('MAX_WS_ENABLED', '1') != '0' \
+        and not http_cassette.replaying():
+    ws_url = os.getenv('MAX_WS_URL', 'wss://max-stream.maicoin.com/ws')
+    market_stream = MarketDataStream(url=ws_url, depth=int(os.getenv('MAX_WS_DEPTH', '10')))
+    market_stream.start()
+    user_stream = UserDataStream(config['max_api_key'], config['max_secret_key'], url=ws_url)
+
 # 初始化 Telegram Bot 服務
 from backend.services.telegram_bot import bot_service
 
@@ -129,7 +167,13 @@ if not check_max_api():
 #     except Exception as e:
 #         app.logger.error(f"啟動Telegram Bot服務失敗: {e}")
 
-strategy_manager = StrategyManager(client)
+if WEB_ONLY:
+    strategy_manager = RemoteStrategyManager(runner_channel)
+else:
+    strategy_manager = StrategyManager(client, market_stream=market_stream, user_stream=user_stream)
+if user_stream is not None:
+    # 監聽者註冊完才連線，避免漏掉認證後的第一批訂單快照
+    user_stream.start()
 
 
 @app.context_processor
@@ -209,12 +253,11 @@ def delete_strategy(strategy_name):
 @app.route('/history')
 def trading_history():
     """交易歷史紀錄頁面"""
+    # 成交明細由前端分頁向 /api/trading_history 取得，頁面本身不再帶全部記錄
     strategies = strategy_manager.get_all_strategies()
-    records = strategy_manager.get_trading_history()
     stats = strategy_manager.get_trading_stats()
     return render_template('history.html', 
                          strategies=strategies,
-                         records=records,
                          stats=stats)
 
 
@@ -716,14 +759,29 @@ def usd_hedge_leg_snapshots_api(leg_id):
 
 @app.route('/api/trading_history')
 def get_trading_history():
-    """獲取交易歷史記錄的API"""
+    """獲取交易歷史記錄的API
+
+    參數：strategy_name、start / end（ISO 日期或時間）、cursor（上一頁回傳的 next_cursor）、
+    limit（每頁筆數，預設 500，上限 5000）。
+    """
     strategy_name = request.args.get('strategy_name')
     try:
-        records = strategy_manager.get_trading_history(strategy_name)
+        limit = min(max(int(request.args.get('limit', 500)), 1), 5000)
+        page = strategy_manager.get_trading_history_page(
+            strategy_name,
+            start=request.args.get('start') or None,
+            end=request.args.get('end') or None,
+            cursor=request.args.get('cursor') or None,
+            limit=limit,
+        )
         stats = strategy_manager.get_trading_stats(strategy_name)
+        if page.get('error'):
+            # runner 未執行或逾時：回報錯誤，不讓整個請求失敗
+            return jsonify({"success": False, "error": page['error'], "stats": stats})
         return jsonify({
             "success": True,
-            "records": records,
+            "records": page['records'],
+            "next_cursor": page['next_cursor'],
             "stats": stats
         })
     except Exception as e:
@@ -751,11 +809,64 @@ def check_connection():
             "message": f"檢查連線時發生錯誤: {str(e)}"
         })
 
+@app.route('/api/rate_limit_status', methods=['GET'])
+def rate_limit_status():
+    """MAX API 用戶端限流狀態（各 bucket 用量、等待與 429 次數）"""
+    limiter = getattr(client, 'rate_limiter', None)
+    if limiter is None:
+        return jsonify({"success": True, "enabled": False, "buckets": {}})
+    return jsonify({"success": True, "enabled": True, "buckets": limiter.stats()})
+
+@app.route('/api/market_stream_status', methods=['GET'])
+def market_stream_status():
+    """MAX WebSocket 串流狀態（行情：連線、訂閱市場、委託簿同步；私有：認證與事件數）"""
+    if WEB_ONLY:
+        return jsonify({"success": True, **(strategy_manager.status('market_stream') or {"enabled": False})})
+    return jsonify({"success": True, **market_stream_payload()})
+
+
+def market_stream_payload():
+    if market_stream is None:
+        return {"enabled": False}
+    payload = {"enabled": True, **market_stream.stats()}
+    if user_stream is not None:
+        payload["user"] = user_stream.stats()
+    return payload
+
+@app.route('/api/admin/http_metrics', methods=['GET'])
+def admin_http_metrics():
+    """對外 HTTP 請求統計：依來源（max / binance / telegram ...）與端點的延遲直方圖、錯誤數、傳輸量"""
+    return jsonify({"success": True, "buckets_ms": [str(b) for b in http_metrics.BUCKETS_MS],
+                    "venues": http_metrics.snapshot()})
+
+@app.route('/api/scheduler_status', methods=['GET'])
+def scheduler_status():
+    """伺服器端策略排程狀態（leader/待命、輪數、耗時、超時次數、下次執行時間）"""
+    if WEB_ONLY:
+        return jsonify({"success": True, **(strategy_manager.status('scheduler') or {"enabled": False})})
+    return jsonify({"success": True, **scheduler_payload()})
+
+
+def scheduler_payload():
+    if strategy_scheduler is None or not strategy_scheduler.running:
+        return {"enabled": False}
+    return {"enabled": True, **strategy_scheduler.status()}
+
 @app.route('/api/execute_strategies', methods=['POST'])
 def execute_strategies():
-    """執行所有活躍的策略"""
+    """手動立即執行一輪所有活躍的策略（定期執行由伺服器端排程負責）
+
+    external 模式交給策略執行程序；其餘與排程共用選主鎖，只有 leader worker 會執行，
+    避免手動的一輪與 leader 的一輪同時跑。
+    """
     try:
-        results = strategy_manager.execute_all_strategies()
+        if strategy_scheduler is None:
+            results = strategy_manager.execute_all_strategies()
+        else:
+            results = strategy_scheduler.run_now()
+            if results is None:
+                return jsonify({"success": False,
+                                "error": "策略由另一個 worker（排程 leader）執行，本次未執行"})
         return jsonify({"success": True, "results": results})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
@@ -891,10 +1002,8 @@ def _collect_all_positions():
 
 def _build_risk_watcher():
     """建立風控巡檢器：Telegram 示警 +（選用）派網站內自動補保證金。"""
-    notifier = None
-    if config.get('telegram_bot_token') and config.get('telegram_chat_id'):
-        notifier = TelegramNotifier(config['telegram_bot_token'], config['telegram_chat_id'])
-    else:
+    notifier = config_service.notifier()
+    if notifier is None:
         app.logger.warning('未設定 Telegram 金鑰，風控示警將只寫入日誌')
 
     transfer_client = None
@@ -912,20 +1021,46 @@ def _build_risk_watcher():
     return RiskWatcher(_collect_all_positions, notifier, transfer_client, config)
 
 
+# 背景巡檢（風控、資金費率收集）只在實際執行策略的 process 啟動；ROOSTER_DISABLE_WATCHER 只關巡檢，
+# 策略排程另由 ROOSTER_SCHEDULER 控制
+BACKGROUND_DISABLED = WEB_ONLY or _truthy(os.getenv('ROOSTER_DISABLE_WATCHER', ''))
+
 risk_watcher = _build_risk_watcher()
-if _truthy(os.getenv('ROOSTER_DISABLE_WATCHER', '')):
+if WEB_ONLY:
+    app.logger.info('策略交由獨立的策略執行程序執行，本 worker 不啟動背景服務')
+elif BACKGROUND_DISABLED:
     app.logger.warning('ROOSTER_DISABLE_WATCHER 已設定，風控巡檢不啟動')
 else:
     risk_watcher.start()
 
 
+# 策略一輪改由伺服器端排程定期執行（多個 worker 以檔案鎖選出唯一執行者）。
+# external 模式由策略執行程序排程；排程停用時仍建立物件，手動執行一輪也要經過同一把選主鎖
+strategy_scheduler = None
+if not WEB_ONLY:
+    strategy_scheduler = StrategyScheduler(
+        strategy_manager.execute_all_strategies,
+        os.getenv('ROOSTER_SCHEDULER_LOCK', os.path.join(APP_DIR, 'data', 'strategy_scheduler.lock')),
+        interval=float(os.getenv('ROOSTER_SCHEDULE_INTERVAL', '60')),
+        jitter=float(os.getenv('ROOSTER_SCHEDULE_JITTER', '5')),
+    )
+    if _truthy(os.getenv('ROOSTER_SCHEDULER', '1')):
+        strategy_scheduler.start()
+        # 使用者按下 Telegram 確認/取消時立刻跑一輪，不必等下個週期
+        callback_handler.add_listener(lambda trade_id: strategy_scheduler.wake())
+        # 事件驅動模式：串流現價接近策略觸發價時也提前跑一輪
+        strategy_manager.add_wake_listener(strategy_scheduler.wake)
+    else:
+        app.logger.warning('策略排程未啟動，策略只會在手動呼叫 /api/execute_strategies 時執行')
+
+
 funding_store = FundingRateStore(
     os.getenv('FUNDING_DATABASE_PATH', os.path.join(APP_DIR, 'data', 'funding_rates.db'))
 )
 funding_collector = FundingCollector(
     funding_store, int(config.get('funding_collect_interval', 1800) or 1800)
 )
-if not _truthy(os.getenv('ROOSTER_DISABLE_WATCHER', '')):
+if not BACKGROUND_DISABLED:
     funding_collector.start()
 
 
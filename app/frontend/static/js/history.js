@@ -2,9 +2,12 @@ $(document).ready(function () {
     const fmt = (n) => Number(n).toLocaleString('en-US', { minimumFractionDigits: 0, maximumFractionDigits: 0 });
     const fmtSigned = (n) => (n > 0 ? '+' : '') + fmt(n);
 
-    // 日期範圍狀態（給 DataTables 自訂篩選用）
+    // 篩選與分頁狀態（日期範圍、策略在伺服器端篩選；nextCursor 用來載入更早的紀錄）
     let dateStart = null;
     let dateEnd = null;
+    let strategyFilter = '';
+    let nextCursor = null;
+    const PAGE_SIZE = 500;
 
     // 圖表狀態
     let chart = null;
@@ -30,14 +33,6 @@ $(document).ready(function () {
         }
     });
 
-    // DataTables 自訂日期篩選（只註冊一次，依 dateStart/dateEnd 動態判斷）
-    $.fn.dataTable.ext.search.push(function (settings, data) {
-        if (!dateStart || !dateEnd) return true;
-        const d = moment(data[0]);           // 第 0 欄是 ISO 時間，moment 可直接解析
-        if (!d.isValid()) return true;
-        return d.isBetween(dateStart, dateEnd, null, '[]');
-    });
-
     // 初始化 DataTables
     const table = $('#history-table').DataTable({
         order: [[0, 'desc']],
@@ -54,12 +49,12 @@ $(document).ready(function () {
         dateStart = picker.startDate.startOf('day');
         dateEnd = picker.endDate.endOf('day');
         $(this).val(picker.startDate.format('YYYY/MM/DD') + ' - ' + picker.endDate.format('YYYY/MM/DD'));
-        table.draw();
+        fetchTradingHistory();
     });
     $('#date-range').on('cancel.daterangepicker', function () {
         dateStart = dateEnd = null;
         $(this).val('');
-        table.draw();
+        fetchTradingHistory();
     });
 
     // 依時間遞增排序的副本（圖表用；表格自己有排序）
@@ -142,7 +137,8 @@ $(document).ready(function () {
                 backgroundColor: 'rgba(245,166,35,0.10)',
                 borderWidth: 2, fill: true, tension: 0.15, pointRadius: 0
             };
-            labelsNote = '以每筆成交價對持倉做 mark-to-market：損益 = 持倉市值 − 淨投入 − 累積手續費。';
+            labelsNote = '以每筆成交價對持倉做 mark-to-market：損益 = 持倉市值 − 淨投入 − 累積手續費。' +
+                (nextCursor ? '（只含已載入的紀錄，載入更早的紀錄後會重算）' : '');
         }
 
         chart = new Chart(canvas, {
@@ -161,9 +157,10 @@ $(document).ready(function () {
         note.textContent = labelsNote;
     }
 
-    function updateTable(records) {
-        lastRecords = records || [];
-        table.clear();
+    function updateTable(records, append) {
+        records = records || [];
+        lastRecords = append ? lastRecords.concat(records) : records;
+        if (!append) table.clear();
         records.forEach(function (r) {
             const badge = r.action === 'buy'
                 ? '<span class="trade-badge buy">買入</span>'
@@ -180,8 +177,10 @@ $(document).ready(function () {
                 Number(r.fee || 0).toLocaleString('en-US', { minimumFractionDigits: 2, maximumFractionDigits: 2 })
             ]);
         });
-        table.draw();
+        table.draw(false);
         renderChart();
+        $('#history-count').text('已載入 ' + lastRecords.length + ' 筆' + (nextCursor ? '' : '（全部）'));
+        $('#history-load-more').toggle(!!nextCursor);
     }
 
     function setSigned(el, val) {
@@ -197,14 +196,20 @@ $(document).ready(function () {
         setSigned($('#stat-net'), s.net_profit);
     }
 
-    function fetchTradingHistory(strategyName = '') {
-        const url = strategyName
-            ? `/api/trading_history?strategy_name=${encodeURIComponent(strategyName)}`
-            : '/api/trading_history';
-        $.get(url)
+    // 不帶 cursor = 重新查第一頁；帶 cursor = 接在目前的表格後面載入下一頁
+    function fetchTradingHistory(cursor) {
+        const params = { limit: PAGE_SIZE };
+        if (strategyFilter) params.strategy_name = strategyFilter;
+        if (dateStart && dateEnd) {
+            params.start = dateStart.format('YYYY-MM-DD');
+            params.end = dateEnd.format('YYYY-MM-DD');
+        }
+        if (cursor) params.cursor = cursor;
+        $.get('/api/trading_history', params)
             .done(function (resp) {
                 if (resp.success) {
-                    updateTable(resp.records);
+                    nextCursor = resp.next_cursor || null;
+                    updateTable(resp.records, !!cursor);
                     updateStats(resp.stats);
                 } else {
                     console.error('獲取交易記錄失敗:', resp.error);
@@ -214,7 +219,12 @@ $(document).ready(function () {
     }
 
     $('#strategy-filter').on('change', function () {
-        fetchTradingHistory($(this).val());
+        strategyFilter = $(this).val();
+        fetchTradingHistory();
+    });
+
+    $('#history-load-more').on('click', function () {
+        if (nextCursor) fetchTradingHistory(nextCursor);
     });
 
     // 圖表模式切換（累積損益 / 成交價走勢）
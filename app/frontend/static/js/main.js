@@ -88,21 +88,21 @@ $(document).ready(function () {
         });
     }
 
-    // 執行所有活躍策略（伺服器端有 Lock 保證不會重複觸發）
-    function executeStrategies() {
-        $.ajax({
-            url: '/api/execute_strategies', method: 'POST',
-            success: function (resp) {
-                if (resp.success && resp.results && resp.results.length) {
-                    resp.results.forEach((r) => {
-                        const a = r.action === 'take_profit' ? '停利' : '交易';
-                        console.log(`${r.strategy_name}: ${a} - ${r.message}`);
-                    });
-                } else if (!resp.success) {
-                    console.error('執行策略失敗：', resp.error);
-                }
-            },
-            error: () => console.error('執行策略時發生錯誤')
+    const ROLE_LABELS = { leader: '執行中', standby: '待命', stopped: '已停止' };
+
+    // 策略由伺服器端排程執行；頁面只顯示排程狀態
+    function refreshSchedulerStatus() {
+        $.getJSON('/api/scheduler_status', function (resp) {
+            const el = $('#schedulerStatus');
+            if (!resp.success || !resp.enabled) {
+                el.text('策略排程未啟用').addClass('neg');
+                return;
+            }
+            const parts = [`排程${ROLE_LABELS[resp.role] || resp.role}`];
+            if (resp.last_duration != null) parts.push(`上輪 ${resp.last_duration.toFixed(1)} 秒`);
+            if (resp.next_run_at) parts.push(`下次 ${resp.next_run_at.slice(11)}`);
+            if (resp.overruns) parts.push(`超時 ${resp.overruns} 次`);
+            el.text(parts.join(' · ')).toggleClass('neg', !!resp.last_error || resp.role === 'stopped');
         });
     }
 
@@ -110,8 +110,8 @@ $(document).ready(function () {
     refreshConnPill();
     updateStrategyInfo();
     updateTradeCountStyle();
-    executeStrategies();
+    refreshSchedulerStatus();
     setInterval(refreshConnPill, 60000);
     setInterval(updateStrategyInfo, 60000);
-    setInterval(executeStrategies, 60000);
+    setInterval(refreshSchedulerStatus, 15000);
 });
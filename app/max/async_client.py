@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""ClientV3 的 asyncio 版本（限制同時在途請求數，支援逾時與取消）。
+
+策略引擎原本每個交易所呼叫都是阻塞、依序執行的；這裡提供與 ClientV3
+相同的方法介面（get_trades / get_depth / get_order / get_order_by_client_oid /
+get_orders / create_order / cancel_order / cancel_orders / get_account_balance），讓呼叫端可以在
+一個 event loop 裡同時對所有市場、所有訂單發出請求：
+
+    async with AsyncClientV3(client, max_concurrency=8, timeout=10) as ac:
+        orders = await ac.get_orders_many(["btctwd", "ethtwd"])
+
+實作上包裝既有的同步 client（ClientV3 或 MockClientV3），在固定大小的
+執行緒池裡執行；執行緒數即為同時在途請求的上限，所有請求共用 ClientV3
+的 keep-alive 連線池與 nonce 產生器，簽章邏輯不必重寫一份。
+
+取消與逾時：尚未開始的請求會直接從佇列取消；已送出的請求無法中斷 HTTP 連線，
+結果會被丟棄。下單/撤單逾時後交易所端可能已生效，呼叫端應以掛單列表對帳。
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class AsyncClientV3(object):
+    def __init__(self, client, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=None):
+        """
+        :param client: 同步版 client（ClientV3 / MockClientV3）
+        :param max_concurrency: 同時在途請求上限
+        :param timeout: 每個請求的預設逾時秒數；None 表示不限（仍受 transport 逾時約束）
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency 必須 >= 1")
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="max-async"
+        )
+        self._lock = threading.Lock()
+        self.in_flight = 0          # 目前實際在執行的請求數
+        self.peak_in_flight = 0     # 觀察用：曾經同時在途的最大請求數
+
+    # ---------- 生命週期 ----------
+    def close(self, wait=False):
+        """關閉執行緒池；wait=False 時不等待已送出的請求。"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- 內部 ----------
+    def _invoke(self, fn, args, kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def _call(self, name, *args, timeout=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        fn = getattr(self.client, name)
+        # 帶上呼叫端的 contextvars（例如價格服務的每輪快照）
+        ctx = contextvars.copy_context()
+        future = loop.run_in_executor(
+            self._executor, functools.partial(ctx.run, self._invoke, fn, args, kwargs)
+        )
+        timeout = self.timeout if timeout is None else timeout
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout)
+
+    # ---------- 市場行情 API ----------
+    async def get_market_summary(self, timeout=None):
+        return await self._call('get_market_summary', timeout=timeout)
+
+    async def get_trades(self, market, limit=1, timeout=None):
+        return await self._call('get_trades', market, limit=limit, timeout=timeout)
+
+    async def get_depth(self, market, limit=10, timeout=None):
+        return await self._call('get_depth', market, limit=limit, timeout=timeout)
+
+    # ---------- 帳戶 API ----------
+    async def get_account_balance(self, wallet_type='spot', timeout=None):
+        return await self._call('get_account_balance', wallet_type=wallet_type, timeout=timeout)
+
+    # ---------- 交易 API ----------
+    async def create_order(self, market, side, volume, price=None, order_type='market',
+                           wallet_type='spot', group_id=None, client_oid=None, timeout=None):
+        return await self._call('create_order', market, side, volume, price=price,
+                                order_type=order_type, wallet_type=wallet_type,
+                                group_id=group_id, client_oid=client_oid, timeout=timeout)
+
+    async def cancel_order(self, order_id, wallet_type='spot', timeout=None):
+        return await self._call('cancel_order', order_id, wallet_type=wallet_type,
+                                timeout=timeout)
+
+    async def cancel_orders(self, market=None, side=None, group_id=None, wallet_type='spot',
+                            timeout=None):
+        return await self._call('cancel_orders', market=market, side=side, group_id=group_id,
+                                wallet_type=wallet_type, timeout=timeout)
+
+    async def get_order(self, order_id, wallet_type='spot', timeout=None):
+        return await self._call('get_order', order_id, wallet_type=wallet_type,
+                                timeout=timeout)
+
+    async def get_order_by_client_oid(self, client_oid, timeout=None):
+        return await self._call('get_order_by_client_oid', client_oid, timeout=timeout)
+
+    async def get_orders(self, market, state='wait', wallet_type='spot', timeout=None):
+        return await self._call('get_orders', market, state=state, wallet_type=wallet_type,
+                                timeout=timeout)
+
+    # ---------- 批次扇出 ----------
+    async def get_orders_many(self, markets, state='wait', timeout=None):
+        """同時查多個市場的訂單列表，回傳 {market: list 或 Exception}。"""
+        markets = list(markets)
+        results = await asyncio.gather(
+            *(self.get_orders(m, state=state, timeout=timeout) for m in markets),
+            return_exceptions=True,
+        )
+        return dict(zip(markets, results))
+
+    async def get_order_many(self, order_ids, timeout=None):
+        """同時查多張訂單，回傳 {order_id: dict 或 Exception}。"""
+        order_ids = list(order_ids)
+        results = await asyncio.gather(
+            *(self.get_order(oid, timeout=timeout) for oid in order_ids),
+            return_exceptions=True,
+        )
+        return dict(zip(order_ids, results))
+
+    async def get_trades_many(self, markets, limit=1, timeout=None):
+        """同時查多個市場的最新成交，回傳 {market: list 或 Exception}。"""
+        markets = list(markets)
+        results = await asyncio.gather(
+            *(self.get_trades(m, limit=limit, timeout=timeout) for m in markets),
+            return_exceptions=True,
+        )
+        return dict(zip(markets, results))
@@ -4,32 +4,61 @@ import base64
 import hashlib
 import hmac
 import json
+import time
 
+from urllib.error import HTTPError
 from urllib.parse import urlencode
 from urllib.request import Request
 from urllib.request import urlopen
 
 from .constants import *
 from .helpers import *
+from .nonce import get_nonce_generator
+from .pagination import DEFAULT_PREFETCH, PageCache, iter_pages
+from .rate_limit import get_shared_rate_limiter
+
+# 收到 429 後重新送出的次數上限
+RATE_LIMIT_RETRIES = 2
+
+# 入金/出金的終態：處於這些狀態的記錄不會再變，才可寫入分頁快取
+_FINAL_DEPOSIT_STATES = {'accepted', 'rejected', 'refunded', 'cancelled', 'canceled', 'refund_cancelled'}
+_FINAL_WITHDRAWAL_STATES = {'confirmed', 'rejected', 'failed', 'cancelled', 'canceled'}
 
 
 class Client(object):
-    def __init__(self, key, secret, timeout=30):
+    def __init__(self, key, secret, timeout=30, page_cache=None):
         self._api_key = key
         self._api_secret = secret
+        # 歷史分頁的磁碟快取（iter_private_* 使用）
+        self._page_cache = page_cache or PageCache()
+        self._account = hashlib.sha256(key.encode()).hexdigest()[:16] if key else ''
 
         self._api_timeout = int(timeout)
+        # 同一把 key 跨執行緒/跨 process 嚴格遞增的 nonce（取代原本的毫秒時間戳）
+        self._nonce = get_nonce_generator(key)
+        # 與 ClientV3 共用 process 內的限流器（同一帳戶的額度）
+        self.rate_limiter = get_shared_rate_limiter()
+
+    def _sync_time(self):
+        """以 get_public_server_time 校正 nonce 時差；失敗時沿用本機時鐘。"""
+        if not self._nonce.needs_sync():
+            return
+        try:
+            sent_at = time.time()
+            server_time = self.get_public_server_time()
+            self._nonce.align(server_time, sent_at, time.time())
+        except Exception:
+            self._nonce.mark_synced()
 
     def _build_body(self, endpoint, query=None):
         if query is None:
             query = {}
 
-        # TODO: duplicated nonce may occurred in high frequency trading
-        # fix it by yourself, hard code last two characters is a quick solution
+        # nonce 由 NonceGenerator 保證嚴格遞增，避免高頻或多 worker 時撞號
         # {"error":{"code":2006,"message":"The nonce has already been used by access key."}}
         body = {
             'path': f"/api/{PRIVATE_API_VERSION}/{endpoint}.json",
-            'nonce': get_current_timestamp(),
+            'nonce': self._nonce.next(),
         }
 
         body.update(query)
@@ -82,12 +111,27 @@ class Client(object):
         return f"{url}?{urlencode(query, True, '/[]')}" if len(query) > 0 else url
 
     def _send_request(self, scope, method, endpoint, query=None, form=None):
-        if form is None:
-            form = {}
-
-        if query is None:
-            query = {}
-
+        scope = scope.lower()
+        if scope == 'private':
+            self._sync_time()
+
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(scope, endpoint)
+            try:
+                # 每次重送都重新簽章（新 nonce），query/form 會被改寫所以傳副本
+                result = self._send_once(scope, method, endpoint, dict(query or {}), dict(form or {}))
+            except HTTPError as e:
+                retry_after = e.headers.get('Retry-After') if e.code == 429 and e.headers else None
+                self.rate_limiter.on_response(scope, e.code, retry_after)
+                if e.code == 429 and attempt < RATE_LIMIT_RETRIES:
+                    attempt += 1
+                    continue
+                raise
+            self.rate_limiter.on_response(scope, 200)
+            return result
+
+    def _send_once(self, scope, method, endpoint, query, form):
         body = self._build_body(endpoint, query)
         data = None
 
@@ -649,6 +693,120 @@ class Client(object):
 
         return self._send_request('private', 'GET', 'withdrawals', query)
 
+    # Private API (Streaming history)
+    def _iter_history(self, endpoint, fetch, limit, prefetch, use_cache, is_immutable, *key_parts):
+        cache_key = PageCache.make_key(endpoint, self._account, limit, *key_parts) if use_cache else None
+        return iter_pages(fetch, limit, prefetch=prefetch, cache=self._page_cache if use_cache else None,
+                          cache_key=cache_key, is_immutable=is_immutable)
+
+    def iter_private_trade_history(self, pair, timestamp='', limit=50,
+                                   prefetch=DEFAULT_PREFETCH, use_cache=True):
+        """
+        逐筆產生成交歷史（由舊到新），並行預取後續頁。
+
+        升冪排序下新成交只會加在最後，已滿的頁不會再變，會寫入磁碟快取。
+
+        :param pair: the trading pair to query
+        :param timestamp: the Unix epoch seconds set to return trades executed before the time only
+        :param limit: the records limit per page
+        :param prefetch: the number of pages requested concurrently
+        :param use_cache: read/write completed pages from the disk cache
+        :return: a generator of completed trades
+        """
+
+        def fetch(page):
+            return self.get_private_trade_history(pair, timestamp=timestamp, sort='asc',
+                                                  pagination=True, page=page, limit=limit)
+
+        return self._iter_history('trades/my', fetch, limit, prefetch, use_cache,
+                                  lambda rows: len(rows) == limit, pair.lower(), timestamp)
+
+    def iter_private_order_history(self, pair, state=None, limit=100,
+                                   prefetch=DEFAULT_PREFETCH, group_id=''):
+        """
+        逐筆產生委託歷史（由舊到新），並行預取後續頁。
+
+        委託狀態會改變（wait → done），舊單成交後也會改變各頁的組成，所以不寫入磁碟快取。
+
+        :param pair: the trading pair to query
+        :param state: the states to be filtered, default is 'wait' and 'convert'
+        :param limit: the records limit per page
+        :param prefetch: the number of pages requested concurrently
+        :param group_id: a integer group id for orders
+        :return: a generator of placed orders
+        """
+
+        def fetch(page):
+            return self.get_private_order_history(pair, state=state, sort='asc', pagination=True,
+                                                  page=page, limit=limit, group_id=group_id)
+
+        return iter_pages(fetch, limit, prefetch=prefetch)
+
+    @staticmethod
+    def _closed_window(to, rows, limit, final_states):
+        # 查詢區間已結束、頁已滿且每筆都是終態，之後不會再變
+        try:
+            closed = bool(to) and int(to) < time.time()
+        except (TypeError, ValueError):
+            closed = False
+        return closed and len(rows) == limit and all(
+            str(r.get('state', '')).lower() in final_states for r in rows
+        )
+
+    def iter_private_deposit_history(self, currency='', _from='', to='', state='', limit=50,
+                                     prefetch=DEFAULT_PREFETCH, use_cache=True):
+        """
+        逐筆產生入金歷史，並行預取後續頁。
+
+        只有查詢區間已結束（to 在過去）且整頁都是終態的頁會寫入磁碟快取。
+
+        :param currency: the specific coin to query
+        :param _from: the target period after Epoch time in seconds
+        :param to: the target period before Epoch time in seconds
+        :param state: the deposits status to query
+        :param limit: the records limit per page
+        :param prefetch: the number of pages requested concurrently
+        :param use_cache: read/write completed pages from the disk cache
+        :return: a generator of deposits
+        """
+
+        def fetch(page):
+            return self.get_private_deposit_history(currency, _from=_from, to=to, state=state,
+                                                    pagination=True, page=page, limit=limit)
+
+        return self._iter_history(
+            'deposits', fetch, limit, prefetch, use_cache,
+            lambda rows: self._closed_window(to, rows, limit, _FINAL_DEPOSIT_STATES),
+            currency.lower(), _from, to, state,
+        )
+
+    def iter_private_withdrawal_history(self, currency='', _from='', to='', state='', limit=50,
+                                        prefetch=DEFAULT_PREFETCH, use_cache=True):
+        """
+        逐筆產生出金歷史，並行預取後續頁。
+
+        只有查詢區間已結束（to 在過去）且整頁都是終態的頁會寫入磁碟快取。
+
+        :param currency: the specific coin to query
+        :param _from: the target period after Epoch time in seconds
+        :param to: the target period before Epoch time in seconds
+        :param state: the withdrawals status to query
+        :param limit: the records limit per page
+        :param prefetch: the number of pages requested concurrently
+        :param use_cache: read/write completed pages from the disk cache
+        :return: a generator of withdrawals
+        """
+
+        def fetch(page):
+            return self.get_private_withdrawal_history(currency, _from=_from, to=to, state=state,
+                                                       pagination=True, page=page, limit=limit)
+
+        return self._iter_history(
+            'withdrawals', fetch, limit, prefetch, use_cache,
+            lambda rows: self._closed_window(to, rows, limit, _FINAL_WITHDRAWAL_STATES),
+            currency.lower(), _from, to, state,
+        )
+
     # Private API (Write)
     def set_private_cancel_order(self, _id, client_id=''):
         """
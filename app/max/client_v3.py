@@ -8,18 +8,135 @@ import time
 import requests
 from urllib.parse import urlencode
 
+from .markets import MarketCatalog
+from .nonce import get_nonce_generator
+from .rate_limit import get_shared_rate_limiter
+from .transport import get_shared_transport
+
+# 不需帳戶權限的行情端點（走 public 限流 bucket）。以完整路徑比對，
+# 避免 /api/v3/trades/my 這類同前綴的私有端點被算進 public bucket
+_PUBLIC_PATHS = frozenset((
+    '/api/v3/markets', '/api/v3/currencies', '/api/v3/timestamp', '/api/v3/trades',
+    '/api/v3/depth', '/api/v3/k', '/api/v3/ticker', '/api/v3/tickers',
+))
+
+# 收到 429 後重新送出的次數上限（429 代表交易所未處理該請求，POST 重送也安全）
+RATE_LIMIT_RETRIES = 2
+
+# GET 遇到讀取逾時、連線中斷或 502/503/504 時重新簽章重送的次數上限。
+# POST（下單/撤單）不重送：交易所可能已經處理，重送會重複下單
+TRANSIENT_RETRIES = 2
+TRANSIENT_BACKOFF = 0.3
+TRANSIENT_STATUS = (502, 503, 504)
+
+# 批次撤單在限流上的權重（與 v2 orders/clear 相同）
+BULK_CANCEL_WEIGHT = 5
+
 class ClientV3(object):
-    def __init__(self, key, secret, timeout=30):
+    def __init__(self, key, secret, timeout=None, transport=None, rate_limiter=None):
         self._api_key = key
         self._api_secret = secret
-        self._api_timeout = timeout
+        self._api_timeout = timeout            # None = 用 transport 的預設逾時
         self._api_url = "https://max-api.maicoin.com"
+        # 預設共用 process 內的連線池（keep-alive），所有策略共用同一組連線
+        self._transport = transport or get_shared_transport()
+        # 用戶端限流（public/private bucket、端點權重、429 退避），process 內共用
+        self._rate_limiter = rate_limiter or get_shared_rate_limiter()
+        # 同一把 key 跨執行緒/跨 process 嚴格遞增的 nonce，並以交易所時間校正
+        self._nonce = get_nonce_generator(key)
+        # 市場精度（tick / 數量精度 / 最小下單量）一次載入、記憶體快取
+        self.markets = MarketCatalog(self.get_market_summary)
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    def get_server_time(self):
+        """取得交易所伺服器時間（秒）。公開端點，不需簽章。"""
+        self._rate_limiter.acquire('public', '/api/v3/timestamp')
+        response = self._transport.request(
+            'GET', f"{self._api_url}/api/v3/timestamp", timeout=self._api_timeout
+        )
+        status = response.status_code
+        self._rate_limiter.on_response(
+            'public', status, response.headers.get('Retry-After') if status == 429 else None
+        )
+        response.raise_for_status()
+        payload = response.json()
+        return int(payload['timestamp'] if isinstance(payload, dict) else payload)
+
+    def sync_time(self):
+        """以交易所時間校正 nonce 時差，回傳時差（毫秒）。"""
+        sent_at = time.time()
+        server_time = self.get_server_time()
+        return self._nonce.align(server_time, sent_at, time.time())
+
+    def _maybe_sync_time(self):
+        if not self._nonce.needs_sync():
+            return
+        try:
+            self.sync_time()
+        except Exception:
+            # 對時失敗不影響請求本身，沿用本機時鐘，下個週期再試
+            self._nonce.mark_synced()
 
-    def _make_request(self, path, method='GET', params=None):
-        """發送API請求"""
+    @staticmethod
+    def _scope(path):
+        """行情端點走 public bucket，其餘（錢包/訂單）走 private bucket。"""
+        return 'public' if path in _PUBLIC_PATHS else 'private'
+
+    def _make_request(self, path, method='GET', params=None, timeout=None, weight=None):
+        """發送API請求（timeout 為 None 時用建構時或 transport 的預設值）
+
+        送出前先向限流器取 token；收到 429 時限流器會暫停該 bucket，
+        這裡重新簽章（新 nonce）後最多重試 RATE_LIMIT_RETRIES 次。
+        GET 遇到讀取逾時、連線中斷或 502/503/504 時同樣重新簽章、重新取 token，
+        最多重試 TRANSIENT_RETRIES 次（transport 層只重試連線建立失敗）。
+        """
+        self._maybe_sync_time()
+        scope = self._scope(path)
+        timeout = self._api_timeout if timeout is None else timeout
+        retry_transient = method == 'GET'
+        attempt = 0
+        transient = 0
+        while True:
+            self._rate_limiter.acquire(scope, path, weight=weight)
+            try:
+                try:
+                    response = self._send_signed(path, method, params, timeout)
+                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+                    if retry_transient and transient < TRANSIENT_RETRIES:
+                        time.sleep(TRANSIENT_BACKOFF * (2 ** transient))
+                        transient += 1
+                        continue
+                    raise
+                status = response.status_code
+                retry_after = response.headers.get('Retry-After') if status == 429 else None
+                self._rate_limiter.on_response(scope, status, retry_after)
+                if status == 429 and attempt < RATE_LIMIT_RETRIES:
+                    attempt += 1
+                    continue
+                if status in TRANSIENT_STATUS and retry_transient and transient < TRANSIENT_RETRIES:
+                    # 限流器已對該 bucket 做 5xx 退避，下一次 acquire 會等待
+                    transient += 1
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                # 嘗試印出response內容
+                if e.response is not None:
+                    try:
+                        error_text = e.response.text
+                    except Exception:
+                        error_text = '無法取得response內容'
+                    raise Exception(f"API請求失敗: {str(e)}，回應內容: {error_text}") from e
+                else:
+                    raise Exception(f"API請求失敗: {str(e)}") from e
+
+    def _send_signed(self, path, method, params, timeout):
         # 1. 準備參數
         request_params = {
-            'nonce': int(time.time() * 1000)
+            'nonce': self._nonce.next()
         }
         if params:
             request_params.update(params)
@@ -48,31 +165,16 @@ class ClientV3(object):
 
         # 6. 發送請求
         url = f"{self._api_url}{path}"
-        try:
-            if method == 'GET':
-                url += f"?{urlencode(request_params)}"
-                response = requests.get(url, headers=headers, timeout=self._api_timeout)
-            else:
-                response = requests.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    data=json.dumps(request_params),
-                    timeout=self._api_timeout
-                )
-            
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            # 嘗試印出response內容
-            if e.response is not None:
-                try:
-                    error_text = e.response.text
-                except Exception:
-                    error_text = '無法取得response內容'
-                raise Exception(f"API請求失敗: {str(e)}，回應內容: {error_text}")
-            else:
-                raise Exception(f"API請求失敗: {str(e)}")
+        if method in ('GET', 'DELETE'):
+            url += f"?{urlencode(request_params)}"
+            return self._transport.request(method, url, headers=headers, timeout=timeout)
+        return self._transport.request(
+            method,
+            url,
+            headers=headers,
+            data=json.dumps(request_params),
+            timeout=timeout
+        )
 
     # 市場行情API
     def get_market_summary(self):
@@ -88,7 +190,8 @@ class ClientV3(object):
         return self._make_request('/api/v3/trades', params=params)
 
     # 交易API
-    def create_order(self, market, side, volume, price=None, order_type='market', wallet_type='spot'):
+    def create_order(self, market, side, volume, price=None, order_type='market', wallet_type='spot',
+                     group_id=None, client_oid=None):
         """創建訂單
         Args:
             market: 交易對，如 'btctwd'
@@ -97,6 +200,8 @@ class ClientV3(object):
             price: 限價單價格，市價單可為None
             order_type: 訂單類型，'market' 或 'limit'
             wallet_type: 錢包類型，'spot'(現貨) 或 'margin'(槓桿) 或 'futures'(期貨)
+            group_id: 訂單群組（正整數），可用 cancel_orders 一次撤掉整組
+            client_oid: 自訂訂單編號（同帳戶內唯一）
         """
         # 格式化volume為最多16位小數
         formatted_volume = "{:.16f}".format(float(volume))
@@ -111,6 +216,10 @@ class ClientV3(object):
         }
         if price is not None:
             params['price'] = str(price)
+        if group_id is not None:
+            params['group_id'] = int(group_id)
+        if client_oid is not None:
+            params['client_oid'] = str(client_oid)
 
         return self._make_request(f'/api/v3/wallet/{wallet_type}/order', 'POST', params)
 
@@ -118,10 +227,27 @@ class ClientV3(object):
         """取消訂單"""
         return self._make_request(f'/api/v3/wallet/{wallet_type}/orders/{order_id}/cancel', 'POST')
 
+    def cancel_orders(self, market=None, side=None, group_id=None, wallet_type='spot'):
+        """批次撤單：依市場/買賣方向/群組篩選，一次請求撤掉所有符合的掛單"""
+        params = {}
+        if market:
+            params['market'] = market.lower()
+        if side:
+            params['side'] = side.lower()
+        if group_id is not None:
+            params['group_id'] = int(group_id)
+        return self._make_request(
+            f'/api/v3/wallet/{wallet_type}/orders', 'DELETE', params, weight=BULK_CANCEL_WEIGHT
+        )
+
     def get_order(self, order_id, wallet_type='spot'):
         """獲取訂單信息"""
         return self._make_request(f'/api/v3/wallet/{wallet_type}/orders/{order_id}')
 
+    def get_order_by_client_oid(self, client_oid):
+        """以自訂訂單編號查詢訂單（送單結果不明時用來確認是否已掛上）"""
+        return self._make_request('/api/v3/order', params={'client_oid': str(client_oid)})
+
     def get_orders(self, market, state='wait', wallet_type='spot'):
         """獲取訂單列表"""
         params = {
@@ -136,20 +262,8 @@ class ClientV3(object):
         return self._make_request('/api/v3/depth', params=params)
 
     def tick_size(self, market):
-        """回傳最小跳動單位。注意：此為依價位量級的近似值，
-        正式環境應改讀 /api/v3/markets 的市場精度。"""
-        try:
-            trades = self.get_trades(market, limit=1)
-            p = float(trades[0]['price']) if trades else 0
-        except Exception:
-            p = 0
-        if p >= 1000:
-            return 1.0
-        if p >= 100:
-            return 0.5
-        if p >= 10:
-            return 0.05
-        return 0.01
+        """回傳最小跳動單位（由 /api/v3/markets 的 quote_unit_precision 算出，記憶體快取）"""
+        return self.markets.tick_size(market)
 
     # 帳戶API
     def get_account_balance(self, wallet_type='spot'):
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""MAX WebSocket 行情訂閱（trade + book 頻道），在記憶體維護各市場最新成交價與 L2 委託簿。
+
+原本 maker 引擎每輪都打 get_trades(limit=1) 取價、chase 建倉再打
+get_depth(limit=1)；這裡改由背景執行緒訂閱 MAX 串流，價格服務與
+_compute_build_price 直接讀記憶體，不需要任何網路請求。
+
+    stream = MarketDataStream(["btctwd"])
+    stream.start()
+    stream.last_price("btctwd")        # 未連線/尚無資料時回傳 None，呼叫端退回 REST
+    stream.top_of_book("btctwd")       # {"bids": [[p, v]], "asks": [[p, v]]} 或 None
+
+斷線時自動以指數退避重連並重新訂閱；委託簿出現序號缺口時重新訂閱該市場
+以取得新的 snapshot。斷線期間所有讀取都回傳 None。
+
+訊息格式（節錄）：
+  {"c":"trade","M":"btctwd","e":"snapshot"|"update","t":[{"p":"...","v":"...","T":...}]}
+  {"c":"book","M":"btctwd","e":"snapshot"|"update","a":[[p,v]],"b":[[p,v]],"fi":..,"li":..}
+"""
+import abc
+import logging
+import socket
+import threading
+import time
+
+from .orderbook import OrderBook
+from .ws import WebSocketConnection
+
+DEFAULT_URL = "wss://max-stream.maicoin.com/ws"
+DEFAULT_DEPTH = 10
+RECONNECT_MAX = 60.0
+
+logger = logging.getLogger("max.market_stream")
+
+
+class StreamRunner(abc.ABC):
+    """串流共用骨架：背景執行緒連線、斷線以指數退避重連、閒置送 ping/逾時重連。
+
+    子類別實作 _on_connect(conn)（送出訂閱/認證）、_on_disconnect()、_handle(msg)。
+    """
+
+    thread_name = "max-stream"
+
+    def __init__(self, url, connect_timeout=10, idle_timeout=30, connector=None):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self._connector = connector or WebSocketConnection.connect
+        self._send_lock = threading.Lock()
+        self._conn = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.connected = threading.Event()
+        # 觀察用計數
+        self.messages = 0
+        self.reconnects = 0
+
+    # ---------- 生命週期 ----------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        conn = self._conn
+        if conn is not None:
+            conn.close()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _send(self, obj):
+        conn = self._conn
+        if conn is None:
+            return
+        with self._send_lock:
+            conn.send_json(obj)
+
+    # ---------- 子類別實作 ----------
+    def _on_connect(self, conn):
+        pass
+
+    def _on_disconnect(self):
+        pass
+
+    @abc.abstractmethod
+    def _handle(self, msg):
+        """處理一則已解析的訊息（在串流執行緒上執行）。"""
+
+    # ---------- 背景執行緒 ----------
+    def _run(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                self._conn = self._connector(self.url, timeout=self.connect_timeout)
+                self._on_connect(self._conn)
+                self.connected.set()
+                delay = 1.0
+                self._read_loop(self._conn)
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning(f"{self.thread_name} 中斷，{delay:.0f} 秒後重連: {e}")
+            finally:
+                self.connected.clear()
+                self._on_disconnect()
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+            if self._stop.wait(delay):
+                break
+            self.reconnects += 1
+            delay = min(delay * 2, RECONNECT_MAX)
+
+    def _read_loop(self, conn):
+        conn.settimeout(self.idle_timeout / 2)
+        last_seen = time.time()
+        pinged = False
+        while not self._stop.is_set():
+            try:
+                msg = conn.recv_json()
+            except socket.timeout:
+                if pinged or time.time() - last_seen > self.idle_timeout:
+                    raise TimeoutError("串流閒置逾時")
+                with self._send_lock:
+                    conn.ping()
+                pinged = True
+                continue
+            last_seen = time.time()
+            pinged = False
+            self.messages += 1
+            self._handle(msg)
+
+
+class MarketDataStream(StreamRunner):
+    thread_name = "max-market-stream"
+
+    def __init__(self, markets=(), url=DEFAULT_URL, depth=DEFAULT_DEPTH,
+                 connect_timeout=10, idle_timeout=30, connector=None):
+        """
+        :param markets: 初始訂閱的市場
+        :param depth: book 頻道訂閱的檔數
+        :param idle_timeout: 超過此秒數沒收到任何訊息就視為斷線重連（期間會先送 ping）
+        :param connector: 測試用，取代 WebSocketConnection.connect
+        """
+        super().__init__(url, connect_timeout, idle_timeout, connector)
+        self.depth = depth
+        self._markets = {m.lower() for m in markets}
+        self._books = {}
+        self._last_trade = {}          # market -> (price, trade_time)
+        self._lock = threading.Lock()
+        self._price_listeners = []
+        self.resyncs = 0
+
+    def add_price_listener(self, callback):
+        """callback(market, price)：每次成交價更新時在串流執行緒上呼叫，請勿在回呼中做耗時工作。"""
+        self._price_listeners.append(callback)
+
+    def wait_ready(self, market, timeout=5):
+        """等待某市場的委託簿與成交價都就緒（測試/啟動用）。"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.last_price(market) is not None and self.top_of_book(market) is not None:
+                return True
+            time.sleep(0.01)
+        return False
+
+    # ---------- 訂閱 ----------
+    def subscribe(self, market):
+        """新增訂閱市場；已連線時立即送出訂閱。"""
+        market = market.lower()
+        with self._lock:
+            if market in self._markets:
+                return
+            self._markets.add(market)
+        if self.connected.is_set():
+            try:
+                self._send_sub("sub", [market])
+            except OSError as e:
+                logger.warning(f"訂閱 {market} 失敗，重連後再訂閱: {e}")
+
+    def _subscriptions(self, markets):
+        subs = []
+        for m in markets:
+            subs.append({"channel": "book", "market": m, "depth": self.depth})
+            subs.append({"channel": "trade", "market": m})
+        return subs
+
+    def _send_sub(self, action, markets, channels=("book", "trade")):
+        subs = [s for s in self._subscriptions(markets) if s["channel"] in channels]
+        if subs:
+            self._send({"action": action, "subscriptions": subs, "id": "rooster"})
+
+    def _resync(self, market):
+        """委託簿序號缺口：退訂再訂閱 book 頻道，讓伺服器重送 snapshot。"""
+        self.resyncs += 1
+        logger.warning(f"{market} 委託簿序號缺口，重新訂閱取得 snapshot")
+        self._send_sub("unsub", [market], channels=("book",))
+        self._send_sub("sub", [market], channels=("book",))
+
+    # ---------- 讀取（零網路請求）----------
+    def last_price(self, market):
+        if not self.connected.is_set():
+            return None
+        with self._lock:
+            trade = self._last_trade.get(market.lower())
+        return trade[0] if trade else None
+
+    def book(self, market):
+        """回傳已同步的 OrderBook；未連線或正在重新同步時回傳 None。"""
+        if not self.connected.is_set():
+            return None
+        with self._lock:
+            book = self._books.get(market.lower())
+        if book is None or not book.synced:
+            return None
+        return book
+
+    def top_of_book(self, market, n=1):
+        book = self.book(market)
+        if book is None:
+            return None
+        top = book.top(n)
+        if not top["bids"] or not top["asks"]:
+            return None
+        return top
+
+    def stats(self):
+        with self._lock:
+            books = {m: {"synced": b.synced, "gaps": b.gaps, "levels": b.depth()}
+                     for m, b in self._books.items()}
+            markets = sorted(self._markets)
+        return {
+            "connected": self.connected.is_set(),
+            "markets": markets,
+            "messages": self.messages,
+            "reconnects": self.reconnects,
+            "resyncs": self.resyncs,
+            "books": books,
+        }
+
+    # ---------- 連線事件 ----------
+    def _on_connect(self, conn):
+        with self._lock:
+            markets = sorted(self._markets)
+        self._send_sub("sub", markets)
+
+    def _on_disconnect(self):
+        with self._lock:
+            for book in self._books.values():
+                book.invalidate()
+
+    def _handle(self, msg):
+        channel = msg.get("c")
+        market = (msg.get("M") or "").lower()
+        event = msg.get("e")
+        if event == "error":
+            logger.warning(f"行情串流錯誤: {msg.get('E')}")
+            return
+        if channel == "trade":
+            trades = msg.get("t") or []
+            if trades:
+                latest = max(trades, key=lambda t: t.get("T", 0))
+                with self._lock:
+                    prev = self._last_trade.get(market)
+                    updated = prev is None or latest.get("T", 0) >= prev[1]
+                    if updated:
+                        self._last_trade[market] = (float(latest["p"]), latest.get("T", 0))
+                if updated:
+                    for callback in list(self._price_listeners):
+                        try:
+                            callback(market, float(latest["p"]))
+                        except Exception as e:
+                            logger.warning(f"成交價監聽者發生錯誤: {e}")
+        elif channel == "book":
+            with self._lock:
+                book = self._books.get(market)
+                if book is None:
+                    book = self._books[market] = OrderBook(market)
+            if event == "snapshot":
+                book.apply_snapshot(msg.get("b"), msg.get("a"), msg.get("li"))
+            elif event == "update":
+                was_synced = book.synced
+                if not book.apply_update(msg.get("b"), msg.get("a"), msg.get("fi"), msg.get("li")):
+                    if was_synced:
+                        self._resync(market)
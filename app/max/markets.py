@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""MAX 市場精度目錄（tick size、數量精度、最小下單量）。
+
+原本 `ClientV3.tick_size` 每次都抓最新成交、再依價位量級「猜」tick，
+maker 每對齊一個價格就多打一次 /api/v3/trades。這裡改成從 /api/v3/markets
+一次載入所有市場的精度並快取在記憶體，超過 TTL 才重新載入；重新載入失敗時
+沿用舊資料，不讓短暫的 API 錯誤影響下單。
+
+/api/v3/markets 每筆欄位（節錄）：
+  id, status, base_unit, base_unit_precision, min_base_amount,
+  quote_unit, quote_unit_precision, min_quote_amount
+"""
+import math
+import threading
+import time
+
+DEFAULT_TTL = 3600
+
+
+class MarketCatalog(object):
+    def __init__(self, loader, ttl=DEFAULT_TTL):
+        """
+        :param loader: 無參數 callable，回傳 /api/v3/markets 格式的 list
+        :param ttl: 快取秒數，超過後下次查詢時重新載入
+        """
+        self._loader = loader
+        self._ttl = ttl
+        self._markets = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._markets and time.time() - self._loaded_at < self._ttl:
+            return
+        with self._lock:
+            if self._markets and time.time() - self._loaded_at < self._ttl:
+                return
+            try:
+                rows = self._loader() or []
+            except Exception:
+                if not self._markets:
+                    raise
+                # 重新載入失敗：沿用舊資料，稍後再試
+                self._loaded_at = time.time() - self._ttl / 2
+                return
+            self._markets = {str(r['id']).lower(): r for r in rows if r.get('id')}
+            self._loaded_at = time.time()
+
+    def refresh(self):
+        """強制下次查詢時重新載入。"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def get(self, market):
+        """回傳單一市場的原始資訊 dict；找不到時 raise KeyError。"""
+        self._ensure_loaded()
+        info = self._markets.get(market.lower())
+        if info is None:
+            raise KeyError(f"未知的市場: {market}")
+        return info
+
+    def price_precision(self, market):
+        return int(self.get(market).get('quote_unit_precision', 0))
+
+    def amount_precision(self, market):
+        return int(self.get(market).get('base_unit_precision', 8))
+
+    def tick_size(self, market):
+        """最小價格跳動單位 = 10^-quote_unit_precision。"""
+        return 10 ** -self.price_precision(market)
+
+    def round_price(self, market, price):
+        """把價格對齊到最近的 tick。"""
+        precision = self.price_precision(market)
+        return float(round(float(price), precision))
+
+    def round_volume(self, market, volume):
+        """數量依精度無條件捨去（避免超出可用餘額）。"""
+        precision = self.amount_precision(market)
+        factor = 10 ** precision
+        # 加一點容差，避免 0.29999999999 這類浮點誤差被多捨掉一個單位
+        return math.floor(float(volume) * factor + 1e-9) / factor
+
+    def min_volume(self, market, price=None):
+        """最小下單量：min_base_amount 與 min_quote_amount / price 取大者。"""
+        info = self.get(market)
+        min_base = float(info.get('min_base_amount') or 0)
+        min_quote = float(info.get('min_quote_amount') or 0)
+        if price and min_quote:
+            return max(min_base, min_quote / float(price))
+        return min_base
@@ -11,10 +11,34 @@
 
 價格用「緩慢正弦波 + 小幅雜訊」模擬；測試時可用 set_price() 直接指定。
 """
+import functools
 import math
+import threading
 import time
 import random
 
+import requests
+
+from .markets import MarketCatalog
+
+
+def _api_error(status, message):
+    """比照 ClientV3：HTTP 錯誤包成一般 Exception，原始的 HTTPError 放在 __cause__。"""
+    response = requests.Response()
+    response.status_code = status
+    error = Exception(f"API請求失敗: {status} {message}")
+    error.__cause__ = requests.HTTPError(f"{status} Client Error", response=response)
+    return error
+
+
+def _locked(fn):
+    """模擬交易所的狀態（掛單、餘額）在多執行緒下一次只讓一個呼叫改動。"""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return fn(self, *args, **kwargs)
+    return wrapper
+
 
 class MockClientV3:
     # 各市場的基準價（TWD）
@@ -25,8 +49,18 @@ class MockClientV3:
         "soltwd": 5_400.0,
     }
 
+    # 各市場的價格精度（小數位數）與數量精度，格式同 /api/v3/markets
+    PRECISIONS = {
+        "btctwd": (0, 8),
+        "ethtwd": (0, 6),
+        "usdttwd": (3, 2),
+        "soltwd": (0, 4),
+    }
+
     def __init__(self, key=None, secret=None, timeout=30):
         self._t0 = time.time()
+        self._lock = threading.RLock()
+        self.markets = MarketCatalog(self.get_market_summary)
         # 模擬帳戶餘額
         self._balances = {
             "twd": 480_000.0,
@@ -90,10 +124,12 @@ class MockClientV3:
                 o["state"] = "done"
 
     # --- 測試輔助（真實 API 沒有，僅供 DEMO/測試驅動）---
+    @_locked
     def set_price(self, market, price):
         """直接指定某市場現價；傳 None 還原為正弦波。"""
         self._forced_price[market.lower()] = price
 
+    @_locked
     def set_partial_next(self, order_id, ratio):
         """讓某張單下次結算只成交 ratio 比例（測試部分成交）。"""
         self._partial_ratio[order_id] = ratio
@@ -104,15 +140,8 @@ class MockClientV3:
 
     # --- 委託簿 / tick ---
     def tick_size(self, market):
-        """依價位量級回傳最小跳動單位（模擬用，非真實 MAX 精度）。"""
-        p = self._price(market)
-        if p >= 1000:
-            return 1.0
-        if p >= 100:
-            return 0.5
-        if p >= 10:
-            return 0.05
-        return 0.01
+        """最小跳動單位，與 ClientV3 一樣由市場精度目錄提供。"""
+        return self.markets.tick_size(market)
 
     def get_depth(self, market, limit=1):
         """回傳模擬委託簿最佳買賣價（買一/賣一各偏離中價 _spread_ticks 個 tick）。"""
@@ -126,7 +155,13 @@ class MockClientV3:
 
     # --- 市場行情 API ---
     def get_market_summary(self):
-        return [{"id": m, "base_unit": m[:-3], "quote_unit": "twd"} for m in self.BASE_PRICES]
+        return [{
+            "id": m, "status": "active",
+            "base_unit": m[:-3], "base_unit_precision": self.PRECISIONS.get(m, (2, 8))[1],
+            "min_base_amount": 0.0,
+            "quote_unit": "twd", "quote_unit_precision": self.PRECISIONS.get(m, (2, 8))[0],
+            "min_quote_amount": 250.0,
+        } for m in self.BASE_PRICES]
 
     def get_trades(self, market, limit=1):
         price = self._price(market)
@@ -140,6 +175,7 @@ class MockClientV3:
         }]
 
     # --- 帳戶 API ---
+    @_locked
     def get_account_balance(self, wallet_type="spot"):
         return [
             {"currency": cur, "balance": str(round(bal, 10)), "locked": "0"}
@@ -150,10 +186,14 @@ class MockClientV3:
         return []
 
     # --- 交易 API ---
-    def create_order(self, market, side, volume, price=None, order_type="market", wallet_type="spot"):
+    @_locked
+    def create_order(self, market, side, volume, price=None, order_type="market", wallet_type="spot",
+                     group_id=None, client_oid=None):
         market = market.lower()
         side = side.lower()
         volume = float(volume)
+        if client_oid is not None and any(o.get("client_oid") == client_oid for o in self._orders.values()):
+            raise _api_error(422, f"client_oid {client_oid} already exists")
         oid = self._next_id
         self._next_id += 1
         order = {
@@ -168,6 +208,8 @@ class MockClientV3:
             "remaining_volume": volume,
             "state": "wait",
             "created_at": int(time.time()),
+            "group_id": group_id,
+            "client_oid": client_oid,
         }
         self._orders[oid] = order
 
@@ -187,17 +229,45 @@ class MockClientV3:
             order["avg_price"] = str(cur)
         return dict(order)
 
+    @_locked
     def cancel_order(self, order_id, wallet_type="spot"):
         o = self._orders.get(int(order_id))
         if o and o["state"] == "wait":
             o["state"] = "cancel"
         return dict(o) if o else {"id": order_id, "state": "cancel"}
 
+    @_locked
+    def cancel_orders(self, market=None, side=None, group_id=None, wallet_type="spot"):
+        """批次撤單：依市場/方向/群組篩選 wait 單，回傳被撤的單。"""
+        cancelled = []
+        for o in self._orders.values():
+            if o["state"] != "wait":
+                continue
+            if market and o["market"] != market.lower():
+                continue
+            if side and o["side"] != side.lower():
+                continue
+            if group_id is not None and o["group_id"] != int(group_id):
+                continue
+            o["state"] = "cancel"
+            cancelled.append(dict(o))
+        return cancelled
+
+    @_locked
     def get_order(self, order_id, wallet_type="spot"):
         self._settle()
         o = self._orders.get(int(order_id))
         return dict(o) if o else {"id": order_id, "state": "cancel"}
 
+    @_locked
+    def get_order_by_client_oid(self, client_oid):
+        self._settle()
+        for o in self._orders.values():
+            if o.get("client_oid") == client_oid:
+                return dict(o)
+        raise _api_error(404, f"order not found (client_oid={client_oid})")
+
+    @_locked
     def get_orders(self, market, state="wait", wallet_type="spot"):
         self._settle()
         return [
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""MAX 簽章用的 nonce 產生器。
+
+原本兩個 client 都直接拿「牆上時鐘毫秒」當 nonce，兩個執行緒（或兩個 gunicorn
+worker）在同一毫秒簽章就會撞號，交易所回 2006 "nonce has already been used"。
+
+這裡保證同一把 API key 的 nonce：
+- 跨執行緒嚴格遞增：process 內以 lock 序列化；
+- 跨 process 嚴格遞增：以檔案鎖（fcntl.flock）保護一個記錄「上次發出 nonce」的狀態檔；
+  沒有 fcntl 的平台（Windows）退回只保證 process 內遞增；
+- 以交易所時間校正：`align()` 記錄本機與伺服器的時差，nonce = 本機毫秒 + 時差，
+  若同一毫秒已發過號就取「上次 + 1」。
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:          # Windows：只能保證 process 內遞增
+    fcntl = None
+
+# 伺服器時間只有秒級解析度，時差在此範圍內視為誤差、不校正
+_ALIGN_TOLERANCE_MS = 1000
+# 多久重新對時一次（秒）
+RESYNC_INTERVAL = 3600
+# 狀態檔內 nonce 的固定寬度（位數）
+_STATE_WIDTH = 20
+
+
+class NonceGenerator(object):
+    def __init__(self, state_path=None):
+        """
+        :param state_path: 跨 process 共用的狀態檔路徑；None 表示只在 process 內遞增
+        """
+        self._state_path = state_path
+        self._lock = threading.Lock()
+        self._last = 0
+        self._offset_ms = 0
+        self._synced_at = 0.0
+        self._fd = None
+        self._fd_pid = None
+
+    @property
+    def offset_ms(self):
+        return self._offset_ms
+
+    def needs_sync(self):
+        return time.time() - self._synced_at > RESYNC_INTERVAL
+
+    def align(self, server_time, sent_at=None, received_at=None):
+        """依交易所時間校正時差。
+
+        :param server_time: 伺服器時間（秒或毫秒皆可，小於 1e12 視為秒）
+        :param sent_at / received_at: 送出與收到回應時的本機 time.time()，用中點估計
+        """
+        server_ms = float(server_time)
+        if server_ms < 1e12:
+            server_ms *= 1000
+        now = time.time()
+        sent_at = now if sent_at is None else sent_at
+        received_at = now if received_at is None else received_at
+        local_ms = (sent_at + received_at) / 2 * 1000
+        offset = int(server_ms - local_ms)
+        with self._lock:
+            self._offset_ms = offset if abs(offset) > _ALIGN_TOLERANCE_MS else 0
+            self._synced_at = time.time()
+        return self._offset_ms
+
+    def mark_synced(self):
+        """對時失敗時也記錄時間，避免每個請求都重試對時。"""
+        with self._lock:
+            self._synced_at = time.time()
+
+    def next(self):
+        """回傳下一個 nonce（毫秒整數），保證大於先前發出的任何值。"""
+        with self._lock:
+            candidate = int(time.time() * 1000) + self._offset_ms
+            if self._state_path and fcntl is not None:
+                nonce = self._next_shared(candidate)
+            else:
+                nonce = max(candidate, self._last + 1)
+            self._last = nonce
+            return nonce
+
+    def _next_shared(self, candidate):
+        # 狀態檔固定寫 20 位數字（pwrite 覆寫，不做 truncate），fd 常駐避免每次開檔。
+        # fork 後子 process 要重開 fd，否則 flock 與父 process 共用同一把鎖、互斥失效。
+        if self._fd is None or self._fd_pid != os.getpid():
+            self._fd = os.open(self._state_path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._fd_pid = os.getpid()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            raw = os.pread(self._fd, _STATE_WIDTH, 0).strip()
+            try:
+                last = int(raw) if raw else 0
+            except ValueError:
+                last = 0
+            nonce = max(candidate, last + 1, self._last + 1)
+            os.pwrite(self._fd, str(nonce).zfill(_STATE_WIDTH).encode(), 0)
+            return nonce
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+_generators = {}
+_generators_lock = threading.Lock()
+
+
+def _state_path_for(api_key):
+    directory = os.getenv('MAX_NONCE_DIR') or tempfile.gettempdir()
+    digest = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, f"max_nonce_{digest}.state")
+
+
+def get_nonce_generator(api_key):
+    """同一把 API key 在 process 內共用同一個產生器，並跨 process 共用狀態檔。"""
+    with _generators_lock:
+        generator = _generators.get(api_key)
+        if generator is None:
+            generator = NonceGenerator(_state_path_for(api_key))
+            _generators[api_key] = generator
+        return generator
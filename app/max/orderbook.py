@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""本機維護的 L2 委託簿（snapshot + 增量更新 + 序號缺口偵測）。
+
+價位以排序好的 list 搭配 bisect 維護，買方由高到低、賣方由低到高；
+每個價位一筆數量，數量為 0 代表刪除該價位。
+
+MAX book 頻道每則訊息帶 fi（first update id）與 li（last update id）：
+snapshot 之後的第一則 update 必須 fi <= li_prev + 1 <= li；之後每則都要
+fi == li_prev + 1，否則代表漏收訊息，委託簿標為失效，等待重新訂閱的 snapshot。
+"""
+import bisect
+import threading
+import time
+
+
+class _Side(object):
+    """單邊價位：keys 為排序鍵（買方用負價，讓兩邊都由最優價排起）。"""
+
+    def __init__(self, descending):
+        self._sign = -1 if descending else 1
+        self._keys = []
+        self._volumes = {}
+
+    def clear(self):
+        self._keys = []
+        self._volumes = {}
+
+    def set(self, price, volume):
+        key = self._sign * price
+        if volume <= 0:
+            if key in self._volumes:
+                del self._volumes[key]
+                i = bisect.bisect_left(self._keys, key)
+                del self._keys[i]
+            return
+        if key not in self._volumes:
+            bisect.insort(self._keys, key)
+        self._volumes[key] = volume
+
+    def best(self):
+        if not self._keys:
+            return None
+        key = self._keys[0]
+        return self._sign * key, self._volumes[key]
+
+    def levels(self, n=None):
+        keys = self._keys if n is None else self._keys[:n]
+        return [(self._sign * k, self._volumes[k]) for k in keys]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class OrderBook(object):
+    def __init__(self, market):
+        self.market = market
+        self._bids = _Side(descending=True)
+        self._asks = _Side(descending=False)
+        self._lock = threading.Lock()
+        self.last_id = None        # 最後套用的 update id（li）
+        self.synced = False        # 是否有有效的 snapshot 且未出現缺口
+        self.updated_at = 0.0
+        self.gaps = 0              # 偵測到的序號缺口次數
+
+    @staticmethod
+    def _levels(rows):
+        return [(float(p), float(v)) for p, v in rows or []]
+
+    def apply_snapshot(self, bids, asks, last_id=None):
+        with self._lock:
+            self._bids.clear()
+            self._asks.clear()
+            for p, v in self._levels(bids):
+                self._bids.set(p, v)
+            for p, v in self._levels(asks):
+                self._asks.set(p, v)
+            self.last_id = last_id
+            self.synced = True
+            self.updated_at = time.time()
+
+    def apply_update(self, bids, asks, first_id=None, last_id=None):
+        """套用增量；序號不連續時回傳 False 並把委託簿標為失效。"""
+        with self._lock:
+            if not self.synced:
+                return False
+            if first_id is not None and self.last_id is not None:
+                if last_id is not None and last_id <= self.last_id:
+                    return True        # 舊訊息（snapshot 已包含），略過
+                if first_id > self.last_id + 1:
+                    self.synced = False
+                    self.gaps += 1
+                    return False
+            for p, v in self._levels(bids):
+                self._bids.set(p, v)
+            for p, v in self._levels(asks):
+                self._asks.set(p, v)
+            if last_id is not None:
+                self.last_id = last_id
+            self.updated_at = time.time()
+            return True
+
+    def invalidate(self):
+        with self._lock:
+            self.synced = False
+
+    def best_bid(self):
+        with self._lock:
+            best = self._bids.best()
+        return best[0] if best else None
+
+    def best_ask(self):
+        with self._lock:
+            best = self._asks.best()
+        return best[0] if best else None
+
+    def top(self, n=1):
+        """回傳 get_depth 相同格式的前 n 檔：{"bids": [[p, v]...], "asks": [...]}。"""
+        with self._lock:
+            return {
+                "bids": [[p, v] for p, v in self._bids.levels(n)],
+                "asks": [[p, v] for p, v in self._asks.levels(n)],
+            }
+
+    def depth(self):
+        with self._lock:
+            return len(self._bids), len(self._asks)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""v2 分頁端點的串流式迭代（預取後續頁 + 已完成頁的磁碟快取）。
+
+舊版 Client 的歷史查詢（成交、委託、入金、出金）每次只回一頁，
+呼叫端得自己一頁一頁迴圈。iter_pages() 改成 generator：
+
+- 依序 yield 每筆記錄，呼叫端不必處理頁碼；
+- 同時預先送出後面 prefetch 頁的請求（仍受 rate_limit 的 bucket 約束）；
+- 遇到筆數不足一頁即視為最後一頁，多預取的頁直接丟棄；
+- 「不會再變」的頁（由 is_immutable 判斷，例如升冪排序下已滿的一頁成交）
+  寫入磁碟快取，下次重建歷史時直接讀檔，不再打 API。
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PREFETCH = 4
+
+
+def default_cache_dir():
+    return os.getenv('MAX_PAGE_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'max_page_cache')
+
+
+class PageCache(object):
+    """以 (查詢條件, 頁碼) 為鍵的 JSON 檔快取；只存呼叫端判定為不可變的頁。"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts):
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _path(self, key, page):
+        return os.path.join(self.directory, f"{key}_{page}.json")
+
+    def get(self, key, page):
+        try:
+            with open(self._path(key, page), 'r', encoding='utf-8') as f:
+                rows = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return rows
+
+    def put(self, key, page, rows):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key, page)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+        os.replace(tmp, path)      # 原子替換，並行寫同一頁也不會讀到半個檔
+
+
+def iter_pages(fetch_page, limit, prefetch=DEFAULT_PREFETCH, cache=None, cache_key=None,
+               is_immutable=None, max_pages=None):
+    """逐筆 yield 分頁資料。
+
+    :param fetch_page: callable(page) -> list，頁碼從 1 開始
+    :param limit: 每頁筆數；回傳筆數少於 limit 即為最後一頁
+    :param prefetch: 同時在途的頁數（1 = 依序抓取）
+    :param cache: PageCache；None 表示不使用磁碟快取
+    :param cache_key: 查詢條件的快取鍵（PageCache.make_key 產生）
+    :param is_immutable: callable(rows) -> bool，判斷該頁是否可寫入快取
+    :param max_pages: 最多讀幾頁（None = 讀到最後一頁）
+    """
+    use_cache = cache is not None and cache_key is not None
+
+    def load(page):
+        if use_cache:
+            rows = cache.get(cache_key, page)
+            if rows is not None:
+                return rows
+        rows = fetch_page(page) or []
+        if use_cache and is_immutable is not None and is_immutable(rows):
+            cache.put(cache_key, page, rows)
+        return rows
+
+    prefetch = max(1, int(prefetch))
+    pool = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="max-page")
+    pending = deque()
+    next_page = 1
+
+    def submit():
+        nonlocal next_page
+        if max_pages is not None and next_page > max_pages:
+            return
+        pending.append(pool.submit(load, next_page))
+        next_page += 1
+
+    try:
+        for _ in range(prefetch):
+            submit()
+        while pending:
+            rows = pending.popleft().result()
+            for row in rows:
+                yield row
+            if len(rows) < limit:
+                break
+            submit()
+    finally:
+        # 讀完或呼叫端提早結束：取消還沒開始的預取
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
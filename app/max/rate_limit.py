@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""MAX API 用戶端限流（token bucket + 端點權重 + 429/5xx 自適應退避）。
+
+多個策略同時重掛 maker 單時，短時間內的請求量很容易撞到交易所的限流，
+一旦回 429，整輪 MakerOrderManager.sync 就會失敗。這裡在送出請求前先向
+對應的 bucket 取 token：
+
+- public / private 兩個 bucket 分開計算（行情查詢不會吃掉下單的額度）；
+- 每個端點有權重（例如批次撤單比單筆查詢重），預設 1；
+- 收到 429 時清空 bucket 並依 Retry-After（或指數退避）暫停該 bucket；
+  收到 5xx 時只做較短的退避；之後成功一次就重置退避級數；
+- stats() 回傳各 bucket 的請求數、等待次數/秒數、429 次數與水位，
+  用來觀察平常離上限有多近。
+
+限流狀態是 process 內共用的（get_shared_rate_limiter），同一把 key 的
+所有 client 共用同一組 bucket。
+"""
+import os
+import threading
+import time
+
+DEFAULT_PUBLIC_RATE = 20.0      # 每秒補充的 token 數
+DEFAULT_PUBLIC_BURST = 40       # bucket 容量（可瞬間爆發的請求數）
+DEFAULT_PRIVATE_RATE = 10.0
+DEFAULT_PRIVATE_BURST = 20
+
+BACKOFF_BASE = 1.0              # 429 第一次退避秒數，之後每次加倍
+BACKOFF_MAX = 60.0
+SERVER_ERROR_BACKOFF = 0.5      # 5xx 的退避基準（較 429 溫和）
+
+# 端點權重：路徑包含 key 即套用，取最大者；其餘端點權重為 1。
+# v2 傳 endpoint（orders/clear）；v3 路徑相同但方法不同的端點（例如 DELETE 批次撤單）
+# 由呼叫端在 acquire 時直接指定 weight。
+DEFAULT_WEIGHTS = {
+    'orders/clear': 5,          # 批次撤單
+    'orders/multi': 5,          # v2 批次下單
+    'orders/history': 3,
+    'depth': 2,
+}
+
+
+class RateLimitTimeout(Exception):
+    """在指定時間內等不到足夠的 token。"""
+
+
+def _parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket(object):
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._strikes = 0
+        self._lock = threading.Lock()
+        # 觀察用計數
+        self.requests = 0
+        self.weight_used = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0          # 收到 429 的次數
+        self.server_errors = 0      # 收到 5xx 的次數
+        self._low_water = float(capacity)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self, weight=1, timeout=None):
+        """取 weight 個 token，不夠就等；回傳等待秒數。逾時 raise RateLimitTimeout。"""
+        weight = min(float(weight), self.capacity)
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        slept = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                blocked = self._blocked_until - now
+                if blocked <= 0 and self._tokens >= weight:
+                    self._tokens -= weight
+                    self._low_water = min(self._low_water, self._tokens)
+                    waited = now - started if slept else 0.0
+                    self.requests += 1
+                    self.weight_used += weight
+                    if slept:
+                        self.waits += 1
+                        self.wait_seconds += waited
+                    return waited
+                need = max(blocked, (weight - self._tokens) / self.rate)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimitTimeout(f"{self.name} 限流等待逾時")
+                need = min(need, remaining)
+            time.sleep(need)
+            slept = True
+
+    def backoff(self, retry_after=None, server_error=False):
+        """收到 429/5xx：暫停此 bucket 一段時間，回傳暫停秒數。"""
+        with self._lock:
+            self._strikes += 1
+            base = SERVER_ERROR_BACKOFF if server_error else BACKOFF_BASE
+            delay = min(base * 2 ** (self._strikes - 1), BACKOFF_MAX)
+            if retry_after is not None and not server_error:
+                delay = max(delay, retry_after)
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + delay)
+            if server_error:
+                self.server_errors += 1
+            else:
+                self.throttled += 1
+                self._tokens = 0.0      # 交易所說滿了，本機的估計不可信
+                self._updated = now
+            return delay
+
+    def recover(self):
+        with self._lock:
+            self._strikes = 0
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'available': round(self._tokens, 3),
+                'utilization': round(1 - self._tokens / self.capacity, 4),
+                'peak_utilization': round(1 - self._low_water / self.capacity, 4),
+                'requests': self.requests,
+                'weight_used': self.weight_used,
+                'waits': self.waits,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'throttled': self.throttled,
+                'server_errors': self.server_errors,
+                'backoff_remaining': round(max(0.0, self._blocked_until - time.monotonic()), 3),
+            }
+
+
+class RateLimiter(object):
+    def __init__(self, public_rate=DEFAULT_PUBLIC_RATE, public_burst=DEFAULT_PUBLIC_BURST,
+                 private_rate=DEFAULT_PRIVATE_RATE, private_burst=DEFAULT_PRIVATE_BURST,
+                 weights=None):
+        self.buckets = {
+            'public': TokenBucket('public', public_rate, public_burst),
+            'private': TokenBucket('private', private_rate, private_burst),
+        }
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+
+    def weight(self, path):
+        matched = [w for key, w in self.weights.items() if key in path]
+        return max(matched) if matched else 1
+
+    def acquire(self, scope, path, timeout=None, weight=None):
+        """送出請求前呼叫；回傳等待秒數。weight 為 None 時依路徑查表。"""
+        if weight is None:
+            weight = self.weight(path)
+        return self.buckets[scope].acquire(weight, timeout=timeout)
+
+    def on_response(self, scope, status, retry_after=None):
+        """依回應狀態調整退避；回傳暫停秒數（0 表示正常）。"""
+        bucket = self.buckets[scope]
+        if status == 429:
+            return bucket.backoff(_parse_retry_after(retry_after))
+        if status is not None and status >= 500:
+            return bucket.backoff(server_error=True)
+        bucket.recover()
+        return 0.0
+
+    def stats(self):
+        return {name: bucket.stats() for name, bucket in self.buckets.items()}
+
+
+_shared_lock = threading.Lock()
+_shared_limiter = None
+
+
+def configure_shared_rate_limiter(**kwargs):
+    """以指定參數重建 process 內共用的限流器並回傳。"""
+    global _shared_limiter
+    with _shared_lock:
+        _shared_limiter = RateLimiter(**kwargs)
+        return _shared_limiter
+
+
+def get_shared_rate_limiter():
+    """取得 process 內共用的限流器（第一次呼叫時依環境變數建立）。"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            public_rate = float(os.getenv('MAX_RATE_PUBLIC', DEFAULT_PUBLIC_RATE))
+            private_rate = float(os.getenv('MAX_RATE_PRIVATE', DEFAULT_PRIVATE_RATE))
+            # 容量取兩秒的量，允許短暫爆發
+            _shared_limiter = RateLimiter(
+                public_rate=public_rate, public_burst=max(1, public_rate * 2),
+                private_rate=private_rate, private_burst=max(1, private_rate * 2),
+            )
+        return _shared_limiter
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""ClientV3 共用的 HTTP 傳輸層。
+
+原本每次 `_make_request` 都呼叫模組層級的 `requests.get` / `requests.request`，
+每個請求都要重新做一次 TCP + TLS 握手。這裡改用 `requests.Session`：
+- 連線池（pool_connections / pool_maxsize）＋ keep-alive，同一 process 內所有策略共用；
+- 每次呼叫可覆寫 timeout；
+- 這一層只重試「連線建立失敗」（請求根本沒送出，任何方法重送都安全）。
+  讀取逾時與 502/503/504 不在這裡重試：簽章請求的 nonce 固定在 prepared request 裡，
+  原封不動重送會撞到 nonce 已使用（2006），也會繞過限流器與 HTTP 統計；
+  這類重試由 ClientV3._make_request 重新簽章、重新取 token 後處理（只限 GET）。
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 32
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.3
+
+
+class HttpTransport(object):
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF):
+        """
+        :param pool_connections: 連線池數量（不同 host 各一個池）
+        :param pool_maxsize: 單一 host 同時保留的最大連線數（>= 同時執行的策略數）
+        :param timeout: 預設逾時秒數，可在 request() 逐次覆寫
+        :param retries: 連線建立失敗的重試次數（讀取逾時與 5xx 不重試）
+        :param backoff_factor: 重試間隔的指數退避係數
+        """
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=backoff_factor,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, headers=None, data=None, timeout=None):
+        """送出請求並回傳 `requests.Response`；timeout 為 None 時用預設值。"""
+        return self.session.request(
+            method=method,
+            url=url,
+            headers=headers,
+            data=data,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+
+    def close(self):
+        self.session.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_transport():
+    """回傳 process 內共用的 transport（第一次呼叫時建立）。"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpTransport()
+        return _shared
+
+
+def configure_shared_transport(**kwargs):
+    """以指定參數重建共用 transport（例如策略很多時調大 pool_maxsize）。
+
+    應在建立任何 ClientV3 之前呼叫；已建立的 client 仍持有舊的 transport。
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.close()
+        _shared = HttpTransport(**kwargs)
+        return _shared
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""MAX WebSocket 私有頻道（訂單/成交即時推播）。
+
+原本 maker 掛單是否成交，只能等下一次輪詢 get_order（前端每 60 秒觸發一次）。
+這裡以 API key 認證後訂閱 order / trade 事件，收到時立即通知監聽者，
+讓成交記錄與重掛在毫秒級完成；輪詢保留為定期的安全網。
+
+    stream = UserDataStream(key, secret)
+    stream.add_listener(lambda kind, data: ...)   # kind: "order" | "trade"
+    stream.start()
+
+order 事件會轉成與 REST get_order 相同的欄位（id / market / side / price /
+avg_price / volume / executed_volume / remaining_volume / state ...），
+監聽者可以沿用既有的對帳邏輯。
+
+認證與事件格式（節錄）：
+  送出 {"action":"auth","apiKey":..,"nonce":..,"signature":hmac_sha256(secret, str(nonce)),
+        "id":..,"filters":["order","trade"]}
+  收到 {"c":"user","e":"order_snapshot"|"order_update","o":[{"i":..,"M":..,"sd":..,"p":..,
+        "ap":..,"v":..,"ev":..,"rv":..,"S":..,"ci":..,"gi":..,"TU":..}]}
+       {"c":"user","e":"trade_snapshot"|"trade_update","t":[{"i":..,"oi":..,"M":..,"sd":..,
+        "p":..,"v":..,"fe":..,"fc":..,"m":..,"T":..}]}
+"""
+import hashlib
+import hmac
+import logging
+import threading
+
+from .market_stream import DEFAULT_URL, StreamRunner
+from .nonce import get_nonce_generator
+
+logger = logging.getLogger("max.user_stream")
+
+_ORDER_FIELDS = {
+    "i": "id", "M": "market", "sd": "side", "ot": "ord_type", "p": "price",
+    "sp": "stop_price", "ap": "avg_price", "v": "volume", "rv": "remaining_volume",
+    "ev": "executed_volume", "S": "state", "ci": "client_oid", "gi": "group_id",
+    "tc": "trades_count", "T": "created_at", "TU": "updated_at",
+}
+_TRADE_FIELDS = {
+    "i": "id", "oi": "order_id", "M": "market", "sd": "side", "p": "price", "v": "volume",
+    "fe": "fee", "fc": "fee_currency", "m": "maker", "T": "created_at",
+}
+
+
+def _rename(raw, fields):
+    return {fields[k]: v for k, v in raw.items() if k in fields}
+
+
+def normalize_order(raw):
+    """把串流的精簡欄位轉成 REST get_order 的欄位名稱。"""
+    return _rename(raw, _ORDER_FIELDS)
+
+
+def normalize_trade(raw):
+    return _rename(raw, _TRADE_FIELDS)
+
+
+class UserDataStream(StreamRunner):
+    thread_name = "max-user-stream"
+
+    def __init__(self, key, secret, url=DEFAULT_URL, filters=("order", "trade"),
+                 connect_timeout=10, idle_timeout=30, connector=None):
+        super().__init__(url, connect_timeout, idle_timeout, connector)
+        self._api_key = key
+        self._api_secret = secret
+        self._nonce = get_nonce_generator(key)
+        self.filters = list(filters)
+        self._listeners = []
+        self._listeners_lock = threading.Lock()
+        self.authenticated = threading.Event()
+        self.events = 0
+
+    def add_listener(self, callback):
+        """callback(kind, data)：kind 為 "order" 或 "trade"，data 為正規化後的 dict。"""
+        with self._listeners_lock:
+            self._listeners.append(callback)
+
+    def is_live(self):
+        """已連線且通過認證（此時事件會即時送達）。"""
+        return self.connected.is_set() and self.authenticated.is_set()
+
+    def _on_connect(self, conn):
+        nonce = self._nonce.next()
+        signature = hmac.new(
+            self._api_secret.encode(), str(nonce).encode(), hashlib.sha256
+        ).hexdigest()
+        self._send({
+            "action": "auth", "apiKey": self._api_key, "nonce": nonce,
+            "signature": signature, "id": "rooster", "filters": self.filters,
+        })
+
+    def _on_disconnect(self):
+        self.authenticated.clear()
+
+    def _handle(self, msg):
+        event = msg.get("e")
+        if event == "authenticated":
+            self.authenticated.set()
+            logger.info("私有串流認證成功")
+            return
+        if event == "error":
+            logger.warning(f"私有串流錯誤: {msg.get('E')}")
+            return
+        if msg.get("c") != "user":
+            return
+        if event in ("order_snapshot", "order_update"):
+            for raw in msg.get("o") or []:
+                self._dispatch("order", normalize_order(raw))
+        elif event in ("trade_snapshot", "trade_update"):
+            for raw in msg.get("t") or []:
+                self._dispatch("trade", normalize_trade(raw))
+
+    def _dispatch(self, kind, data):
+        self.events += 1
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(kind, data)
+            except Exception as e:
+                # 單一監聽者出錯不影響串流與其他監聽者
+                logger.error(f"處理私有串流事件失敗: {e}")
+
+    def stats(self):
+        return {
+            "connected": self.connected.is_set(),
+            "authenticated": self.authenticated.is_set(),
+            "messages": self.messages,
+            "events": self.events,
+            "reconnects": self.reconnects,
+        }
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""極簡 WebSocket 用戶端（RFC 6455，僅標準函式庫）。
+
+requirements 裡沒有 websocket 套件，而行情串流只需要：握手、送文字訊息、
+收文字訊息、自動回 pong、處理 close。這裡只實作這些，不支援壓縮擴充。
+
+    conn = WebSocketConnection.connect("wss://max-stream.maicoin.com/ws", timeout=10)
+    conn.send_json({...})
+    msg = conn.recv_json()          # 逾時 raise socket.timeout，連線關閉 raise ConnectionClosed
+"""
+import base64
+import hashlib
+import json
+import os
+import socket
+import ssl
+import struct
+from urllib.parse import urlparse
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketError(Exception):
+    pass
+
+
+class ConnectionClosed(WebSocketError):
+    pass
+
+
+def encode_frame(opcode, payload, mask=True):
+    """組一個 FIN=1 的 frame；用戶端送出的 frame 必須 mask。"""
+    header = bytearray([0x80 | opcode])
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if not mask:
+        return bytes(header) + payload
+    key = os.urandom(4)
+    masked = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    return bytes(header) + key + masked
+
+
+def parse_frame(buf):
+    """從 buf 開頭解析一個 frame；資料不足回傳 None，否則 (fin, opcode, payload, 已用位元組)。"""
+    if len(buf) < 2:
+        return None
+    b0, b1 = buf[0], buf[1]
+    fin = bool(b0 & 0x80)
+    opcode = b0 & 0x0F
+    masked = bool(b1 & 0x80)
+    length = b1 & 0x7F
+    pos = 2
+    if length == 126:
+        if len(buf) < pos + 2:
+            return None
+        length = struct.unpack("!H", bytes(buf[pos:pos + 2]))[0]
+        pos += 2
+    elif length == 127:
+        if len(buf) < pos + 8:
+            return None
+        length = struct.unpack("!Q", bytes(buf[pos:pos + 8]))[0]
+        pos += 8
+    key = None
+    if masked:
+        if len(buf) < pos + 4:
+            return None
+        key = bytes(buf[pos:pos + 4])
+        pos += 4
+    if len(buf) < pos + length:
+        return None
+    payload = bytes(buf[pos:pos + length])
+    if key:
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    return fin, opcode, payload, pos + length
+
+
+class WebSocketConnection(object):
+    def __init__(self, sock):
+        self.sock = sock
+        self._buf = bytearray()
+        self._fragments = []
+        self._fragment_opcode = None
+        self.closed = False
+
+    @classmethod
+    def connect(cls, url, timeout=10, headers=None):
+        parsed = urlparse(url)
+        secure = parsed.scheme == "wss"
+        host = parsed.hostname
+        port = parsed.port or (443 if secure else 80)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+
+        sock = socket.create_connection((host, port), timeout=timeout)
+        try:
+            if secure:
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=host)
+            key = base64.b64encode(os.urandom(16)).decode()
+            lines = [
+                f"GET {path} HTTP/1.1",
+                f"Host: {host}:{port}",
+                "Upgrade: websocket",
+                "Connection: Upgrade",
+                f"Sec-WebSocket-Key: {key}",
+                "Sec-WebSocket-Version: 13",
+            ]
+            for name, value in (headers or {}).items():
+                lines.append(f"{name}: {value}")
+            sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode())
+
+            response = b""
+            while b"\r\n\r\n" not in response:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    raise WebSocketError("握手期間連線被關閉")
+                response += chunk
+            head, rest = response.split(b"\r\n\r\n", 1)
+            status_line, *header_lines = head.decode("latin-1").split("\r\n")
+            if " 101 " not in status_line + " ":
+                raise WebSocketError(f"握手失敗: {status_line}")
+            received = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                received[name.strip().lower()] = value.strip()
+            expected = base64.b64encode(
+                hashlib.sha1((key + _GUID).encode()).digest()
+            ).decode()
+            if received.get("sec-websocket-accept") != expected:
+                raise WebSocketError("Sec-WebSocket-Accept 不符")
+        except Exception:
+            sock.close()
+            raise
+        conn = cls(sock)
+        conn._buf += rest
+        return conn
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def _send(self, opcode, payload):
+        if self.closed:
+            raise ConnectionClosed("連線已關閉")
+        self.sock.sendall(encode_frame(opcode, payload))
+
+    def send_text(self, text):
+        self._send(OP_TEXT, text.encode("utf-8"))
+
+    def send_json(self, obj):
+        self.send_text(json.dumps(obj))
+
+    def ping(self, payload=b""):
+        self._send(OP_PING, payload)
+
+    def recv(self):
+        """收下一則文字/二進位訊息（自動處理 ping/pong/分段）。"""
+        while True:
+            frame = parse_frame(self._buf)
+            if frame is None:
+                chunk = self.sock.recv(65536)   # 逾時 raise socket.timeout，已收資料保留在 buffer
+                if not chunk:
+                    self.closed = True
+                    raise ConnectionClosed("對方關閉連線")
+                self._buf += chunk
+                continue
+            fin, opcode, payload, used = frame
+            del self._buf[:used]
+
+            if opcode == OP_PING:
+                self._send(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                try:
+                    self._send(OP_CLOSE, payload[:2])
+                except OSError:
+                    pass
+                self.closed = True
+                raise ConnectionClosed("收到 close frame")
+
+            if opcode in (OP_TEXT, OP_BINARY):
+                self._fragment_opcode = opcode
+                self._fragments = [payload]
+            elif opcode == OP_CONT:
+                self._fragments.append(payload)
+            if not fin:
+                continue
+            data = b"".join(self._fragments)
+            self._fragments = []
+            if self._fragment_opcode == OP_TEXT:
+                return data.decode("utf-8")
+            return data
+
+    def recv_json(self):
+        return json.loads(self.recv())
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._send(OP_CLOSE, struct.pack("!H", 1000))
+            except OSError:
+                pass
+            self.closed = True
+        try:
+            self.sock.close()
+        except OSError:
+            pass
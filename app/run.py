@@ -10,7 +10,7 @@ sys.path.append(current_dir)
 
 from frontend.app import app
 from backend.services.telegram_bot import bot_service
-from frontend.app import hedge_monitor
+from frontend.app import hedge_monitor, WEB_ONLY
 
 def cleanup():
     """清理資源"""
@@ -19,17 +19,19 @@ def cleanup():
     hedge_monitor.stop_collector()
 
 if __name__ == '__main__':
-    # 註冊清理函數
-    atexit.register(cleanup)
-    
-    # 啟動Telegram Bot服務
-    try:
-        bot_service.start()
-        hedge_monitor.start_collector(int(os.getenv('HEDGE_POLL_INTERVAL', '60')))
-        print("Telegram Bot服務已啟動")
-    except Exception as e:
-        print(f"啟動Telegram Bot服務失敗: {e}")
-        sys.exit(1)
+    # 策略交由獨立執行程序時，Telegram Bot 與收集器由 runner.py 啟動
+    if not WEB_ONLY:
+        # 註冊清理函數
+        atexit.register(cleanup)
+
+        # 啟動Telegram Bot服務
+        try:
+            bot_service.start()
+            hedge_monitor.start_collector(int(os.getenv('HEDGE_POLL_INTERVAL', '60')))
+            print("Telegram Bot服務已啟動")
+        except Exception as e:
+            print(f"啟動Telegram Bot服務失敗: {e}")
+            sys.exit(1)
     
     # 啟動Flask應用，禁用重載功能
     app.run(host='0.0.0.0', debug=False, port=5003, use_reloader=False,threaded=True)
@@ -0,0 +1,60 @@
+"""策略執行程序入口（搭配 ROOSTER_RUNNER=external 的 web worker 使用）。
+
+策略、WebSocket 串流、策略排程、Telegram Bot 與背景巡檢全部在這個 process 執行；
+gunicorn 的 web worker 只處理 HTTP，透過 SQLite 指令通道（ROOSTER_RUNNER_DB）與這裡溝通，
+因此 web worker 可以依流量開多個，不會重複交易。
+
+執行（從 app 目錄，或以 launchd/systemd 常駐）：
+  python runner.py
+  ROOSTER_RUNNER=external gunicorn --config gunicorn.conf.py wsgi:application
+"""
+import os
+import sys
+import signal
+
+# 添加專案根目錄到 Python 路徑
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, current_dir)
+sys.path.insert(0, project_root)
+
+# 必須在載入 frontend.app 之前設定：建立策略與背景服務，但不對外提供 HTTP
+os.environ['ROOSTER_RUNNER'] = 'runner'
+
+from frontend import app as web
+from backend.services.telegram_bot import bot_service
+from backend.services.strategy_runner import StrategyRunner
+
+
+def main():
+    runner = StrategyRunner(
+        web.strategy_manager,
+        web.runner_channel,
+        status_sources={
+            'scheduler': web.scheduler_payload,
+            'market_stream': web.market_stream_payload,
+        },
+        snapshot_interval=float(os.getenv('ROOSTER_RUNNER_SNAPSHOT', '15')),
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: runner.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: runner.stop())
+
+    try:
+        bot_service.start()
+        web.hedge_monitor.start_collector(int(os.getenv('HEDGE_POLL_INTERVAL', '60')))
+        print("Telegram Bot服務已啟動")
+    except Exception as e:
+        print(f"啟動Telegram Bot服務失敗: {e}")
+
+    try:
+        runner.serve_forever()
+    finally:
+        print("正在停止策略執行程序...")
+        if web.strategy_scheduler is not None:
+            web.strategy_scheduler.stop()
+        bot_service.stop()
+        web.hedge_monitor.stop_collector()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@ sys.path.insert(0, project_root)
 # 設置 PYTHONPATH 環境變數
 os.environ['PYTHONPATH'] = f"{current_dir}:{project_root}"
 
-from frontend.app import app, hedge_monitor
+from frontend.app import app, hedge_monitor, WEB_ONLY
 from backend.services.telegram_bot import bot_service
 
 def cleanup():
@@ -20,16 +20,19 @@ def cleanup():
     bot_service.stop()
     hedge_monitor.stop_collector()
 
-# 註冊清理函數
-atexit.register(cleanup)
-
-# 啟動Telegram Bot服務
-try:
-    bot_service.start()
-    hedge_monitor.start_collector(int(os.getenv('HEDGE_POLL_INTERVAL', '60')))
-    print("Telegram Bot服務已啟動")
-except Exception as e:
-    print(f"啟動Telegram Bot服務失敗: {e}")
+# 策略交由獨立執行程序（ROOSTER_RUNNER=external）時，Telegram Bot 與收集器由 runner.py 啟動，
+# 每個 web worker 都啟動的話會重複輪詢 Telegram
+if not WEB_ONLY:
+    # 註冊清理函數
+    atexit.register(cleanup)
+
+    # 啟動Telegram Bot服務
+    try:
+        bot_service.start()
+        hedge_monitor.start_collector(int(os.getenv('HEDGE_POLL_INTERVAL', '60')))
+        print("Telegram Bot服務已啟動")
+    except Exception as e:
+        print(f"啟動Telegram Bot服務失敗: {e}")
 
 # 導出 application
 application = app
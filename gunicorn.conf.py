@@ -8,8 +8,12 @@ os.makedirs(_LOG_DIR, exist_ok=True)
 bind = "0.0.0.0:5003"
 
 # Worker 進程數量
-# 一般建議：(CPU核心數 * 2) + 1
-workers = 1
+# 策略在 web process 內執行（預設 ROOSTER_RUNNER=inline）時只能開 1 個，否則會重複交易；
+# 改由 app/runner.py 獨立執行（ROOSTER_RUNNER=external）後可依流量調整，一般建議：(CPU核心數 * 2) + 1
+if os.getenv("ROOSTER_RUNNER", "inline").lower() == "external":
+    workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+else:
+    workers = 1
 
 # Worker 類型
 worker_class = "sync"
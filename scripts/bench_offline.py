@@ -0,0 +1,134 @@
+"""離線基準測試：以 HTTP cassette 重播交易所回應，量測主要路徑的耗時。
+
+量測對象：
+  - StrategyManager.execute_all_strategies（策略一輪）
+  - /api/hedge-connections/positions 合約部位（perp_positions_api）
+  - FundingCollector.collect_once（資金費率採集）
+
+先在有網路的機器上錄一次。錄製時策略一輪會真的掛單/撤單，必須用測試或子帳戶，
+並以 --test-account 明確確認，否則拒絕錄製：
+    ROOSTER_CASSETTE_MODE=record ../.venv/bin/python scripts/bench_offline.py cassette.json.gz --test-account
+之後在任何機器上離線重播（延遲預設照錄製時耗時，可用 --latency 指定固定毫秒數）：
+    ../.venv/bin/python scripts/bench_offline.py cassette.json.gz --rounds 20 --latency 30
+
+所有會寫入的資料都改到暫存目錄，不影響正式資料：
+  - 成交資料庫與 records 目錄（先複製一份正式的 trading.db 與舊 JSON 記錄作為起始狀態）；
+  - 設定目錄（複製 config/ 含策略設定，策略啟停或狀態更新只改到副本）；
+  - 資金費率與避險資料庫。
+"""
+import argparse
+import glob
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(os.path.dirname(HERE), "app")
+sys.path.insert(0, APP)
+
+
+def _timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max": samples[-1],
+    }
+
+
+def _isolate_data(tmp):
+    """把成交記錄、策略設定改指向 tmp 下的副本（正式檔案只讀不寫）。"""
+    from backend.utils import paths
+
+    records = os.path.join(tmp, "records")
+    os.makedirs(records)
+    source_records = paths.records_dir()
+    source_db = os.environ.get("ROOSTER_TRADE_DB") or os.path.join(source_records, "trading.db")
+    if os.path.exists(source_db):
+        # 以 SQLite backup 複製（WAL 模式下直接複製檔案可能漏掉未 checkpoint 的寫入）
+        source = sqlite3.connect(source_db)
+        target = sqlite3.connect(os.path.join(records, "trading.db"))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    for path in glob.glob(os.path.join(source_records, "*.json")):
+        shutil.copy2(path, records)
+    os.environ["ROOSTER_RECORDS_DIR"] = records
+    os.environ["ROOSTER_TRADE_DB"] = os.path.join(records, "trading.db")
+
+    config = os.path.join(tmp, "config")
+    shutil.copytree(paths.config_dir(), config)
+    os.environ["CONFIG_DIR"] = config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cassette", help="cassette 檔路徑（.json.gz）")
+    parser.add_argument("--rounds", type=int, default=10, help="每項量測的次數（錄製模式固定 1 次）")
+    parser.add_argument("--latency", default=None, help="重播延遲毫秒數；預設照錄製時耗時")
+    parser.add_argument("--test-account", action="store_true",
+                        help="確認 config 內是測試/子帳戶的 API key；錄製模式必須指定")
+    args = parser.parse_args()
+
+    mode = os.getenv("ROOSTER_CASSETTE_MODE", "replay").lower()
+    if mode == "record" and not args.test_account:
+        parser.error("錄製模式會真的掛單/撤單，請改用測試或子帳戶並加上 --test-account")
+    tmp = tempfile.mkdtemp(prefix="rooster_bench_")
+    _isolate_data(tmp)
+    os.environ["ROOSTER_CASSETTE"] = args.cassette
+    os.environ["ROOSTER_CASSETTE_MODE"] = mode
+    if args.latency is not None:
+        os.environ["ROOSTER_CASSETTE_LATENCY"] = args.latency
+    os.environ["ROOSTER_DISABLE_WATCHER"] = "1"     # 不啟動背景風控/資金費率執行緒
+    os.environ["ROOSTER_SCHEDULER"] = "0"           # 策略一輪只由本腳本觸發
+    os.environ["MAX_WS_ENABLED"] = "0"
+    os.environ.setdefault("FUNDING_DATABASE_PATH", os.path.join(tmp, "funding_rates.db"))
+    os.environ.setdefault("HEDGE_DATABASE_PATH", os.path.join(tmp, "hedge_monitor.db"))
+    print(f"暫存資料目錄：{tmp}")
+
+    from frontend import app as webapp
+    from backend.utils import http_cassette, http_metrics
+
+    http_metrics.reset()
+    rounds = 1 if mode == "record" else max(1, args.rounds)
+    http = webapp.app.test_client()
+    targets = [
+        ("execute_all_strategies", webapp.strategy_manager.execute_all_strategies),
+        ("perp_positions_api", lambda: http.get("/api/hedge-connections/positions")),
+        ("FundingCollector.collect_once", webapp.funding_collector.collect_once),
+    ]
+    print(f"模式：{mode}，每項 {rounds} 次（毫秒）")
+    for name, fn in targets:
+        r = _timed(fn, rounds)
+        print(f"  {name:32s} min {r['min']:8.1f}  median {r['median']:8.1f}"
+              f"  p95 {r['p95']:8.1f}  max {r['max']:8.1f}")
+
+    print("各來源 HTTP 統計：")
+    for venue, v in sorted(http_metrics.snapshot().items()):
+        print(f"  {venue:10s} 請求 {v['count']:5d}  錯誤 {v['errors']:3d}  平均 {v['avg_ms'] or 0:8.1f} ms")
+
+    cassette = http_cassette.active()
+    if mode == "record":
+        cassette.save()
+        print(f"已錄製 {cassette.stats()['recorded']} 筆請求 → {args.cassette}")
+    else:
+        stats = cassette.stats()
+        print(f"cassette 命中 {stats['hits']}，未命中 {stats['misses']}")
+        if stats["misses"]:
+            print("  有請求沒錄到（結果以連線錯誤處理）；請重新錄製以取得完整基準")
+
+
+if __name__ == "__main__":
+    main()
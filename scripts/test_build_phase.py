@@ -15,6 +15,7 @@ from backend.models.strategy_config import TradingStrategyConfig
 from backend.strategies.maker_orders import MakerOrderManager
 from backend.strategies.strategy_manager import StrategyManager
 from backend.utils.trading_record import TradingRecord
+from backend.utils.trade_store import get_trade_store
 from backend.utils.paths import records_dir, strategies_dir
 
 MARKET = "btctwd"
@@ -31,6 +32,7 @@ def cleanup(name):
     for d in (records_dir(), strategies_dir()):
         for p in glob.glob(os.path.join(d, f"*{name}*")):
             os.remove(p)
+    get_trade_store().delete_strategy(name)
 
 
 def mgr_for(name, client, build_mode="target", target_open_price=0):
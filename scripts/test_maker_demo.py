@@ -21,6 +21,7 @@ from max.mock_client import MockClientV3
 from backend.models.strategy_config import TradingStrategyConfig
 from backend.strategies.maker_orders import MakerOrderManager
 from backend.utils.trading_record import TradingRecord
+from backend.utils.trade_store import get_trade_store
 from backend.utils.paths import records_dir
 
 NAME = "__maker_test__"
@@ -38,6 +39,7 @@ def check(label, cond):
 def cleanup():
     for p in glob.glob(os.path.join(records_dir(), f"*{NAME}*")):
         os.remove(p)
+    get_trade_store().delete_strategy(NAME)
 
 
 def fresh_manager(client, config):